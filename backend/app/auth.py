@@ -1,40 +1,131 @@
+import time
 from datetime import datetime, timedelta
-from typing import Optional
-from passlib.context import CryptContext
+from typing import NamedTuple, Optional, Tuple
 from jose import jwt, JWTError
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlmodel import Session, select
+from binakata_common import metrics
+from .cache import TTLCache
 from .config import settings
+from .db import AsyncSession, get_async_session, get_session
+from .models import User
+from .passwords import PasswordHasher, PasswordHasherBusy
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+password_hasher = PasswordHasher(
+    rounds=settings.bcrypt_rounds,
+    workers=settings.password_hash_workers,
+    max_pending=settings.password_hash_queue,
+)
 security = HTTPBearer()
 
 
+class Principal(NamedTuple):
+    user_id: Optional[int]  # None only for legacy tokens issued without "uid"
+    email: str
+    exp: Optional[float] = None  # token expiry, unix seconds
+
+
+# Verified tokens -> Principal, each entry expiring with its token's "exp"
+token_cache = TTLCache(maxsize=settings.token_cache_size)
+TOKEN_CACHE_LOOKUPS = metrics.Counter(
+    "token_cache_lookups", "Verified-token cache lookups by result (hit, miss)", ("result",),
+)
+
+
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many concurrent logins, please retry",
+        headers={"Retry-After": "1"},
+    )
+
+
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    try:
+        return password_hasher.hash(password)
+    except PasswordHasherBusy:
+        raise _busy()
 
 
-def verify_password(password: str, password_hash: str) -> bool:
-    return pwd_context.verify(password, password_hash)
+async def hash_password_async(password: str) -> str:
+    try:
+        return await password_hasher.hash_async(password)
+    except PasswordHasherBusy:
+        raise _busy()
+
+
+async def verify_and_update_password_async(password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+    try:
+        return await password_hasher.verify_and_update_async(password, password_hash)
+    except PasswordHasherBusy:
+        raise _busy()
 
 
-def create_access_token(subject: str, expires_minutes: int = 60 * 24) -> str:
+def create_access_token(subject: str, user_id: Optional[int] = None, expires_minutes: int = 60 * 24) -> str:
     expire = datetime.utcnow() + timedelta(minutes=expires_minutes)
     to_encode = {"sub": subject, "exp": expire}
+    if user_id is not None:
+        to_encode["uid"] = user_id
     return jwt.encode(to_encode, settings.jwt_secret, algorithm="HS256")
 
 
-def decode_token(token: str) -> Optional[str]:
+def decode_principal(token: str) -> Optional[Principal]:
+    principal = token_cache.get(token)
+    if principal is not None:
+        TOKEN_CACHE_LOOKUPS.labels("hit").inc()
+        return principal
+    TOKEN_CACHE_LOOKUPS.labels("miss").inc()
     try:
         payload = jwt.decode(token, settings.jwt_secret, algorithms=["HS256"])
-        return payload.get("sub")
     except JWTError:
         return None
+    email = payload.get("sub")
+    if not email:
+        return None
+    exp = payload.get("exp")
+    principal = Principal(user_id=payload.get("uid"), email=email, exp=float(exp) if exp is not None else None)
+    _cache_principal(token, principal)
+    return principal
 
 
-def get_current_user_email(creds: HTTPAuthorizationCredentials = Depends(security)) -> str:
-    token = creds.credentials
-    email = decode_token(token)
-    if not email:
+def _cache_principal(token: str, principal: Principal) -> None:
+    # jose already rejected expired tokens; keep the entry only until the token expires
+    if principal.exp is not None:
+        token_cache.set(token, principal, expires_at=time.monotonic() + (principal.exp - time.time()))
+
+
+def _verified_principal(token: str) -> Principal:
+    principal = decode_principal(token)
+    if not principal:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    return principal
+
+
+def _resolved_principal(token: str, principal: Principal, user_id: Optional[int]) -> Principal:
+    if user_id is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-    return email
\ No newline at end of file
+    principal = principal._replace(user_id=user_id)
+    _cache_principal(token, principal)
+    return principal
+
+
+def get_current_principal(creds: HTTPAuthorizationCredentials = Depends(security), session: Session = Depends(get_session)) -> Principal:
+    token = creds.credentials
+    principal = _verified_principal(token)
+    if principal.user_id is None:
+        # Legacy token without "uid": resolve once, then serve it from the cache
+        user_id = session.exec(select(User.id).where(User.email == principal.email)).first()
+        principal = _resolved_principal(token, principal, user_id)
+    return principal
+
+
+async def get_current_principal_async(creds: HTTPAuthorizationCredentials = Depends(security),
+                                      session: AsyncSession = Depends(get_async_session)) -> Principal:
+    """get_current_principal for async routes: runs on the event loop, not a threadpool slot"""
+    token = creds.credentials
+    principal = _verified_principal(token)
+    if principal.user_id is None:
+        user_id = (await session.exec(select(User.id).where(User.email == principal.email))).first()
+        principal = _resolved_principal(token, principal, user_id)
+    return principal
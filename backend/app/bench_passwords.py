@@ -0,0 +1,58 @@
+"""Measure login throughput (bcrypt verifications/sec) through the hashing pool.
+
+Usage:
+    python -m app.bench_passwords --rounds 12 --workers 1 2 4 --seconds 5
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .passwords import PasswordHasher, PasswordHasherBusy
+
+
+def bench(rounds: int, workers: int, seconds: float, clients: int) -> dict:
+    hasher = PasswordHasher(rounds=rounds, workers=workers, max_pending=clients)
+    stored = hasher.hash("Demo123!")  # also spawns the pool
+    for _ in range(max(workers, 1)):
+        hasher.verify_and_update("Demo123!", stored)  # warm every worker
+
+    deadline = time.perf_counter() + seconds
+
+    def client() -> int:
+        done = 0
+        while time.perf_counter() < deadline:
+            try:
+                hasher.verify_and_update("Demo123!", stored)
+                done += 1
+            except PasswordHasherBusy:
+                time.sleep(0.001)
+        return done
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        total = sum(pool.map(lambda _: client(), range(clients)))
+    elapsed = time.perf_counter() - start
+    hasher.shutdown()
+    rate = total / elapsed
+    return {
+        "rounds": rounds,
+        "workers": workers,
+        "logins": total,
+        "logins_per_sec": round(rate, 2),
+        "logins_per_sec_per_core": round(rate / max(workers, 1), 2),
+        "rejected": hasher.rejected,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--clients", type=int, default=16)
+    args = parser.parse_args()
+    for w in args.workers:
+        r = bench(args.rounds, w, args.seconds, args.clients)
+        print(f"rounds={r['rounds']} workers={r['workers']}: {r['logins_per_sec']} logins/s "
+              f"({r['logins_per_sec_per_core']}/core, {r['logins']} total, {r['rejected']} rejected)")
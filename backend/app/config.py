@@ -2,6 +2,7 @@ from pydantic_settings import BaseSettings
 from typing import List, Any
 from pydantic import field_validator
 import os, json
+from binakata_common.env import env_flag
 
 class Settings(BaseSettings):
     database_url: str = os.getenv("DATABASE_URL", "sqlite:///./binakata.db")
@@ -11,6 +12,54 @@ class Settings(BaseSettings):
         "http://127.0.0.1:3000",
     ]
     model_dir: str = os.getenv("MODEL_DIR", "app/ml/models")
+    # Seconds between checks of the model artifact for changes (hot reload)
+    model_reload_interval: float = float(os.getenv("MODEL_RELOAD_INTERVAL", "5"))
+    # auto | numpy | keras; numpy/auto serve exported weights without importing TensorFlow
+    inference_engine: str = os.getenv("INFERENCE_ENGINE", "auto").lower()
+    # Seconds a per-user dashboard summary is served from the in-process cache
+    dashboard_cache_ttl: float = float(os.getenv("DASHBOARD_CACHE_TTL", "30"))
+    # Max verified JWTs kept in the in-process LRU (entries expire with the token)
+    token_cache_size: int = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+    # bcrypt cost; stored hashes with a lower cost are rehashed on login
+    bcrypt_rounds: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    # Processes for password hashing (0 = inline) and max queued+running hashes before 503
+    password_hash_workers: int = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+    password_hash_queue: int = int(os.getenv("PASSWORD_HASH_QUEUE", "32"))
+    # Where predict_score runs: local (embedded model) | remote (ML service /predict) | rules
+    inference_backend: str = os.getenv("INFERENCE_BACKEND", "local").lower()
+    ml_service_url: str = os.getenv("ML_SERVICE_URL", "http://localhost:8001")
+    ml_timeout: float = float(os.getenv("ML_TIMEOUT", "2.0"))  # seconds, per attempt
+    ml_retries: int = int(os.getenv("ML_RETRIES", "1"))
+    ml_pool_size: int = int(os.getenv("ML_POOL_SIZE", "10"))  # idle keep-alive connections
+    # Consecutive failed calls that open the breaker, and seconds before a trial call
+    ml_breaker_failures: int = int(os.getenv("ML_BREAKER_FAILURES", "5"))
+    ml_breaker_reset: float = float(os.getenv("ML_BREAKER_RESET", "30"))
+    # Scorer used while the ML service is unavailable: rules (no model) | local
+    ml_fallback: str = os.getenv("ML_FALLBACK", "rules").lower()
+    # Connection pool (ignored for SQLite, which uses one connection per thread)
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    db_pool_timeout: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    db_pool_recycle: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    db_pool_pre_ping: bool = env_flag("DB_POOL_PRE_PING", True)
+    # Postgres statement_timeout in ms (0 = server default)
+    db_statement_timeout_ms: int = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+    # SQLite: how long a writer waits for the lock before "database is locked"
+    sqlite_busy_timeout_ms: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    # Async engine for AsyncSession routes (the dashboard summary); needs aiosqlite or asyncpg.
+    # ASYNC_DATABASE_URL defaults to DATABASE_URL with the async driver swapped in.
+    db_async: bool = env_flag("DB_ASYNC")
+    async_database_url: str = os.getenv("ASYNC_DATABASE_URL", "")
+    # Sampling profiler: PROFILE_ENABLED profiles PROFILE_SAMPLE_RATE of requests; with
+    # PROFILE_ADMIN_TOKEN set, requests sending "X-Profile: <token>" are always profiled
+    profile_enabled: bool = env_flag("PROFILE_ENABLED")
+    profile_sample_rate: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0.01"))
+    profile_admin_token: str = os.getenv("PROFILE_ADMIN_TOKEN", "")
+    # Per-route collapsed-stack files (flamegraph.pl / speedscope input)
+    profile_dir: str = os.getenv("PROFILE_DIR", "profiles")
+    profile_interval_ms: float = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+    profile_max_stacks: int = int(os.getenv("PROFILE_MAX_STACKS", "2000"))  # distinct stacks per route
+    profile_flush_seconds: float = float(os.getenv("PROFILE_FLUSH_SECONDS", "60"))
 
     @field_validator("cors_origins", mode="before")
     @classmethod
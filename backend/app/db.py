@@ -1,13 +1,169 @@
+import time
+from contextvars import ContextVar
+from typing import List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from .config import settings
+from binakata_common import metrics
 
-engine = create_engine(settings.database_url, echo=False)
+_ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def _is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def _engine_kwargs(url: str) -> dict:
+    u = make_url(url)
+    if u.get_backend_name() == "sqlite":
+        # The sqlite3 driver's own busy timeout (seconds) also covers connect-time locks
+        return {"connect_args": {"check_same_thread": False, "timeout": settings.sqlite_busy_timeout_ms / 1000}}
+    kwargs = {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+    if u.get_backend_name() == "postgresql" and settings.db_statement_timeout_ms > 0:
+        timeout = str(settings.db_statement_timeout_ms)
+        if u.get_driver_name() == "asyncpg":
+            kwargs["connect_args"] = {"server_settings": {"statement_timeout": timeout}}
+        else:
+            kwargs["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return kwargs
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers run alongside the single writer; NORMAL is durable in WAL mode
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    cursor.close()
+
+
+engine = create_engine(settings.database_url, echo=False, **_engine_kwargs(settings.database_url))
+if _is_sqlite(settings.database_url):
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+
+
+# -- query metrics ---------------------------------------------------------
+
+DB_QUERY_DURATION = metrics.Histogram("db_query_duration_seconds", "Duration of single SQL statements")
+DB_QUERIES_PER_REQUEST = metrics.Histogram(
+    "db_queries_per_request", "SQL statements executed per HTTP request", ("route",),
+    buckets=(0, 1, 2, 3, 4, 5, 8, 13, 21, 50),
+)
+DB_TIME_PER_REQUEST = metrics.Histogram(
+    "db_time_per_request_seconds", "Total SQL time per HTTP request", ("route",),
+)
+# [statements, seconds] of the current request; the threadpool copies the
+# context, so sync endpoints add to the same list
+_request_queries: ContextVar[Optional[List[float]]] = ContextVar("request_queries", default=None)
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    DB_QUERY_DURATION.observe(elapsed)
+    totals = _request_queries.get()
+    if totals is not None:
+        totals[0] += 1
+        totals[1] += elapsed
+
+
+def _on_error(context):
+    # a failed statement never reaches after_cursor_execute
+    started = context.connection.info.get("query_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def instrument(engine_) -> None:
+    event.listen(engine_, "before_cursor_execute", _before_execute)
+    event.listen(engine_, "after_cursor_execute", _after_execute)
+    event.listen(engine_, "handle_error", _on_error)
+
+
+instrument(engine)
+
+
+class QueryMetricsMiddleware:
+    """ASGI middleware recording SQL statements and time per request and route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        totals = [0, 0.0]
+        token = _request_queries.set(totals)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_queries.reset(token)
+            route = metrics.route_label(scope)
+            DB_QUERIES_PER_REQUEST.labels(route).observe(totals[0])
+            DB_TIME_PER_REQUEST.labels(route).observe(totals[1])
 
 def init_db():
     from . import models  # noqa: F401
+    from .migrations import upgrade
     SQLModel.metadata.create_all(engine)
+    # create_all never alters existing tables; migrations bring old databases up to date
+    upgrade(engine)
 
 
 def get_session():
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
+
+
+# -- async ---------------------------------------------------------------
+
+_async_engine = None
+
+
+def async_database_url() -> str:
+    if settings.async_database_url:
+        return settings.async_database_url
+    u = make_url(settings.database_url)
+    driver = _ASYNC_DRIVERS.get(u.get_backend_name())
+    if driver is None:
+        raise RuntimeError(f"No async driver known for {u.get_backend_name()}; set ASYNC_DATABASE_URL")
+    return u.set(drivername=f"{u.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+
+def get_async_engine():
+    """Lazily create the async engine; the async driver is only imported when DB_ASYNC is on"""
+    global _async_engine
+    if not settings.db_async:
+        raise RuntimeError("Async database access is disabled; set DB_ASYNC=1")
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+        url = async_database_url()
+        _async_engine = create_async_engine(url, echo=False, **_engine_kwargs(url))
+        if _is_sqlite(url):
+            event.listen(_async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+        instrument(_async_engine.sync_engine)
+    return _async_engine
+
+
+async def get_async_session():
+    async with AsyncSession(get_async_engine(), expire_on_commit=False) as session:
+        yield session
+
+
+async def dispose_async_engine():
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
@@ -1,7 +1,13 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from .config import settings
-from .db import init_db
+from sqlmodel import Session
+from .db import QueryMetricsMiddleware, engine, init_db, dispose_async_engine
+from binakata_common import metrics, profiling
+from .stats import ensure_parent_stats
+from .auth import token_cache, password_hasher
+from .ml.model import registry as model_registry, score_table, close_remote, inference_stats, warm_up as warm_up_inference
 from .routers import auth as auth_router
 from .routers import children as children_router
 from .routers import assessments as assessments_router
@@ -16,10 +22,34 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(QueryMetricsMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
+profiler = profiling.install(
+    app,
+    enabled=settings.profile_enabled,
+    sample_rate=settings.profile_sample_rate,
+    admin_token=settings.profile_admin_token,
+    directory=settings.profile_dir,
+    interval_ms=settings.profile_interval_ms,
+    max_stacks=settings.profile_max_stacks,
+    flush_interval=settings.profile_flush_seconds,
+)
 
 @app.on_event("startup")
 def on_startup():
     init_db()
+    with Session(engine) as session:
+        ensure_parent_stats(session)
+    score_table.set_grid(assessments_router.item_counts())
+    warm_up_inference()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    password_hasher.shutdown()
+    close_remote()
+    await dispose_async_engine()
+    if profiler is not None:
+        profiler.close()
 
 app.include_router(auth_router.router)
 app.include_router(children_router.router)
@@ -28,4 +58,11 @@ app.include_router(dashboard_router.router)
 
 @app.get("/")
 def root():
-    return {"ok": True, "service": "BinaKata API"}
\ No newline at end of file
+    return {"ok": True, "service": "BinaKata API", "model": model_registry.stats(),
+            "inference": inference_stats(), "token_cache": token_cache.stats(),
+            "password_hasher": password_hasher.stats(),
+            "profiler": profiler.stats() if profiler is not None else None}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,153 @@
+"""Versioned schema migrations.
+
+``init_db`` creates missing tables with ``create_all`` and then applies
+every migration newer than the highest version recorded in
+``schemamigration``. Migrations must be idempotent (e.g. ``checkfirst``)
+because a fresh database already has the current schema from
+``create_all`` and only records the versions.
+
+Usage:
+    python -m app.migrations upgrade   # apply pending migrations
+    python -m app.migrations status    # list applied/pending versions
+    python -m app.migrations plans     # upgrade, then EXPLAIN hot queries; exit 1 on full scans
+"""
+import sys
+from datetime import datetime
+from typing import Callable, List, NamedTuple
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import SQLModel, select
+from .models import Assessment, AssessmentItem, Child, ParentStats, SchemaMigration
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[[Connection], None]
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, description: str):
+    def decorator(fn: Callable[[Connection], None]):
+        MIGRATIONS.append(Migration(version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return fn
+    return decorator
+
+
+def _create_indexes(conn: Connection, table, names) -> None:
+    for index in table.indexes:
+        if index.name in names:
+            index.create(conn, checkfirst=True)
+
+
+@migration(1, "index foreign keys used by list, submit and dashboard queries")
+def _hot_path_indexes(conn: Connection) -> None:
+    _create_indexes(conn, Child.__table__, {"ix_child_parent_id"})
+    _create_indexes(conn, Assessment.__table__, {"ix_assessment_child_submitted"})
+    _create_indexes(conn, AssessmentItem.__table__, {"ix_assessmentitem_assessment_position"})
+
+
+def applied_versions(conn: Connection) -> set:
+    return set(conn.execute(select(SchemaMigration.version)).scalars())
+
+
+def upgrade(engine: Engine) -> List[int]:
+    """Apply pending migrations, each in its own transaction; returns versions applied"""
+    SchemaMigration.__table__.create(engine, checkfirst=True)
+    done = []
+    for m in MIGRATIONS:
+        with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                # serialize workers migrating the same database at startup
+                conn.execute(text("SELECT pg_advisory_xact_lock(7312016)"))
+            if m.version in applied_versions(conn):
+                continue
+            m.apply(conn)
+            conn.execute(SchemaMigration.__table__.insert().values(version=m.version, description=m.description))
+            done.append(m.version)
+            print(f"[OK] Applied migration {m.version}: {m.description}")
+    return done
+
+
+# -- query plan check ------------------------------------------------------
+
+def hot_queries():
+    """The router and stats queries that must use an index, from their own constructors"""
+    # imported here: the routers import app.db, which imports this module
+    from .routers.assessments import submit_items_query
+    from .routers.auth import user_query
+    from .routers.children import children_query, history_query, owned_child_query
+    from .stats import aggregate_query, trend_query
+    return {
+        "auth.user": user_query("x@example.com"),
+        "children.list": children_query(1),
+        "children.owner": owned_child_query(1, 1),
+        "children.assessments": history_query(1, 50, None),
+        "children.assessments.next": history_query(1, 50, (datetime(2030, 1, 1), 1)),
+        "children.trend": trend_query(1, 5, 100),
+        "assessments.submit.items": submit_items_query(1, 1),
+        # what Session.get(ParentStats, ...) emits
+        "dashboard.summary": select(ParentStats).where(ParentStats.parent_id == 1),
+        "stats.parent": aggregate_query(1),
+    }
+
+
+def _plan(conn: Connection, statement) -> List[str]:
+    compiled = statement.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+    if conn.dialect.name == "sqlite":
+        return [row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}")]
+    return [row[0] for row in conn.exec_driver_sql(f"EXPLAIN {compiled}")]
+
+
+def _full_scans(dialect: str, plan: List[str]) -> List[str]:
+    if dialect == "sqlite":
+        # "SEARCH t USING INDEX ..." is fine, "SCAN t" reads the whole table;
+        # scanning a subquery (the trend's window) only reads its own rows
+        tables = set(SQLModel.metadata.tables)
+        return [line for line in plan if line.startswith("SCAN ") and line.split()[1] in tables]
+    return [line for line in plan if "Seq Scan" in line]
+
+
+def check_plans(engine: Engine) -> dict:
+    """EXPLAIN each hot query; returns {name: [full-scan plan lines]} for the offenders"""
+    failures = {}
+    with engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            # tiny tables make seq scans cheapest; only fail when no index can be used
+            conn.exec_driver_sql("SET enable_seqscan = off")
+        for name, statement in hot_queries().items():
+            scans = _full_scans(conn.dialect.name, _plan(conn, statement))
+            if scans:
+                failures[name] = scans
+    return failures
+
+
+if __name__ == "__main__":
+    from .db import engine
+    command = sys.argv[1] if len(sys.argv) == 2 else None
+    if command == "upgrade":
+        SQLModel.metadata.create_all(engine)
+        applied = upgrade(engine)
+        print(f"Up to date ({len(applied)} applied)")
+    elif command == "status":
+        SchemaMigration.__table__.create(engine, checkfirst=True)
+        with engine.connect() as conn:
+            applied = applied_versions(conn)
+        for m in MIGRATIONS:
+            print(f"{m.version:4d} {'applied' if m.version in applied else 'pending':8s} {m.description}")
+    elif command == "plans":
+        # same schema the app would run with: tables, then pending migrations
+        SQLModel.metadata.create_all(engine)
+        upgrade(engine)
+        failures = check_plans(engine)
+        for name in hot_queries():
+            print(f"{'FAIL' if name in failures else 'ok':4s} {name}")
+            for line in failures.get(name, []):
+                print(f"       {line}")
+        sys.exit(1 if failures else 0)
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -1,10 +1,18 @@
 import os
+import time
+import hashlib
+import itertools
+import threading
 import numpy as np
-from typing import Tuple
-from tensorflow import keras
+from typing import Callable, Dict, Sequence, Tuple, Optional
+from ..cache import TTLCache
 from ..config import settings
+from binakata_common import metrics, synthetic
+from binakata_common.numpy_engine import NumpyMLP, export_keras
+from .remote import CircuitBreaker, RemoteScorer, RemoteUnavailable
 
 MODEL_PATH = None
+NPZ_PATH = None
 
 def _model_path() -> str:
     global MODEL_PATH
@@ -14,7 +22,16 @@ def _model_path() -> str:
     return MODEL_PATH
 
 
-def _build_model(input_dim: int = 3) -> keras.Model:
+def _npz_path() -> str:
+    global NPZ_PATH
+    if NPZ_PATH is None:
+        NPZ_PATH = os.path.splitext(_model_path())[0] + ".npz"
+    return NPZ_PATH
+
+
+# TensorFlow is imported lazily so the NumPy engine can serve without it.
+def _build_model(input_dim: int = 3):
+    from tensorflow import keras
     model = keras.Sequential([
         keras.layers.Input(shape=(input_dim,)),
         keras.layers.Dense(8, activation="relu"),
@@ -27,15 +44,11 @@ def _build_model(input_dim: int = 3) -> keras.Model:
 
 def _synthetic_dataset(n: int = 2000) -> Tuple[np.ndarray, np.ndarray]:
     # features: [letters_acc, words_acc, arrange_acc] in [0,1]
-    rng = np.random.default_rng(42)
-    X = rng.uniform(0.0, 1.0, size=(n, 3)).astype("float32")
-    # Heuristic label: risk if low accuracy
-    y = ((X.mean(axis=1) < 0.6) | ((X[:,0] < 0.55) & (X[:,1] < 0.55))).astype("float32")
-    return X, y
+    return synthetic.generate(n, seed=42, profile="accuracy3")
 
 
-def ensure_model():
-    path = _model_path()
+def _load_or_train_keras(path: str):
+    from tensorflow import keras
     if os.path.exists(path):
         return keras.models.load_model(path)
     # Train cold-start on synthetic data
@@ -46,15 +59,322 @@ def ensure_model():
     return model
 
 
-def predict_score(letters_acc: float, words_acc: float, arrange_acc: float) -> Tuple[float, str]:
-    model = ensure_model()
-    x = np.array([[letters_acc, words_acc, arrange_acc]], dtype="float32")
-    prob = float(model.predict(x, verbose=0)[0][0])
-    # Map to recommendation text
+INFERENCE_DURATION = metrics.Histogram(
+    "inference_duration_seconds",
+    "predict_score latency by the scorer that produced the score (local, remote, rules) "
+    "and its engine (neural_network, fallback)",
+    ("scorer", "engine"),
+)
+MODEL_LOAD_DURATION = metrics.Histogram(
+    "model_load_duration_seconds", "Time to load (or cold-train) the local model", ("engine",),
+    buckets=metrics.DURATION_BUCKETS,
+)
+
+
+def _file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ModelRegistry:
+    """Loads the risk model once per process and reloads it only when the artifact changes.
+
+    The watched artifact is the trained ``.keras`` file, also when the NumPy
+    export is what serves (the ``.npz`` is only watched when it ships
+    without its source). It is re-stat'ed at most every ``check_interval``
+    seconds; a changed mtime/size triggers a content hash, and the model is
+    reloaded, and re-exported for the NumPy engine, only if the hash differs
+    from the one currently loaded.
+    """
+
+    def __init__(self, check_interval: float = 5.0, engine: str = "auto"):
+        self.check_interval = check_interval
+        self.engine = engine
+        self._lock = threading.Lock()
+        self._model = None
+        self._path: Optional[str] = None  # artifact serving predictions
+        self._source: Optional[str] = None  # artifact watched for changes
+        self._stat: Optional[Tuple[int, int]] = None
+        self._digest: Optional[str] = None
+        self._next_check = 0.0
+        self.loads = 0
+        self.cache_hits = 0
+        self.last_load_ms: Optional[float] = None
+        self.loaded_at: Optional[float] = None
+
+    def _stat_artifact(self, path: str) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _load_numpy(self, reexport: bool):
+        path, source = _npz_path(), _model_path()
+        source_stat, path_stat = self._stat_artifact(source), self._stat_artifact(path)
+        if path_stat is not None and (source_stat is None or (not reexport and source_stat[0] <= path_stat[0])):
+            return NumpyMLP.load(path), path
+        # (Re-)export; TensorFlow is only needed to produce the .npz
+        try:
+            keras_model = _load_or_train_keras(source)
+        except ImportError:
+            if path_stat is None:
+                raise
+            return NumpyMLP.load(path), path  # no TensorFlow to re-export with; keep the old export
+        try:
+            return export_keras(keras_model, path), path
+        except Exception:
+            if self.engine == "numpy":
+                raise
+            return keras_model, source
+
+    def _load(self, reexport: bool = False) -> None:
+        t0 = time.perf_counter()
+        if self.engine == "keras":
+            path = _model_path()
+            model = _load_or_train_keras(path)
+        else:
+            model, path = self._load_numpy(reexport)
+        source = _model_path() if os.path.exists(_model_path()) else path
+        self._model = model
+        self._path = path
+        self._source = source
+        self._stat = self._stat_artifact(source)
+        self._digest = _file_digest(source)
+        self.loads += 1
+        self.last_load_ms = (time.perf_counter() - t0) * 1000.0
+        MODEL_LOAD_DURATION.labels(getattr(model, "engine", "keras")).observe(self.last_load_ms / 1000.0)
+        self.loaded_at = time.time()
+
+    def _is_stale(self) -> bool:
+        if self._source != _model_path() and os.path.exists(_model_path()):
+            return True  # a .keras source dropped next to an .npz-only deployment
+        path = self._source
+        stat = self._stat_artifact(path)
+        if stat is None or stat == self._stat:
+            return False
+        if _file_digest(path) == self._digest:
+            # Touched but not changed; remember the new stat so we don't rehash.
+            self._stat = stat
+            return False
+        return True
+
+    def get(self):
+        model = self._model
+        now = time.monotonic()
+        if model is not None and now < self._next_check:
+            self.cache_hits += 1
+            return model
+        with self._lock:
+            if self._model is None:
+                self._load()
+            elif self._is_stale():
+                self._load(reexport=True)
+            else:
+                self.cache_hits += 1
+            self._next_check = time.monotonic() + self.check_interval
+            return self._model
+
+    def warm_up(self) -> None:
+        model = self.get()
+        # First predict builds the inference function; pay for it before traffic arrives.
+        model.predict(np.zeros((1, 3), dtype="float32"), verbose=0)
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self._model is not None,
+            "engine": getattr(self._model, "engine", "keras") if self._model is not None else None,
+            "path": self._path,
+            "source": self._source,
+            "sha256": self._digest,
+            "loads": self.loads,
+            "cache_hits": self.cache_hits,
+            "last_load_ms": self.last_load_ms,
+            "loaded_at": self.loaded_at,
+        }
+
+
+registry = ModelRegistry(
+    check_interval=settings.model_reload_interval,
+    engine=settings.inference_engine,
+)
+
+
+def ensure_model():
+    return registry.get()
+
+
+def _recommendation(prob: float) -> str:
     if prob >= 0.7:
-        rec = "Risiko tinggi: rujuk evaluasi profesional; mulai modul huruf dasar dan ejaan pelan dengan panduan audio."
+        return "Risiko tinggi: rujuk evaluasi profesional; mulai modul huruf dasar dan ejaan pelan dengan panduan audio."
     elif prob >= 0.4:
-        rec = "Risiko sedang: fokuskan latihan ejaan interaktif dan permainan susun kata level dasar."
+        return "Risiko sedang: fokuskan latihan ejaan interaktif dan permainan susun kata level dasar."
+    return "Risiko rendah: lanjutkan latihan bertahap dan pemantauan konsistensi."
+
+
+class ScoreTable:
+    """(risk, recommendation) for every input the local model can receive from a full submit.
+
+    Accuracies are ``correct / items`` per type, so with ``grid_sizes`` items
+    of each type there are only ``prod(n + 1)`` distinct inputs. They are
+    scored in one batch whenever the registry hands out a different model
+    object, which also drops the LRU memo used for off-grid inputs
+    (partially answered assessments).
+    """
+
+    def __init__(self, memo_size: int = 1024):
+        self.grid_sizes: Tuple[int, ...] = ()
+        self._model = None
+        self._table: Dict[Tuple[float, ...], Tuple[float, str]] = {}
+        self._memo = TTLCache(maxsize=memo_size, ttl=float("inf"))
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.hits = 0
+
+    def set_grid(self, grid_sizes: Sequence[int]) -> None:
+        with self._lock:
+            self.grid_sizes = tuple(grid_sizes)
+            self._model = None  # rebuild on next lookup
+
+    def _rebuild(self, model) -> None:
+        axes = [[k / n for k in range(n + 1)] if n else [0.0] for n in self.grid_sizes]
+        # no grid (e.g. no items yet): product() would yield one empty point
+        points = list(itertools.product(*axes)) if axes else []
+        table = {}
+        if points:
+            probs = model.predict(np.array(points, dtype="float32"), verbose=0)[:, 0]
+            table = {p: (float(prob), _recommendation(float(prob))) for p, prob in zip(points, probs)}
+        self._table = table
+        self._memo.clear()
+        self._model = model
+        self.builds += 1
+
+    def lookup(self, letters_acc: float, words_acc: float, arrange_acc: float) -> Tuple[float, str]:
+        model = ensure_model()
+        if model is not self._model:
+            with self._lock:
+                if model is not self._model:
+                    self._rebuild(model)
+        key = (letters_acc, words_acc, arrange_acc)
+        hit = self._table.get(key)
+        if hit is not None:
+            self.hits += 1
+            return hit
+        hit = self._memo.get(key)
+        if hit is None:
+            prob = _score_local(*key)
+            hit = (prob, _recommendation(prob))
+            self._memo.set(key, hit)
+        return hit
+
+    def stats(self) -> dict:
+        return {"grid": list(self.grid_sizes), "size": len(self._table), "builds": self.builds,
+                "hits": self.hits, "memo": self._memo.stats()}
+
+
+score_table = ScoreTable()
+
+
+# backend name -> score(letters_acc, words_acc, arrange_acc) -> risk probability
+SCORERS: Dict[str, Callable[[float, float, float], float]] = {}
+
+
+def register_scorer(name: str):
+    def decorator(score: Callable[[float, float, float], float]):
+        SCORERS[name] = score
+        return score
+    return decorator
+
+
+@register_scorer("local")
+def _score_local(letters_acc: float, words_acc: float, arrange_acc: float) -> float:
+    model = ensure_model()
+    x = np.array([[letters_acc, words_acc, arrange_acc]], dtype="float32")
+    return float(model.predict(x, verbose=0)[0][0])
+
+
+@register_scorer("rules")
+def _score_rules(letters_acc: float, words_acc: float, arrange_acc: float) -> float:
+    # Same weights as the ML service's fallback_scoring with its defaults for
+    # the features the backend doesn't collect (speech 0.5, reaction time 2s)
+    accuracy = letters_acc * 0.3 + words_acc * 0.3 + arrange_acc * 0.25 + 0.5 * 0.15
+    return max(0.0, min(1.0, (1.0 - accuracy) * 0.8 + 0.4 * 0.2))
+
+
+_remote: Optional[RemoteScorer] = None
+_remote_lock = threading.Lock()
+
+
+def remote_scorer() -> RemoteScorer:
+    global _remote
+    if _remote is None:
+        with _remote_lock:
+            if _remote is None:
+                _remote = RemoteScorer(
+                    settings.ml_service_url,
+                    timeout=settings.ml_timeout,
+                    retries=settings.ml_retries,
+                    pool_size=settings.ml_pool_size,
+                    breaker=CircuitBreaker(settings.ml_breaker_failures, settings.ml_breaker_reset),
+                )
+    return _remote
+
+
+# what each scorer runs, for the inference_duration_seconds "engine" label
+_ENGINES = {"local": "neural_network", "remote": "neural_network", "rules": "fallback"}
+
+
+def _remote_or_fallback(letters_acc: float, words_acc: float, arrange_acc: float) -> Tuple[str, float]:
+    """(name of the scorer that answered, risk probability)"""
+    scorer = remote_scorer()
+    try:
+        return "remote", scorer.predict(letters_acc, words_acc, arrange_acc)
+    except RemoteUnavailable:
+        scorer.fallbacks += 1
+        return settings.ml_fallback, SCORERS[settings.ml_fallback](letters_acc, words_acc, arrange_acc)
+
+
+@register_scorer("remote")
+def _score_remote(letters_acc: float, words_acc: float, arrange_acc: float) -> float:
+    return _remote_or_fallback(letters_acc, words_acc, arrange_acc)[1]
+
+
+def close_remote() -> None:
+    if _remote is not None:
+        _remote.close()
+
+
+def inference_stats() -> dict:
+    if settings.inference_backend == "remote":
+        return dict(remote_scorer().stats(), backend="remote", fallback=settings.ml_fallback)
+    if settings.inference_backend == "local":
+        return {"backend": "local", "score_table": score_table.stats()}
+    return {"backend": settings.inference_backend}
+
+
+def warm_up() -> None:
+    """Load whatever the configured backend scores with before traffic arrives"""
+    if settings.inference_backend == "local":
+        registry.warm_up()
+        score_table.lookup(0.0, 0.0, 0.0)  # builds the grid table
+    elif settings.inference_backend == "remote" and settings.ml_fallback == "local":
+        registry.warm_up()
+
+
+def predict_score(letters_acc: float, words_acc: float, arrange_acc: float) -> Tuple[float, str]:
+    started = time.perf_counter()
+    backend = settings.inference_backend
+    if backend == "local":
+        scorer = "local"
+        prob, rec = score_table.lookup(letters_acc, words_acc, arrange_acc)
     else:
-        rec = "Risiko rendah: lanjutkan latihan bertahap dan pemantauan konsistensi."
+        if backend == "remote":
+            scorer, prob = _remote_or_fallback(letters_acc, words_acc, arrange_acc)
+        else:
+            scorer, prob = backend, SCORERS[backend](letters_acc, words_acc, arrange_acc)
+        rec = _recommendation(prob)
+    INFERENCE_DURATION.labels(scorer, _ENGINES.get(scorer, "neural_network")).observe(time.perf_counter() - started)
     return prob, rec
@@ -0,0 +1,266 @@
+"""Client for scoring through the ML service's /predict endpoint.
+
+Requests go over a small pool of keep-alive ``http.client`` connections,
+so steady traffic reuses sockets instead of paying a TCP handshake per
+call. Each call has a socket timeout and a bounded number of retries. A
+circuit breaker stops calling the service after repeated failures, and
+callers fall back to local scoring until a trial call succeeds again.
+Call outcomes, retries, latency and breaker states are exported through
+``binakata_common.metrics``.
+"""
+import http.client
+import json
+import queue
+import threading
+import time
+from collections import deque
+from typing import Optional
+from urllib.parse import urlsplit
+from binakata_common import metrics
+
+REMOTE_REQUESTS = metrics.Counter(
+    "remote_requests", "ML service calls by outcome (ok, failed, rejected, invalid)", ("outcome",),
+)
+REMOTE_RETRIES = metrics.Counter("remote_retries", "ML service attempts retried after a failure")
+REMOTE_LATENCY = metrics.Histogram("remote_request_duration_seconds", "Latency of successful ML service calls")
+REMOTE_BREAKER = metrics.Gauge("remote_breaker_state", "ML service circuit breakers in each state", ("state",))
+
+
+class RemoteUnavailable(Exception):
+    pass
+
+
+class RemoteInvalid(RemoteUnavailable):
+    """The service answered, but not with a usable score (4xx, malformed body)"""
+
+
+class CircuitBreaker:
+    """closed -> open after ``failure_threshold`` consecutive failures;
+    open -> half_open after ``reset_timeout`` seconds, letting one trial call through;
+    half_open -> closed on success, back to open on failure.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        REMOTE_BREAKER.labels(self.state).inc()
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self._trial_running = False
+        self._trial_thread = None  # thread making the half-open trial call
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._set_state("half_open")
+            if self.state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                self._trial_thread = threading.get_ident()
+                return True
+            return False
+
+    def _set_state(self, state: str) -> None:
+        if state != self.state:
+            REMOTE_BREAKER.labels(self.state).dec()
+            REMOTE_BREAKER.labels(state).inc()
+            self.state = state
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._set_state("closed")
+            self.failures = 0
+            self._trial_running = False
+
+    def release_trial(self) -> None:
+        """Give up this thread's half-open trial if it ended without an outcome"""
+        with self._lock:
+            if self._trial_thread == threading.get_ident():
+                self._trial_running = False
+                self._trial_thread = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.opens += 1
+                self._set_state("open")
+                self.opened_at = time.monotonic()
+
+
+class ConnectionPool:
+    """At most ``size`` idle keep-alive connections to one host"""
+
+    def __init__(self, url: str, size: int = 10, timeout: float = 2.0):
+        parts = urlsplit(url)
+        self.scheme = parts.scheme or "http"
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or (443 if self.scheme == "https" else 80)
+        self.base_path = parts.path.rstrip("/")
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+        self.created = 0
+        self.reused = 0
+
+    def _connect(self) -> http.client.HTTPConnection:
+        cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        self.created += 1
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    def _checkout(self):
+        try:
+            conn = self._idle.get_nowait()
+            self.reused += 1
+            return conn, True
+        except queue.Empty:
+            return self._connect(), False
+
+    def _checkin(self, conn) -> None:
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None):
+        """Return (status, body bytes); the connection goes back to the pool when reusable"""
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        conn, reused = self._checkout()
+        try:
+            try:
+                conn.request(method, self.base_path + path, body=body, headers=headers)
+                resp = conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                if not reused:
+                    raise
+                # the server closed an idle keep-alive socket; one fresh attempt
+                conn.close()
+                conn = self._connect()
+                conn.request(method, self.base_path + path, body=body, headers=headers)
+                resp = conn.getresponse()
+            data = resp.read()
+        except Exception:
+            conn.close()
+            raise
+        if resp.will_close:
+            conn.close()
+        else:
+            self._checkin(conn)
+        return resp.status, data
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class RemoteScorer:
+    def __init__(
+        self,
+        url: str,
+        timeout: float = 2.0,
+        retries: int = 1,
+        pool_size: int = 10,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.url = url
+        self.retries = max(0, retries)
+        self.pool = ConnectionPool(url, size=pool_size, timeout=timeout)
+        self.breaker = breaker or CircuitBreaker()
+        self._latencies = deque(maxlen=2048)  # seconds, successful calls only
+        self.calls = 0
+        self.failures = 0
+        self.retried = 0
+        self.rejected = 0  # calls short-circuited by the open breaker
+        self.fallbacks = 0
+
+    def _call(self, payload: bytes) -> float:
+        status, data = self.pool.request("POST", "/predict", payload)
+        if status >= 500:
+            raise RemoteUnavailable(f"ML service returned {status}")
+        if status != 200:
+            # a 4xx won't get better on retry; surface it without tripping the breaker
+            raise RemoteInvalid(f"ML service rejected the request ({status}): {data[:200]!r}")
+        try:
+            return float(json.loads(data)["risk_score"])
+        except (ValueError, KeyError, TypeError) as e:
+            raise RemoteInvalid(f"ML service sent an unusable response: {data[:200]!r}") from e
+
+    def predict(self, letters_acc: float, words_acc: float, arrange_acc: float) -> float:
+        if not self.breaker.allow():
+            self.rejected += 1
+            REMOTE_REQUESTS.labels("rejected").inc()
+            raise RemoteUnavailable("circuit open")
+        payload = json.dumps({
+            "letters_accuracy": letters_acc,
+            "words_accuracy": words_acc,
+            "arrange_accuracy": arrange_acc,
+        }).encode()
+        self.calls += 1
+        last_error = None
+        try:
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    self.retried += 1
+                    REMOTE_RETRIES.inc()
+                    time.sleep(min(0.05 * 2 ** (attempt - 1), 0.5))
+                t0 = time.perf_counter()
+                try:
+                    prob = self._call(payload)
+                except RemoteInvalid:
+                    self.breaker.record_success()  # the service answered; it is up
+                    REMOTE_REQUESTS.labels("invalid").inc()
+                    raise
+                except Exception as e:  # connection errors, timeouts, 5xx
+                    last_error = e
+                    continue
+                elapsed = time.perf_counter() - t0
+                self._latencies.append(elapsed)
+                REMOTE_LATENCY.observe(elapsed)
+                REMOTE_REQUESTS.labels("ok").inc()
+                self.breaker.record_success()
+                return prob
+            self.failures += 1
+            REMOTE_REQUESTS.labels("failed").inc()
+            self.breaker.record_failure()
+            raise RemoteUnavailable(f"{type(last_error).__name__}: {last_error}")
+        finally:
+            # whatever escaped above, a half-open trial must not stay claimed
+            self.breaker.release_trial()
+
+    def _percentile(self, values, q: float) -> Optional[float]:
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(q * len(values)))] * 1000.0
+
+    def stats(self) -> dict:
+        lat = sorted(self._latencies)
+        opened = self.pool.created + self.pool.reused
+        return {
+            "url": self.url,
+            "breaker": self.breaker.state,
+            "breaker_opens": self.breaker.opens,
+            "calls": self.calls,
+            "failures": self.failures,
+            "retries": self.retried,
+            "rejected": self.rejected,
+            "fallbacks": self.fallbacks,
+            "connections_created": self.pool.created,
+            "connections_reused": self.pool.reused,
+            "connection_reuse_rate": (self.pool.reused / opened) if opened else 0.0,
+            "latency_ms": {
+                "p50": self._percentile(lat, 0.50),
+                "p95": self._percentile(lat, 0.95),
+                "p99": self._percentile(lat, 0.99),
+            },
+        }
+
+    def close(self) -> None:
+        self.pool.close()
@@ -1,5 +1,6 @@
 from datetime import datetime
 from typing import Optional, List
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 
 class User(SQLModel, table=True):
@@ -11,7 +12,7 @@ class User(SQLModel, table=True):
 
 class Child(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    parent_id: int = Field(foreign_key="user.id")
+    parent_id: int = Field(foreign_key="user.id", index=True)
     name: str
     age: Optional[int] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -19,6 +20,8 @@ class Child(SQLModel, table=True):
     assessments: List["Assessment"] = Relationship(back_populates="child")
 
 class Assessment(SQLModel, table=True):
+    # per-child history in (submitted_at, id) order; the child_id prefix serves joins
+    __table_args__ = (Index("ix_assessment_child_submitted", "child_id", "submitted_at", "id"),)
     id: Optional[int] = Field(default=None, primary_key=True)
     child_id: int = Field(foreign_key="child.id")
     started_at: datetime = Field(default_factory=datetime.utcnow)
@@ -29,6 +32,8 @@ class Assessment(SQLModel, table=True):
     items: List["AssessmentItem"] = Relationship(back_populates="assessment")
 
 class AssessmentItem(SQLModel, table=True):
+    # an assessment's items in position order (submit)
+    __table_args__ = (Index("ix_assessmentitem_assessment_position", "assessment_id", "position"),)
     id: Optional[int] = Field(default=None, primary_key=True)
     assessment_id: int = Field(foreign_key="assessment.id")
     item_type: str  # letter|word|arrange
@@ -36,4 +41,19 @@ class AssessmentItem(SQLModel, table=True):
     answer: Optional[str] = None
     is_correct: Optional[bool] = None
     position: int = 0
-    assessment: Optional[Assessment] = Relationship(back_populates="items")
\ No newline at end of file
+    assessment: Optional[Assessment] = Relationship(back_populates="items")
+
+class ParentStats(SQLModel, table=True):
+    # Dashboard aggregates per parent, maintained in the same transaction as
+    # /assessments/start and /submit (rebuild with `python -m app.stats rebuild`)
+    parent_id: int = Field(foreign_key="user.id", primary_key=True)
+    assessment_count: int = 0
+    risk_sum: float = 0.0
+    risk_count: int = 0
+    last_assessed_at: Optional[datetime] = None
+
+class SchemaMigration(SQLModel, table=True):
+    # Applied versions from app.migrations
+    version: int = Field(primary_key=True)
+    description: str
+    applied_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,111 @@
+"""bcrypt hashing in a bounded process pool.
+
+Hashing and verification run in worker processes. Routes use the
+``*_async`` methods, which await the pool's future on the event loop, so
+a burst of logins holds neither route threadpool workers nor the GIL;
+the blocking methods are for scripts. At most ``max_pending`` operations
+may be queued or running; beyond that ``PasswordHasherBusy`` is raised
+so the caller can shed load (503) instead of queueing forever.
+This module only depends on passlib so spawned workers start quickly.
+"""
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+from passlib.context import CryptContext
+
+_contexts: Dict[int, CryptContext] = {}
+
+
+def _context(rounds: int) -> CryptContext:
+    ctx = _contexts.get(rounds)
+    if ctx is None:
+        # min_rounds == rounds makes hashes with a lower cost "need update"
+        ctx = CryptContext(schemes=["bcrypt"], deprecated="auto",
+                           bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds)
+        _contexts[rounds] = ctx
+    return ctx
+
+
+def _hash(password: str, rounds: int) -> str:
+    return _context(rounds).hash(password)
+
+
+def _verify_and_update(password: str, password_hash: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    return _context(rounds).verify_and_update(password, password_hash)
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    def __init__(self, rounds: int = 12, workers: int = 2, max_pending: int = 32):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max(max_pending, workers)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self.rejected = 0
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+        return self._pool
+
+    def _run(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)  # inline mode for scripts and single-process dev
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise PasswordHasherBusy()
+        try:
+            return self._executor().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    async def _run_async(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        if self.workers <= 0:
+            return await loop.run_in_executor(None, fn, *args)
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise PasswordHasherBusy()
+        try:
+            return await asyncio.wrap_future(self._executor().submit(fn, *args), loop=loop)
+        finally:
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        return self._run(_hash, password, self.rounds)
+
+    def verify_and_update(self, password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+        """Verify; also returns a new hash when the stored one uses an outdated cost"""
+        return self._run(_verify_and_update, password, password_hash, self.rounds)
+
+    async def hash_async(self, password: str) -> str:
+        return await self._run_async(_hash, password, self.rounds)
+
+    async def verify_and_update_async(self, password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+        return await self._run_async(_verify_and_update, password, password_hash, self.rounds)
+
+    def stats(self) -> dict:
+        return {
+            "rounds": self.rounds,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self) -> None:
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
@@ -1,11 +1,19 @@
+import hashlib
+import json
 from datetime import datetime
+from functools import lru_cache
+from typing import NamedTuple, Tuple
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import insert, update
 from sqlmodel import Session, select
 from ..db import get_session
-from ..models import User, Child, Assessment, AssessmentItem
+from ..models import Child, Assessment, AssessmentItem
 from ..schemas import AssessmentStart, AssessmentSubmit, AssessmentOut
-from ..auth import get_current_user_email
+from ..auth import Principal, get_current_principal
 from ..ml.model import predict_score
+from ..scoring import ItemRow, score_answers
+from ..stats import bump_parent_stats, summary_cache, trend_cache
+from .children import owned_child_query
 
 router = APIRouter(prefix="/assessments", tags=["assessments"])
 
@@ -19,85 +27,104 @@ ARRANGE_ITEMS = [
     ("K U C I N G", "KUCING"),
 ]
 
+
+class ItemSet(NamedTuple):
+    version: str
+    rows: Tuple[dict, ...]  # (item_type, prompt, position) column dicts, in position order
+
+
+@lru_cache(maxsize=1)
+def item_set() -> ItemSet:
+    """Compile the item templates once; the version is a content hash of the set"""
+    rows = []
+    for txt, _ in LETTER_ITEMS:
+        rows.append({"item_type": "letter", "prompt": txt})
+    for txt, _ in WORD_ITEMS:
+        rows.append({"item_type": "word", "prompt": txt})
+    for txt, target in ARRANGE_ITEMS:
+        rows.append({"item_type": "arrange", "prompt": f"{txt} -> {target}"})
+    rows = tuple(dict(row, position=pos) for pos, row in enumerate(rows))
+    version = hashlib.sha1(json.dumps(rows).encode()).hexdigest()[:12]
+    return ItemSet(version=version, rows=rows)
+
+
+def item_counts() -> Tuple[int, int, int]:
+    """Items per type (letter, word, arrange): the denominators of the model's accuracy inputs"""
+    types = [row["item_type"] for row in item_set().rows]
+    return types.count("letter"), types.count("word"), types.count("arrange")
+
+
 @router.post("/start")
-def start_assessment(payload: AssessmentStart, email: str = Depends(get_current_user_email), session: Session = Depends(get_session)):
+def start_assessment(payload: AssessmentStart, principal: Principal = Depends(get_current_principal), session: Session = Depends(get_session)):
     # validate child belongs to user
-    user = session.exec(select(User).where(User.email == email)).first()
-    child = session.get(Child, payload.child_id)
-    if not child or child.parent_id != user.id:
+    child_id = session.exec(owned_child_query(payload.child_id, principal.user_id)).first()
+    if child_id is None:
         raise HTTPException(status_code=404, detail="Child not found")
-    assessment = Assessment(child_id=child.id)
+    parent_id = principal.user_id
+
+    items = item_set()
+    assessment = Assessment(child_id=child_id)
     session.add(assessment)
-    session.commit()
-    session.refresh(assessment)
+    session.flush()  # assigns assessment.id inside the open transaction
+    assessment_id = assessment.id
 
-    # seed items
-    pos = 0
-    for txt, _ in LETTER_ITEMS:
-        session.add(AssessmentItem(assessment_id=assessment.id, item_type="letter", prompt=txt, position=pos)); pos += 1
-    for txt, _ in WORD_ITEMS:
-        session.add(AssessmentItem(assessment_id=assessment.id, item_type="word", prompt=txt, position=pos)); pos += 1
-    for txt, target in ARRANGE_ITEMS:
-        session.add(AssessmentItem(assessment_id=assessment.id, item_type="arrange", prompt=f"{txt} -> {target}", position=pos)); pos += 1
+    # seed all items with one multi-row INSERT, committed together with the assessment
+    session.execute(
+        insert(AssessmentItem),
+        [dict(row, assessment_id=assessment_id) for row in items.rows],
+    )
+    bump_parent_stats(session, parent_id, assessments=1)
     session.commit()
-    return {"assessment_id": assessment.id}
+    summary_cache.invalidate(parent_id)
+    return {"assessment_id": assessment_id, "item_set": items.version}
+
+def submit_items_query(assessment_id: int, parent_id: int):
+    """Items of the assessment, only if it belongs to the parent (one joined query)"""
+    return (
+        select(
+            AssessmentItem.id, AssessmentItem.item_type, AssessmentItem.prompt,
+            Assessment.risk_score, Assessment.child_id,
+        )
+        .join(Assessment, Assessment.id == AssessmentItem.assessment_id)
+        .join(Child, Child.id == Assessment.child_id)
+        .where(AssessmentItem.assessment_id == assessment_id, Child.parent_id == parent_id)
+        .order_by(AssessmentItem.position)
+    )
+
 
 @router.post("/submit", response_model=AssessmentOut)
-def submit_assessment(payload: AssessmentSubmit, email: str = Depends(get_current_user_email), session: Session = Depends(get_session)):
-    assessment = session.get(Assessment, payload.assessment_id)
-    if not assessment:
+def submit_assessment(payload: AssessmentSubmit, principal: Principal = Depends(get_current_principal), session: Session = Depends(get_session)):
+    rows = session.exec(submit_items_query(payload.assessment_id, principal.user_id)).all()
+    if not rows:
         raise HTTPException(status_code=404, detail="Assessment not found")
-    # Map answers
-    items = session.exec(select(AssessmentItem).where(AssessmentItem.assessment_id == assessment.id)).all()
-    # Sort items by position to allow sequential mapping when client doesn't know DB IDs
-    items_sorted = sorted(items, key=lambda x: x.position)
-    id2item = {i.id: i for i in items}
-
-    correct_letters = 0
-    total_letters = 0
-    correct_words = 0
-    total_words = 0
-    correct_arrange = 0
-    total_arrange = 0
-
-    for idx, ans in enumerate(payload.answers):
-        item = id2item.get(ans.id)
-        if not item:
-            # Fallback: map by order
-            if idx < len(items_sorted):
-                item = items_sorted[idx]
-            else:
-                continue
-        item.answer = ans.answer
-        if item.item_type == "letter":
-            total_letters += 1
-            item.is_correct = (ans.answer.strip().upper() == item.prompt.strip().upper())
-            if item.is_correct:
-                correct_letters += 1
-        elif item.item_type == "word":
-            total_words += 1
-            item.is_correct = (ans.answer.strip().lower() == item.prompt.strip().lower())
-            if item.is_correct:
-                correct_words += 1
-        else:  # arrange
-            total_arrange += 1
-            # prompt format: "K U C I N G -> KUCING"
-            target = item.prompt.split("->")[-1].strip()
-            item.is_correct = (ans.answer.replace(" ", "").upper() == target.upper())
-            if item.is_correct:
-                correct_arrange += 1
-    session.commit()
 
-    letters_acc = (correct_letters / total_letters) if total_letters else 0.0
-    words_acc = (correct_words / total_words) if total_words else 0.0
-    arrange_acc = (correct_arrange / total_arrange) if total_arrange else 0.0
+    previous_risk, child_id, parent_id = rows[0][3], rows[0][4], principal.user_id
+    result = score_answers(
+        [ItemRow(*row[:3]) for row in rows],
+        [(ans.id, ans.answer) for ans in payload.answers],
+    )
+    risk, rec = predict_score(
+        result.accuracy("letter"), result.accuracy("word"), result.accuracy("arrange")
+    )
 
-    risk, rec = predict_score(letters_acc, words_acc, arrange_acc)
-
-    assessment.submitted_at = datetime.utcnow()
-    assessment.risk_score = risk
-    assessment.recommendation = rec
-    session.add(assessment)
+    # answers and result are written in one transaction
+    if result.updates:
+        session.execute(update(AssessmentItem), result.updates)
+    submitted_at = datetime.utcnow()
+    session.execute(
+        update(Assessment)
+        .where(Assessment.id == payload.assessment_id)
+        .values(submitted_at=submitted_at, risk_score=risk, recommendation=rec)
+    )
+    # a re-submit replaces the previous score instead of adding another one
+    bump_parent_stats(
+        session, parent_id,
+        risk_delta=risk - (previous_risk or 0.0),
+        risk_count=0 if previous_risk is not None else 1,
+        last_assessed_at=submitted_at,
+    )
     session.commit()
+    summary_cache.invalidate(parent_id)
+    trend_cache.invalidate(child_id)
 
-    return AssessmentOut(id=assessment.id, risk_score=risk, recommendation=rec)
\ No newline at end of file
+    return AssessmentOut(id=payload.assessment_id, risk_score=risk, recommendation=rec)
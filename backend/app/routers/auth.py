@@ -1,27 +1,58 @@
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session, select
+from starlette.concurrency import run_in_threadpool
 from ..db import get_session
 from ..models import User
 from ..schemas import UserCreate, UserLogin, TokenOut
-from ..auth import hash_password, verify_password, create_access_token
+from ..auth import hash_password_async, verify_and_update_password_async, create_access_token
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-@router.post("/register", response_model=TokenOut)
-def register(payload: UserCreate, session: Session = Depends(get_session)):
-    exists = session.exec(select(User).where(User.email == payload.email)).first()
-    if exists:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    user = User(email=payload.email, password_hash=hash_password(payload.password))
+# The routes are async so bcrypt is awaited on the event loop (it runs in the
+# hashing pool); only the short DB steps borrow a threadpool worker.
+
+
+def user_query(email: str):
+    return select(User).where(User.email == email)
+
+
+def _user_by_email(session: Session, email: str) -> Optional[User]:
+    return session.exec(user_query(email)).first()
+
+
+def _create_user(session: Session, email: str, password_hash: str) -> TokenOut:
+    user = User(email=email, password_hash=password_hash)
     session.add(user)
+    session.flush()
+    token = create_access_token(user.email, user_id=user.id)
     session.commit()
-    token = create_access_token(user.email)
     return TokenOut(access_token=token)
 
+
+def _update_hash(session: Session, user: User, password_hash: str) -> None:
+    user.password_hash = password_hash
+    session.add(user)
+    session.commit()
+
+
+@router.post("/register", response_model=TokenOut)
+async def register(payload: UserCreate, session: Session = Depends(get_session)):
+    if await run_in_threadpool(_user_by_email, session, payload.email):
+        raise HTTPException(status_code=400, detail="Email already registered")
+    password_hash = await hash_password_async(payload.password)
+    return await run_in_threadpool(_create_user, session, payload.email, password_hash)
+
 @router.post("/login", response_model=TokenOut)
-def login(payload: UserLogin, session: Session = Depends(get_session)):
-    user = session.exec(select(User).where(User.email == payload.email)).first()
-    if not user or not verify_password(payload.password, user.password_hash):
+async def login(payload: UserLogin, session: Session = Depends(get_session)):
+    user = await run_in_threadpool(_user_by_email, session, payload.email)
+    if not user:
         raise HTTPException(status_code=400, detail="Invalid credentials")
-    token = create_access_token(user.email)
-    return TokenOut(access_token=token)
\ No newline at end of file
+    ok, new_hash = await verify_and_update_password_async(payload.password, user.password_hash)
+    if not ok:
+        raise HTTPException(status_code=400, detail="Invalid credentials")
+    token = create_access_token(user.email, user_id=user.id)
+    if new_hash:
+        # stored hash used an outdated bcrypt cost; upgrade it transparently
+        await run_in_threadpool(_update_hash, session, user, new_hash)
+    return TokenOut(access_token=token)
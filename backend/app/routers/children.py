@@ -1,25 +1,136 @@
-from fastapi import APIRouter, Depends
+import base64
+import json
+from datetime import datetime
+from typing import Iterator, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import tuple_
 from sqlmodel import Session, select
-from ..db import get_session
-from ..models import User, Child
-from ..schemas import ChildCreate, ChildOut
-from ..auth import get_current_user_email
+from ..db import engine, get_session
+from ..models import Assessment, Child
+from ..schemas import AssessmentHistoryItem, AssessmentPage, ChildCreate, ChildOut, ChildTrend
+from ..auth import Principal, get_current_principal
+from ..stats import child_trend, trend_cache
 
 router = APIRouter(prefix="/children", tags=["children"])
 
+STREAM_PAGE_SIZE = 500
+
+def children_query(parent_id: int):
+    return select(Child).where(Child.parent_id == parent_id)
+
+
+def owned_child_query(child_id: int, parent_id: int):
+    return select(Child.id).where(Child.id == child_id, Child.parent_id == parent_id)
+
+
 @router.get("/", response_model=list[ChildOut])
-def list_children(email: str = Depends(get_current_user_email), session: Session = Depends(get_session)):
-    user = session.exec(select(User).where(User.email == email)).first()
-    if not user:
-        return []
-    children = session.exec(select(Child).where(Child.parent_id == user.id)).all()
+def list_children(principal: Principal = Depends(get_current_principal), session: Session = Depends(get_session)):
+    children = session.exec(children_query(principal.user_id)).all()
     return children
 
 @router.post("/", response_model=ChildOut)
-def create_child(payload: ChildCreate, email: str = Depends(get_current_user_email), session: Session = Depends(get_session)):
-    user = session.exec(select(User).where(User.email == email)).first()
-    child = Child(parent_id=user.id, name=payload.name, age=payload.age)
+def create_child(payload: ChildCreate, principal: Principal = Depends(get_current_principal), session: Session = Depends(get_session)):
+    child = Child(parent_id=principal.user_id, name=payload.name, age=payload.age)
     session.add(child)
     session.commit()
     session.refresh(child)
-    return child
\ No newline at end of file
+    return child
+
+
+def _require_child(session: Session, child_id: int, parent_id: int) -> None:
+    owned = session.exec(owned_child_query(child_id, parent_id)).first()
+    if owned is None:
+        raise HTTPException(status_code=404, detail="Child not found")
+
+
+def _encode_cursor(submitted_at: datetime, assessment_id: int) -> str:
+    raw = json.dumps([submitted_at.isoformat(), assessment_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        at, assessment_id = json.loads(raw)
+        return datetime.fromisoformat(at), int(assessment_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def history_query(child_id: int, limit: int, after: Optional[Tuple[datetime, int]]):
+    """One page of submitted assessments, newest first, strictly older than ``after``"""
+    query = select(
+        Assessment.id, Assessment.started_at, Assessment.submitted_at,
+        Assessment.risk_score, Assessment.recommendation,
+    ).where(Assessment.child_id == child_id, Assessment.submitted_at.is_not(None))
+    if after is not None:
+        # keyset: seeks into (child_id, submitted_at, id) instead of skipping OFFSET rows
+        query = query.where(tuple_(Assessment.submitted_at, Assessment.id) < tuple_(*after))
+    return query.order_by(Assessment.submitted_at.desc(), Assessment.id.desc()).limit(limit)
+
+
+def _history_page(session: Session, child_id: int, limit: int, after: Optional[Tuple[datetime, int]]):
+    rows = session.exec(history_query(child_id, limit, after)).all()
+    return [AssessmentHistoryItem(
+        id=aid, started_at=started, submitted_at=submitted, risk_score=risk, recommendation=rec,
+    ) for aid, started, submitted, risk, rec in rows]
+
+
+def _stream_history(child_id: int, after: Optional[Tuple[datetime, int]]) -> Iterator[bytes]:
+    # own session: request dependencies are closed before the body is streamed
+    with Session(engine) as session:
+        while True:
+            page = _history_page(session, child_id, STREAM_PAGE_SIZE, after)
+            if page:
+                yield "".join(item.model_dump_json() + "\n" for item in page).encode()
+            if len(page) < STREAM_PAGE_SIZE:
+                return
+            after = (page[-1].submitted_at, page[-1].id)
+            session.rollback()  # don't hold a read transaction between pages
+
+
+@router.get("/{child_id}/assessments", response_model=AssessmentPage)
+def list_assessments(
+    child_id: int,
+    request: Request,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    principal: Principal = Depends(get_current_principal),
+    session: Session = Depends(get_session),
+):
+    """Submitted assessments, newest first.
+
+    With ``Accept: application/x-ndjson`` the whole remaining history is
+    streamed as one JSON object per line instead of a single page.
+    """
+    _require_child(session, child_id, principal.user_id)
+    after = _decode_cursor(cursor) if cursor else None
+    if "ndjson" in request.headers.get("accept", ""):
+        return StreamingResponse(_stream_history(child_id, after), media_type="application/x-ndjson")
+    items = _history_page(session, child_id, limit, after)
+    next_cursor = None
+    if len(items) == limit:
+        next_cursor = _encode_cursor(items[-1].submitted_at, items[-1].id)
+    return AssessmentPage(items=items, next_cursor=next_cursor)
+
+
+@router.get("/{child_id}/trend", response_model=ChildTrend)
+def trend(
+    child_id: int,
+    window: int = Query(5, ge=1, le=100),
+    points: int = Query(100, ge=1, le=1000),
+    principal: Principal = Depends(get_current_principal),
+    session: Session = Depends(get_session),
+):
+    """Rolling average of risk_score over the last ``window`` assessments, oldest point first"""
+    cached = trend_cache.get(child_id)
+    if cached is not None and cached[0] == principal.user_id and (window, points) in cached[1]:
+        return cached[1][(window, points)]
+    if cached is None or cached[0] != principal.user_id:
+        _require_child(session, child_id, principal.user_id)
+        cached = (principal.user_id, {})
+    data = child_trend(session, child_id, window, points)
+    variants = cached[1] if len(cached[1]) < 8 else {}  # bound odd window/points combinations
+    trend_cache.set(child_id, (cached[0], {**variants, (window, points): data}))
+    return data
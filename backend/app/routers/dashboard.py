@@ -1,22 +1,55 @@
-from fastapi import APIRouter, Depends
-from sqlmodel import Session, select, func
-from ..db import get_session
-from ..models import User, Child, Assessment
+import hashlib
+from typing import Optional, Tuple
+from fastapi import APIRouter, Depends, Request, Response
+from sqlmodel import Session
+from ..config import settings
+from ..db import AsyncSession, get_async_session, get_session
+from ..models import ParentStats
 from ..schemas import DashboardSummary
-from ..auth import get_current_user_email
+from ..auth import Principal, get_current_principal, get_current_principal_async
+from ..stats import summary_cache
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
-@router.get("/summary", response_model=DashboardSummary)
-def summary(email: str = Depends(get_current_user_email), session: Session = Depends(get_session)):
-    user = session.exec(select(User).where(User.email == email)).first()
-    if not user:
-        return DashboardSummary(total_assessments=0, average_risk=None)
-    child_ids = session.exec(select(Child.id).where(Child.parent_id == user.id)).all()
-    if not child_ids:
-        return DashboardSummary(total_assessments=0, average_risk=None)
-    total = session.exec(select(func.count(Assessment.id)).where(Assessment.child_id.in_(child_ids))).one()
-    avg = session.exec(select(func.avg(Assessment.risk_score)).where(Assessment.child_id.in_(child_ids))).one()
-    total_assessments = int(total) if total is not None else 0
-    average_risk = float(avg) if avg is not None else None
-    return DashboardSummary(total_assessments=total_assessments, average_risk=average_risk)
\ No newline at end of file
+
+def _cache_summary(parent_id: int, stats: Optional[ParentStats]) -> Tuple[DashboardSummary, str]:
+    if stats is None:
+        data = DashboardSummary(total_assessments=0, average_risk=None)
+    else:
+        data = DashboardSummary(
+            total_assessments=stats.assessment_count,
+            average_risk=(stats.risk_sum / stats.risk_count) if stats.risk_count else None,
+            last_assessed_at=stats.last_assessed_at,
+        )
+    etag = '"%s"' % hashlib.sha1(data.model_dump_json().encode()).hexdigest()[:16]
+    cached = (data, etag)
+    summary_cache.set(parent_id, cached)
+    return cached
+
+
+def _respond(request: Request, response: Response, cached: Tuple[DashboardSummary, str]):
+    data, etag = cached
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return data
+
+
+def summary(request: Request, response: Response, principal: Principal = Depends(get_current_principal), session: Session = Depends(get_session)):
+    cached = summary_cache.get(principal.user_id)
+    if cached is None:
+        cached = _cache_summary(principal.user_id, session.get(ParentStats, principal.user_id))
+    return _respond(request, response, cached)
+
+
+async def summary_async(request: Request, response: Response, principal: Principal = Depends(get_current_principal_async), session: AsyncSession = Depends(get_async_session)):
+    # Same as summary on the async engine (DB_ASYNC=1): no threadpool slot per request
+    cached = summary_cache.get(principal.user_id)
+    if cached is None:
+        cached = _cache_summary(principal.user_id, await session.get(ParentStats, principal.user_id))
+    return _respond(request, response, cached)
+
+
+router.add_api_route("/summary", summary_async if settings.db_async else summary,
+                     methods=["GET"], response_model=DashboardSummary)
@@ -1,3 +1,4 @@
+from datetime import datetime
 from pydantic import BaseModel
 from typing import List, Optional
 
@@ -43,4 +44,27 @@ class AssessmentOut(BaseModel):
 
 class DashboardSummary(BaseModel):
     total_assessments: int
-    average_risk: Optional[float]
\ No newline at end of file
+    average_risk: Optional[float]
+    last_assessed_at: Optional[datetime] = None
+
+class AssessmentHistoryItem(BaseModel):
+    id: int
+    started_at: datetime
+    submitted_at: datetime
+    risk_score: Optional[float]
+    recommendation: Optional[str]
+
+class AssessmentPage(BaseModel):
+    items: List[AssessmentHistoryItem]
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next (older) page
+
+class TrendPoint(BaseModel):
+    assessment_id: int
+    submitted_at: datetime
+    risk_score: float
+    rolling_average: float
+
+class ChildTrend(BaseModel):
+    child_id: int
+    window: int
+    points: List[TrendPoint]  # oldest first
@@ -0,0 +1,73 @@
+from typing import Callable, Dict, List, NamedTuple, Sequence, Tuple
+
+# item_type -> check(prompt, answer) -> is_correct
+ITEM_TYPES: Dict[str, Callable[[str, str], bool]] = {}
+
+
+def register_item_type(name: str):
+    def decorator(check: Callable[[str, str], bool]):
+        ITEM_TYPES[name] = check
+        return check
+    return decorator
+
+
+@register_item_type("letter")
+def _check_letter(prompt: str, answer: str) -> bool:
+    return answer.strip().upper() == prompt.strip().upper()
+
+
+@register_item_type("word")
+def _check_word(prompt: str, answer: str) -> bool:
+    return answer.strip().lower() == prompt.strip().lower()
+
+
+@register_item_type("arrange")
+def _check_arrange(prompt: str, answer: str) -> bool:
+    # prompt format: "K U C I N G -> KUCING"
+    target = prompt.split("->")[-1].strip()
+    return answer.replace(" ", "").upper() == target.upper()
+
+
+class ItemRow(NamedTuple):
+    id: int
+    item_type: str
+    prompt: str
+
+
+class ScoreResult(NamedTuple):
+    updates: List[dict]  # {"id", "answer", "is_correct"} rows for a bulk UPDATE
+    correct: Dict[str, int]
+    total: Dict[str, int]
+
+    def accuracy(self, item_type: str) -> float:
+        total = self.total.get(item_type, 0)
+        return (self.correct.get(item_type, 0) / total) if total else 0.0
+
+
+def score_answers(items: Sequence[ItemRow], answers: Sequence[Tuple[int, str]]) -> ScoreResult:
+    """Match answers to items and count correct/total per item type in one pass.
+
+    ``items`` must be in position order: an answer whose id is not one of the
+    assessment's items is mapped by its index, for clients that don't know DB ids.
+    """
+    by_id = {item.id: item for item in items}
+    answered: Dict[int, Tuple[ItemRow, str]] = {}
+    for idx, (item_id, answer) in enumerate(answers):
+        item = by_id.get(item_id)
+        if item is None:
+            if idx >= len(items):
+                continue
+            item = items[idx]
+        answered[item.id] = (item, answer)  # a repeated item keeps its last answer
+
+    updates, correct, total = [], {}, {}
+    for item, answer in answered.values():
+        check = ITEM_TYPES.get(item.item_type)
+        is_correct = check(item.prompt, answer) if check else None
+        updates.append({"id": item.id, "answer": answer, "is_correct": is_correct})
+        if check is None:
+            continue
+        total[item.item_type] = total.get(item.item_type, 0) + 1
+        if is_correct:
+            correct[item.item_type] = correct.get(item.item_type, 0) + 1
+    return ScoreResult(updates=updates, correct=correct, total=total)
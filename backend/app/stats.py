@@ -0,0 +1,152 @@
+import sys
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import delete, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select, func
+from .cache import TTLCache
+from .config import settings
+from .models import Assessment, Child, ParentStats
+from .schemas import ChildTrend, TrendPoint
+
+# Per-parent dashboard summaries: user id -> (DashboardSummary, etag)
+summary_cache = TTLCache(maxsize=10_000, ttl=settings.dashboard_cache_ttl)
+# Per-child trends: child id -> (parent id, {(window, points): ChildTrend})
+trend_cache = TTLCache(maxsize=10_000, ttl=settings.dashboard_cache_ttl)
+
+
+def bump_parent_stats(
+    session: Session,
+    parent_id: int,
+    assessments: int = 0,
+    risk_delta: float = 0.0,
+    risk_count: int = 0,
+    last_assessed_at: Optional[datetime] = None,
+) -> None:
+    """Apply deltas to a parent's stats row inside the caller's transaction"""
+    values = {
+        "assessment_count": ParentStats.assessment_count + assessments,
+        "risk_sum": ParentStats.risk_sum + risk_delta,
+        "risk_count": ParentStats.risk_count + risk_count,
+    }
+    if last_assessed_at is not None:
+        values["last_assessed_at"] = last_assessed_at
+    bump = update(ParentStats).where(ParentStats.parent_id == parent_id).values(**values)
+    if session.execute(bump).rowcount > 0:
+        return
+    # No row yet (new parent or never backfilled): compute it from the
+    # assessments, which already include this transaction's changes. A
+    # concurrent first write for the same parent can insert the row first;
+    # then only the savepoint is rolled back and the deltas go to that row.
+    try:
+        with session.begin_nested():
+            rows = _aggregate_rows(session, parent_id)
+            if rows:
+                session.execute(insert(ParentStats), rows)
+    except IntegrityError:
+        session.execute(bump)
+
+
+def aggregate_query(parent_id: Optional[int] = None):
+    """Per-parent stats computed from the assessment table"""
+    query = (
+        select(
+            Child.parent_id,
+            func.count(Assessment.id),
+            func.coalesce(func.sum(Assessment.risk_score), 0.0),
+            func.count(Assessment.risk_score),
+            func.max(Assessment.submitted_at),
+        )
+        .join(Child, Child.id == Assessment.child_id)
+        .group_by(Child.parent_id)
+    )
+    if parent_id is not None:
+        query = query.where(Child.parent_id == parent_id)
+    return query
+
+
+def _aggregate_rows(session: Session, parent_id: Optional[int] = None) -> List[dict]:
+    return [
+        {
+            "parent_id": pid,
+            "assessment_count": count,
+            "risk_sum": float(risk_sum),
+            "risk_count": risk_count,
+            "last_assessed_at": last,
+        }
+        for pid, count, risk_sum, risk_count, last in session.exec(aggregate_query(parent_id)).all()
+    ]
+
+
+def rebuild_parent_stats(session: Session, parent_id: Optional[int] = None) -> int:
+    """Recompute stats rows from the assessment table; returns rows written"""
+    rows = _aggregate_rows(session, parent_id)
+    clear = delete(ParentStats)
+    if parent_id is not None:
+        clear = clear.where(ParentStats.parent_id == parent_id)
+    session.execute(clear)
+    if rows:
+        session.execute(insert(ParentStats), rows)
+    return len(rows)
+
+
+def trend_query(child_id: int, window: int, points: int):
+    """Rolling average of the last ``window`` risk scores at each of the latest ``points`` assessments.
+
+    The window function runs in the database over the child's
+    (child_id, submitted_at, id) index, so only ``points`` rows come back.
+    """
+    rolling = func.avg(Assessment.risk_score).over(
+        order_by=(Assessment.submitted_at, Assessment.id),
+        rows=(-(window - 1), 0),
+    )
+    history = (
+        select(
+            Assessment.id, Assessment.submitted_at, Assessment.risk_score,
+            rolling.label("rolling_average"),
+        )
+        .where(
+            Assessment.child_id == child_id,
+            Assessment.submitted_at.is_not(None),
+            Assessment.risk_score.is_not(None),
+        )
+        .subquery()
+    )
+    return (
+        select(history.c.id, history.c.submitted_at, history.c.risk_score, history.c.rolling_average)
+        .order_by(history.c.submitted_at.desc(), history.c.id.desc())
+        .limit(points)
+    )
+
+
+def child_trend(session: Session, child_id: int, window: int, points: int) -> ChildTrend:
+    rows = session.exec(trend_query(child_id, window, points)).all()
+    return ChildTrend(
+        child_id=child_id,
+        window=window,
+        points=[
+            TrendPoint(assessment_id=aid, submitted_at=at, risk_score=risk, rolling_average=avg)
+            for aid, at, risk, avg in reversed(rows)
+        ],
+    )
+
+
+def ensure_parent_stats(session: Session) -> None:
+    """Backfill once for databases that have assessments but no stats yet"""
+    has_stats = session.exec(select(ParentStats.parent_id).limit(1)).first() is not None
+    has_assessments = session.exec(select(Assessment.id).limit(1)).first() is not None
+    if has_assessments and not has_stats:
+        rebuild_parent_stats(session)
+        session.commit()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python -m app.stats rebuild")
+        sys.exit(1)
+    from .db import engine, init_db
+    init_db()
+    with Session(engine) as session:
+        n = rebuild_parent_stats(session)
+        session.commit()
+    print(f"Rebuilt stats for {n} parents")
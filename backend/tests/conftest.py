@@ -0,0 +1,61 @@
+import os
+import tempfile
+
+# Settings are read at import time; keep the tests off the development database
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/binakata.db")
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+os.environ.setdefault("BCRYPT_ROUNDS", "5")
+os.environ.setdefault("INFERENCE_BACKEND", "rules")
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import Session, SQLModel, create_engine
+
+from app import models
+from app.db import _set_sqlite_pragmas, get_session
+from app.routers import assessments, auth, children, dashboard
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/test.db", connect_args={"check_same_thread": False})
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session(engine):
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture
+def family(session):
+    """A parent with one child; returns (parent_id, child_id)"""
+    parent = models.User(email="parent@example.com", password_hash="x")
+    session.add(parent)
+    session.flush()
+    child = models.Child(parent_id=parent.id, name="Child")
+    session.add(child)
+    session.commit()
+    return parent.id, child.id
+
+
+@pytest.fixture
+def client(engine):
+    """The API routers on the test database"""
+    app = FastAPI()
+    for module in (auth, children, assessments, dashboard):
+        app.include_router(module.router)
+
+    def test_session():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = test_session
+    with TestClient(app) as client:
+        yield client
@@ -0,0 +1,44 @@
+def _login(client, email="parent@example.com"):
+    creds = {"email": email, "password": "Secret123!"}
+    client.post("/auth/register", json=creds)
+    token = client.post("/auth/login", json=creds).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _submit(client, headers, child_id):
+    started = client.post("/assessments/start", json={"child_id": child_id}, headers=headers).json()
+    response = client.post(
+        "/assessments/submit", json={"assessment_id": started["assessment_id"], "answers": []}, headers=headers,
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_submissions_feed_history_trend_and_dashboard(client):
+    headers = _login(client)
+    child_id = client.post("/children/", json={"name": "Budi", "age": 7}, headers=headers).json()["id"]
+    assert client.get("/dashboard/summary", headers=headers).json()["total_assessments"] == 0
+
+    first = _submit(client, headers, child_id)
+    second = _submit(client, headers, child_id)
+
+    summary = client.get("/dashboard/summary", headers=headers).json()
+    assert summary["total_assessments"] == 2
+    assert abs(summary["average_risk"] - (first["risk_score"] + second["risk_score"]) / 2) < 1e-9
+
+    page = client.get(f"/children/{child_id}/assessments?limit=1", headers=headers).json()
+    assert [item["id"] for item in page["items"]] == [second["id"]]
+    older = client.get(f"/children/{child_id}/assessments?limit=1&cursor={page['next_cursor']}", headers=headers).json()
+    assert [item["id"] for item in older["items"]] == [first["id"]]
+
+    trend = client.get(f"/children/{child_id}/trend?window=2", headers=headers).json()
+    assert [p["assessment_id"] for p in trend["points"]] == [first["id"], second["id"]]
+
+
+def test_other_parents_children_are_hidden(client):
+    owner = _login(client, "owner@example.com")
+    child_id = client.post("/children/", json={"name": "Sari"}, headers=owner).json()["id"]
+    stranger = _login(client, "stranger@example.com")
+    assert client.post("/assessments/start", json={"child_id": child_id}, headers=stranger).status_code == 404
+    assert client.get(f"/children/{child_id}/assessments", headers=stranger).status_code == 404
+    assert client.get(f"/children/{child_id}/trend", headers=stranger).status_code == 404
@@ -0,0 +1,69 @@
+import asyncio
+import inspect
+
+from passlib.context import CryptContext
+from sqlmodel import select
+
+from app.models import User
+from app.passwords import PasswordHasher, PasswordHasherBusy
+from app.routers import auth
+
+
+def test_routes_await_the_hasher():
+    assert inspect.iscoroutinefunction(auth.register)
+    assert inspect.iscoroutinefunction(auth.login)
+
+
+def test_register_and_login(client):
+    creds = {"email": "a@example.com", "password": "Secret123!"}
+    assert client.post("/auth/register", json=creds).status_code == 200
+    assert client.post("/auth/register", json=creds).status_code == 400
+
+    response = client.post("/auth/login", json=creds)
+    assert response.status_code == 200
+    assert response.json()["access_token"]
+    assert client.post("/auth/login", json=dict(creds, password="wrong")).status_code == 400
+    assert client.post("/auth/login", json=dict(creds, email="b@example.com")).status_code == 400
+
+
+def test_login_rehashes_an_outdated_cost(client, session):
+    outdated = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=4).hash("Secret123!")
+    session.add(User(email="old@example.com", password_hash=outdated))
+    session.commit()
+
+    response = client.post("/auth/login", json={"email": "old@example.com", "password": "Secret123!"})
+    assert response.status_code == 200
+    session.expire_all()
+    stored = session.exec(select(User.password_hash).where(User.email == "old@example.com")).one()
+    assert stored != outdated
+    assert stored.startswith("$2b$05$")
+
+
+def test_pool_sheds_load_beyond_max_pending():
+    hasher = PasswordHasher(rounds=5, workers=1, max_pending=1)
+
+    async def burst():
+        return await asyncio.gather(*(hasher.hash_async("pw") for _ in range(3)), return_exceptions=True)
+
+    try:
+        results = asyncio.run(burst())
+        assert sum(isinstance(r, PasswordHasherBusy) for r in results) == 2
+        assert hasher.rejected == 2
+        ok, _ = asyncio.run(hasher.verify_and_update_async("pw", results[0]))  # the slot was released
+        assert ok
+    finally:
+        hasher.shutdown()
+
+
+def test_token_cache_lookups_are_exported(client):
+    from app.auth import TOKEN_CACHE_LOOKUPS
+
+    def lookups(result):
+        return TOKEN_CACHE_LOOKUPS.labels(result)._child.total()[0]
+
+    creds = {"email": "cache@example.com", "password": "Secret123!"}
+    token = client.post("/auth/register", json=creds).json()["access_token"]
+    hits, misses = lookups("hit"), lookups("miss")
+    for _ in range(3):
+        assert client.get("/children/", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+    assert (lookups("hit") - hits, lookups("miss") - misses) == (2, 1)
@@ -0,0 +1,53 @@
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import models
+from app.auth import create_access_token
+from app.db import AsyncSession, get_async_session
+from app.routers import dashboard
+from app.stats import summary_cache
+
+
+@pytest.fixture
+def async_client(engine, session, family):
+    """Only the async summary route, on an aiosqlite engine over the test database"""
+    pytest.importorskip("aiosqlite")
+    summary_cache.clear()
+    async_engine = create_async_engine(str(engine.url).replace("sqlite://", "sqlite+aiosqlite://"))
+    app = FastAPI()
+    app.add_api_route("/dashboard/summary", dashboard.summary_async, methods=["GET"])
+
+    async def test_session():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
+
+    app.dependency_overrides[get_async_session] = test_session
+    with TestClient(app) as client:
+        yield client
+    summary_cache.clear()
+
+
+def test_async_summary_reads_the_parent_stats(async_client, session, family):
+    parent_id, _ = family
+    session.add(models.ParentStats(parent_id=parent_id, assessment_count=2, risk_sum=0.5, risk_count=2,
+                                   last_assessed_at=datetime(2030, 1, 1)))
+    session.commit()
+    headers = {"Authorization": f"Bearer {create_access_token('parent@example.com', user_id=parent_id)}"}
+
+    response = async_client.get("/dashboard/summary", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["total_assessments"] == 2
+    assert response.json()["average_risk"] == pytest.approx(0.25)
+    etag = response.headers["etag"]
+    assert async_client.get("/dashboard/summary", headers=dict(headers, **{"If-None-Match": etag})).status_code == 304
+
+
+def test_async_principal_resolves_legacy_tokens(async_client, family):
+    headers = {"Authorization": f"Bearer {create_access_token('parent@example.com')}"}
+    assert async_client.get("/dashboard/summary", headers=headers).json()["total_assessments"] == 0
+    unknown = {"Authorization": f"Bearer {create_access_token('nobody@example.com')}"}
+    assert async_client.get("/dashboard/summary", headers=unknown).status_code == 401
@@ -0,0 +1,57 @@
+import pytest
+from sqlmodel import SQLModel
+
+from app import migrations
+from app.models import SchemaMigration
+
+HOT_INDEXES = ("ix_child_parent_id", "ix_assessment_child_submitted", "ix_assessmentitem_assessment_position")
+
+# index each hot query must search through
+EXPECTED_INDEX = {
+    "auth.user": "ix_user_email",
+    "children.list": "ix_child_parent_id",
+    "children.assessments": "ix_assessment_child_submitted",
+    "children.assessments.next": "ix_assessment_child_submitted",
+    "children.trend": "ix_assessment_child_submitted",
+    "assessments.submit.items": "ix_assessmentitem_assessment_position",
+    "stats.parent": "ix_child_parent_id",
+}
+
+
+@pytest.fixture
+def old_database(engine):
+    """A database created before the hot-path indexes existed"""
+    with engine.begin() as conn:
+        for name in HOT_INDEXES:
+            conn.exec_driver_sql(f"DROP INDEX {name}")
+        SchemaMigration.__table__.drop(conn)
+    return engine
+
+
+def _plans(engine):
+    with engine.connect() as conn:
+        return {name: migrations._plan(conn, q) for name, q in migrations.hot_queries().items()}
+
+
+def test_old_database_scans_without_the_indexes(old_database):
+    failures = migrations.check_plans(old_database)
+    assert {"children.list", "children.assessments", "assessments.submit.items"} <= set(failures)
+
+
+def test_upgrade_indexes_every_hot_query(old_database):
+    assert migrations.upgrade(old_database) == [1]
+    assert migrations.upgrade(old_database) == []
+    assert migrations.check_plans(old_database) == {}
+
+    plans = _plans(old_database)
+    for name, index in EXPECTED_INDEX.items():
+        assert any(index in line for line in plans[name]), (name, plans[name])
+    for name, plan in plans.items():
+        for line in plan:
+            assert not line.startswith(("SCAN assessment", "SCAN assessmentitem", "SCAN child")), (name, line)
+
+
+def test_fresh_database_records_the_migrations(engine):
+    SQLModel.metadata.create_all(engine)
+    assert migrations.upgrade(engine) == [1]
+    assert migrations.check_plans(engine) == {}
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from app.ml import model
+from app.ml.model import ModelRegistry
+
+
+class ConstantKeras:
+    """Stands in for a Keras model: scores every row with the float stored in its file"""
+
+    def __init__(self, path):
+        with open(path) as f:
+            self.value = float(f.read())
+
+
+@pytest.fixture
+def artifacts(tmp_path, monkeypatch):
+    keras_path, npz_path = str(tmp_path / "m.keras"), str(tmp_path / "m.npz")
+    monkeypatch.setattr(model, "MODEL_PATH", keras_path)
+    monkeypatch.setattr(model, "NPZ_PATH", npz_path)
+    monkeypatch.setattr(model, "_load_or_train_keras", ConstantKeras)
+    exports = []
+
+    def export(keras_model, path):
+        exports.append(keras_model.value)
+        mlp = model.NumpyMLP([(np.zeros((3, 1)), np.full(1, keras_model.value), "linear")])
+        mlp.save(path)
+        return mlp
+
+    monkeypatch.setattr(model, "export_keras", export)
+    return keras_path, exports
+
+
+def _score(registry):
+    return float(registry.get().predict(np.zeros((1, 3), dtype="float32"))[0, 0])
+
+
+def test_numpy_engine_reexports_when_the_keras_source_changes(artifacts):
+    keras_path, exports = artifacts
+    with open(keras_path, "w") as f:
+        f.write("0.25")
+    registry = ModelRegistry(check_interval=0.0, engine="auto")
+    assert _score(registry) == pytest.approx(0.25)
+    assert registry.stats()["source"] == keras_path
+
+    with open(keras_path, "w") as f:
+        f.write("0.875")  # new size, so the change shows even with coarse mtimes
+    assert _score(registry) == pytest.approx(0.875)
+    assert exports == [0.25, 0.875]
+    assert registry.loads == 2
+
+    # unchanged source: the export is reused, nothing is reloaded
+    assert _score(registry) == pytest.approx(0.875)
+    assert registry.loads == 2
+
+
+def test_fresh_export_is_loaded_without_reexporting(artifacts):
+    keras_path, exports = artifacts
+    with open(keras_path, "w") as f:
+        f.write("0.5")
+    ModelRegistry(engine="auto").get()
+    registry = ModelRegistry(engine="auto")
+    assert _score(registry) == pytest.approx(0.5)
+    assert exports == [0.5]
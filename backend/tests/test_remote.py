@@ -0,0 +1,233 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.ml import model
+from app.ml.remote import (
+    REMOTE_BREAKER, REMOTE_LATENCY, REMOTE_REQUESTS, REMOTE_RETRIES,
+    CircuitBreaker, RemoteInvalid, RemoteScorer, RemoteUnavailable,
+)
+
+
+MALFORMED = {
+    "reject": (422, b'{"detail": "bad input"}'),
+    "not_json": (200, b"<html>proxy error</html>"),
+    "no_score": (200, b'{"recommendation": "?"}'),
+}
+
+
+class StubML:
+    """Local /predict stub; ``mode`` is ok, flaky (fail ``fail_next`` calls), slow, closing,
+    or a malformed answer: reject (422), not_json or no_score"""
+
+    def __init__(self):
+        self.mode = "ok"
+        self.fail_next = 0
+        self.hits = 0
+        self.connections = set()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers["Content-Length"]))
+                stub.hits += 1
+                stub.connections.add(self.client_address)
+                if stub.mode == "slow":
+                    time.sleep(0.5)
+                if stub.mode == "flaky" and stub.fail_next > 0:
+                    stub.fail_next -= 1
+                    return self._reply(503, b"{}")
+                if stub.mode in MALFORMED:
+                    return self._reply(*MALFORMED[stub.mode])
+                self._reply(200, json.dumps({"risk_score": 0.25}).encode())
+                if stub.mode == "closing":
+                    # keep-alive response, then drop the socket like an idle timeout would
+                    self.close_connection = True
+
+            def _reply(self, status, body):
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = "http://127.0.0.1:%d" % self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    stub = StubML()
+    yield stub
+    stub.close()
+
+
+def _value(metric, *labels):
+    child = metric.labels(*labels)._child if labels else metric._default
+    return child.total()[0]
+
+
+def _observations(histogram):
+    return sum(histogram._default.total()[:-1])  # bucket counts, without the sum
+
+
+def _scorer(stub, **kwargs):
+    options = dict(timeout=0.2, retries=0, pool_size=2)
+    options.update(kwargs)
+    return RemoteScorer(stub.url, **options)
+
+
+def test_keep_alive_connections_are_reused(stub):
+    scorer = _scorer(stub)
+    observed_before = _observations(REMOTE_LATENCY)
+    ok_before = _value(REMOTE_REQUESTS, "ok")
+    for _ in range(5):
+        assert scorer.predict(1.0, 1.0, 1.0) == 0.25
+    assert (scorer.pool.created, scorer.pool.reused) == (1, 4)
+    assert len(stub.connections) == 1
+    assert _value(REMOTE_REQUESTS, "ok") - ok_before == 5
+    assert _observations(REMOTE_LATENCY) - observed_before == 5
+    scorer.close()
+
+
+def test_reconnects_when_the_server_closed_an_idle_socket(stub):
+    stub.mode = "closing"
+    scorer = _scorer(stub)
+    assert scorer.predict(1.0, 1.0, 1.0) == 0.25
+    time.sleep(0.05)  # let the server's close land
+    assert scorer.predict(1.0, 1.0, 1.0) == 0.25
+    assert scorer.pool.created == 2
+    assert scorer.retried == 0 and scorer.failures == 0  # not counted as a failed attempt
+    scorer.close()
+
+
+def test_retries_a_flaky_server(stub):
+    stub.mode, stub.fail_next = "flaky", 1
+    retries_before = _value(REMOTE_RETRIES)
+    scorer = _scorer(stub, retries=1)
+    assert scorer.predict(1.0, 1.0, 1.0) == 0.25
+    assert (stub.hits, scorer.retried, scorer.failures) == (2, 1, 0)
+    assert _value(REMOTE_RETRIES) - retries_before == 1
+    assert scorer.breaker.state == "closed"
+
+    stub.fail_next = 2
+    with pytest.raises(RemoteUnavailable):
+        scorer.predict(1.0, 1.0, 1.0)
+    assert (stub.hits, scorer.retried, scorer.failures) == (4, 2, 1)
+
+
+def test_slow_server_times_out_each_attempt(stub):
+    stub.mode = "slow"
+    failed_before = _value(REMOTE_REQUESTS, "failed")
+    scorer = _scorer(stub, timeout=0.1, retries=1)
+    started = time.perf_counter()
+    with pytest.raises(RemoteUnavailable, match="timed out"):
+        scorer.predict(1.0, 1.0, 1.0)
+    assert time.perf_counter() - started < 0.45  # two 0.1s attempts, not the server's 0.5s
+    assert scorer.retried == 1
+    assert _value(REMOTE_REQUESTS, "failed") - failed_before == 1
+
+
+def test_breaker_opens_half_opens_and_closes(stub):
+    stub.mode, stub.fail_next = "flaky", 10**6
+    states_before = {s: _value(REMOTE_BREAKER, s) for s in ("closed", "open", "half_open")}
+    rejected_before = _value(REMOTE_REQUESTS, "rejected")
+    scorer = _scorer(stub, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=0.2))
+
+    def state_delta():
+        return {s: _value(REMOTE_BREAKER, s) - before for s, before in states_before.items()}
+
+    for _ in range(2):
+        with pytest.raises(RemoteUnavailable):
+            scorer.predict(1.0, 1.0, 1.0)
+    assert scorer.breaker.state == "open"
+    assert state_delta() == {"closed": 0, "open": 1, "half_open": 0}
+
+    with pytest.raises(RemoteUnavailable, match="circuit open"):
+        scorer.predict(1.0, 1.0, 1.0)
+    assert stub.hits == 2  # rejected without calling the service
+    assert _value(REMOTE_REQUESTS, "rejected") - rejected_before == 1
+
+    time.sleep(0.25)
+    with pytest.raises(RemoteUnavailable):  # failed trial call re-opens
+        scorer.predict(1.0, 1.0, 1.0)
+    assert scorer.breaker.state == "open" and scorer.breaker.opens == 2
+
+    time.sleep(0.25)
+    stub.fail_next = 0
+    assert scorer.breaker.allow()  # the single trial call is let through
+    assert scorer.breaker.state == "half_open"
+    assert not scorer.breaker.allow()
+    assert state_delta() == {"closed": 0, "open": 0, "half_open": 1}
+    scorer.breaker.record_success()
+
+    assert scorer.predict(1.0, 1.0, 1.0) == 0.25
+    assert scorer.breaker.state == "closed"
+    assert state_delta() == {"closed": 1, "open": 0, "half_open": 0}
+
+
+@pytest.mark.parametrize("mode", sorted(MALFORMED))
+def test_malformed_answers_fall_back_without_tripping_the_breaker(stub, monkeypatch, mode):
+    stub.mode = mode
+    invalid_before = _value(REMOTE_REQUESTS, "invalid")
+    scorer = _scorer(stub, retries=2)
+    with pytest.raises(RemoteInvalid):
+        scorer.predict(1.0, 1.0, 1.0)
+    assert (stub.hits, scorer.retried) == (1, 0)  # not retried
+    assert scorer.breaker.state == "closed"
+    assert _value(REMOTE_REQUESTS, "invalid") - invalid_before == 1
+
+    monkeypatch.setattr(model, "_remote", scorer)
+    monkeypatch.setattr(model.settings, "ml_fallback", "rules")
+    assert model._score_remote(1.0, 1.0, 1.0) == model._score_rules(1.0, 1.0, 1.0)
+    assert scorer.fallbacks == 1
+
+
+def test_trial_call_interrupted_mid_flight_frees_the_half_open_slot(stub, monkeypatch):
+    class Interrupted(BaseException):
+        pass
+
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    scorer = _scorer(stub, breaker=breaker)
+    breaker.record_failure()
+
+    def interrupted(*args):
+        raise Interrupted()
+
+    monkeypatch.setattr(scorer.pool, "request", interrupted)
+    with pytest.raises(Interrupted):
+        scorer.predict(1.0, 1.0, 1.0)  # the half-open trial
+    monkeypatch.undo()
+    assert scorer.predict(1.0, 1.0, 1.0) == 0.25  # a new trial is let through and closes the breaker
+    assert breaker.state == "closed"
+
+
+def test_inference_duration_is_labelled_by_the_scorer_that_answered(stub, monkeypatch):
+    from app.ml.model import INFERENCE_DURATION, predict_score
+
+    def observed(*labels):
+        return sum(INFERENCE_DURATION.labels(*labels)._child.total()[:-1])
+
+    monkeypatch.setattr(model.settings, "inference_backend", "remote")
+    monkeypatch.setattr(model.settings, "ml_fallback", "rules")
+    monkeypatch.setattr(model, "_remote", _scorer(stub))
+    remote_before, fallback_before = observed("remote", "neural_network"), observed("rules", "fallback")
+    assert predict_score(1.0, 1.0, 1.0)[0] == 0.25
+    stub.mode = "no_score"
+    predict_score(1.0, 1.0, 1.0)
+    assert observed("remote", "neural_network") - remote_before == 1
+    assert observed("rules", "fallback") - fallback_before == 1  # the fallback, not "remote"
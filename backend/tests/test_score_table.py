@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from app.ml import model
+from app.ml.model import ScoreTable
+
+
+class MeanModel:
+    """Risk = mean accuracy; counts rows scored"""
+
+    def __init__(self):
+        self.rows = 0
+
+    def predict(self, x, verbose=0):
+        x = np.asarray(x, dtype="float32")
+        self.rows += len(x)
+        return x.mean(axis=1, keepdims=True)
+
+
+@pytest.fixture
+def mean_model(monkeypatch):
+    fake = MeanModel()
+    monkeypatch.setattr(model, "ensure_model", lambda: fake)
+    return fake
+
+
+def test_grid_points_are_served_from_the_table(mean_model):
+    table = ScoreTable()
+    table.set_grid((4, 4, 1))
+    assert table.lookup(0.5, 0.25, 1.0)[0] == pytest.approx(1.75 / 3)
+    assert table.stats()["size"] == 5 * 5 * 2
+    assert table.hits == 1
+    assert mean_model.rows == 50  # one batch for the whole grid
+
+
+@pytest.mark.parametrize("grid", [{}, ()])
+def test_empty_grid_falls_back_to_the_live_scorer(mean_model, grid):
+    table = ScoreTable()
+    table.set_grid(grid)
+    risk, recommendation = table.lookup(0.5, 0.5, 0.5)
+    assert risk == pytest.approx(0.5)
+    assert recommendation.startswith("Risiko sedang")
+    assert table.stats()["size"] == 0
+    assert table.hits == 0
+    assert mean_model.rows == 1  # scored live, no table batch
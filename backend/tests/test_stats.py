@@ -0,0 +1,63 @@
+from datetime import datetime
+
+from sqlalchemy import event
+
+from app.models import Assessment, ParentStats
+from app.stats import bump_parent_stats
+
+
+def _submitted(session, child_id, risk):
+    session.add(Assessment(child_id=child_id, submitted_at=datetime.utcnow(), risk_score=risk))
+    session.flush()
+
+
+def test_first_submit_creates_the_row_from_assessments(session, family):
+    parent_id, child_id = family
+    _submitted(session, child_id, 0.25)
+    bump_parent_stats(session, parent_id, assessments=1, risk_delta=0.25, risk_count=1)
+    session.commit()
+
+    stats = session.get(ParentStats, parent_id)
+    assert (stats.assessment_count, stats.risk_sum, stats.risk_count) == (1, 0.25, 1)
+
+
+def test_later_submits_apply_deltas(session, family):
+    parent_id, child_id = family
+    _submitted(session, child_id, 0.25)
+    bump_parent_stats(session, parent_id, assessments=1, risk_delta=0.25, risk_count=1)
+    session.commit()
+    _submitted(session, child_id, 0.5)
+    bump_parent_stats(session, parent_id, assessments=1, risk_delta=0.5, risk_count=1)
+    session.commit()
+
+    stats = session.get(ParentStats, parent_id)
+    assert (stats.assessment_count, stats.risk_sum, stats.risk_count) == (2, 0.75, 2)
+
+
+def test_first_submit_racing_another_first_submit(engine, session, family):
+    parent_id, child_id = family
+    _submitted(session, child_id, 0.25)
+
+    # Another transaction's first submit inserts the row between our UPDATE
+    # (0 rows) and our INSERT; the raw cursor write lands outside the savepoint
+    raced = []
+
+    def concurrent_insert(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("SAVEPOINT") and not raced:
+            raced.append(True)
+            cursor.execute(
+                "INSERT INTO parentstats (parent_id, assessment_count, risk_sum, risk_count) VALUES (?, 3, 1.5, 3)",
+                (parent_id,),
+            )
+
+    event.listen(engine, "before_cursor_execute", concurrent_insert)
+    try:
+        bump_parent_stats(session, parent_id, assessments=1, risk_delta=0.25, risk_count=1)
+        session.commit()
+    finally:
+        event.remove(engine, "before_cursor_execute", concurrent_insert)
+
+    assert raced
+    stats = session.get(ParentStats, parent_id)
+    assert (stats.assessment_count, stats.risk_sum, stats.risk_count) == (4, 1.75, 4)
+    assert session.get(Assessment, 1).risk_score == 0.25  # the submit itself was kept
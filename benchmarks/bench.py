@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""Latency/throughput benchmarks for the backend and the ML service.
+
+Each service runs in its own child process (both import a top-level
+``app``) with a throwaway working directory, SQLite database and model
+directory. Requests are driven in-process through httpx's ASGI
+transport, so numbers measure the application and not the network.
+
+Needs the services' requirements plus ``benchmarks/requirements.txt`` (httpx).
+
+Usage:
+    python benchmarks/bench.py run --concurrency 16 --requests 400 --out benchmarks/results/latest.json
+    python benchmarks/bench.py run --service ml --save-baseline benchmarks/baselines/ml.json
+    python benchmarks/bench.py compare benchmarks/baselines/all.json benchmarks/results/latest.json --tolerance 0.15
+
+``compare`` exits 1 when any flow's p95 grew or its requests/sec dropped
+by more than the tolerance, or when it has new errors.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVICES = {
+    "backend": os.path.join(ROOT, "backend"),
+    "ml": os.path.join(ROOT, "ml-service"),
+}
+
+
+# -- measurement -----------------------------------------------------------
+
+def _percentile(sorted_values, q: float):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def summarize(latencies, errors: int, elapsed: float) -> dict:
+    lat = sorted(latencies)
+    return {
+        "count": len(lat),
+        "errors": errors,
+        "p50_ms": _percentile(lat, 0.50),
+        "p95_ms": _percentile(lat, 0.95),
+        "p99_ms": _percentile(lat, 0.99),
+        "rps": (len(lat) / elapsed) if elapsed > 0 else None,
+    }
+
+
+def _peak_rss_mb(who) -> float:
+    rss = resource.getrusage(who).ru_maxrss
+    # KiB on Linux, bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+class Recorder:
+    def __init__(self):
+        self.flows = {}
+
+    async def run(self, name: str, n: int, concurrency: int, op):
+        """Call ``op(i)`` for i in range(n) with ``concurrency`` workers; op returns a response"""
+        latencies, errors = [], 0
+        counter = iter(range(n))
+
+        async def worker():
+            nonlocal errors
+            for i in counter:
+                t0 = time.perf_counter()
+                try:
+                    resp = await op(i)
+                    ok = resp.status_code < 400
+                except Exception:
+                    ok = False
+                if ok:
+                    latencies.append((time.perf_counter() - t0) * 1000.0)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        self.flows[name] = summarize(latencies, errors, time.perf_counter() - start)
+        f = self.flows[name]
+        print(f"  {name:24s} n={f['count']:<6d} err={errors:<4d} p50={_fmt(f['p50_ms'])} "
+              f"p95={_fmt(f['p95_ms'])} p99={_fmt(f['p99_ms'])} rps={_fmt(f['rps'])}", flush=True)
+
+
+def _fmt(v) -> str:
+    return "-" if v is None else f"{v:.2f}"
+
+
+# -- flows (run inside the service process) ----------------------------------
+
+async def _lifespan(app, event: str):
+    # ASGITransport doesn't send lifespan events; run the handlers directly
+    await (app.router.startup() if event == "startup" else app.router.shutdown())
+
+
+def _item_ids(assessment_ids) -> dict:
+    """{assessment id: its item ids by position}; the API doesn't return them, so read the bench database"""
+    from sqlmodel import Session, select
+    from app.db import engine
+    from app.models import AssessmentItem
+    ids = {}
+    with Session(engine) as session:
+        rows = session.exec(
+            select(AssessmentItem.assessment_id, AssessmentItem.id)
+            .where(AssessmentItem.assessment_id.in_(assessment_ids))
+            .order_by(AssessmentItem.assessment_id, AssessmentItem.position)
+        )
+        for assessment_id, item_id in rows:
+            ids.setdefault(assessment_id, []).append(item_id)
+    return ids
+
+
+async def backend_flows(app, rec: Recorder, n: int, concurrency: int):
+    import httpx
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as c:
+        users = min(n, 50)
+        password = "Bench123!"
+        tokens = [None] * users
+
+        async def register(i):
+            r = await c.post("/auth/register", json={"email": f"bench{i}@example.com", "password": password})
+            if r.status_code == 200:
+                tokens[i] = r.json()["access_token"]
+            return r
+
+        await rec.run("auth.register", users, concurrency, register)
+        await rec.run("auth.login", n, concurrency, lambda i: c.post(
+            "/auth/login", json={"email": f"bench{i % users}@example.com", "password": password}))
+
+        headers = [{"Authorization": f"Bearer {t}"} for t in tokens]
+        children = []
+        for h in headers:  # setup, not measured
+            children.append((await c.post("/children/", json={"name": "Bench", "age": 8}, headers=h)).json()["id"])
+
+        started = [None] * n
+
+        async def start(i):
+            r = await c.post("/assessments/start", json={"child_id": children[i % users]}, headers=headers[i % users])
+            if r.status_code == 200:
+                started[i] = r.json()["assessment_id"]
+            return r
+
+        item_ids = {}
+
+        async def submit(i):
+            # the assessment's own items, in order, so answers never touch another assessment's rows
+            answers = [{"id": item_id, "answer": a} for item_id, a in zip(
+                item_ids.get(started[i], ()), ["A", "B", "D", "Q", "Paku", "Baku", "Kuda", "Buku", "KUCING"])]
+            return await c.post("/assessments/submit", json={"assessment_id": started[i], "answers": answers},
+                                headers=headers[i % users])
+
+        await rec.run("assessments.start", n, concurrency, start)
+        item_ids.update(_item_ids([a for a in started if a is not None]))  # setup, not measured
+        await rec.run("assessments.submit", n, concurrency, submit)
+        await rec.run("dashboard.summary", n, concurrency, lambda i: c.get("/dashboard/summary", headers=headers[i % users]))
+        await rec.run("children.trend", n, concurrency, lambda i: c.get(
+            f"/children/{children[i % users]}/trend", headers=headers[i % users]))
+
+
+async def ml_flows(app, rec: Recorder, n: int, concurrency: int, ready_timeout: float):
+    import httpx
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as c:
+        deadline = time.monotonic() + ready_timeout
+        state = None
+        while time.monotonic() < deadline:
+            state = (await c.get("/health")).json().get("model_state")
+            if state in ("ready", "fallback", "failed"):
+                break
+            await asyncio.sleep(0.2)
+        if state != "ready":
+            print(f"  [WARN] model state is {state}; /predict is measuring fallback scoring")
+
+        def sample(i):
+            k = (i % 10) / 10.0
+            return {"letters_accuracy": k, "words_accuracy": 1 - k, "arrange_accuracy": 0.5,
+                    "speech_accuracy": 0.7, "image_accuracy": 0.6, "avg_reaction_time": 2.0}
+
+        await rec.run("predict", n, concurrency, lambda i: c.post("/predict", json=sample(i)))
+        await rec.run("predict.batch64", max(1, n // 8), concurrency, lambda i: c.post(
+            "/predict/batch", json=[sample(i + k) for k in range(64)]))
+        # each call stores samples and queues a 1-epoch job; jobs run one at a time in the background
+        await rec.run("train", max(1, n // 20), concurrency, lambda i: c.post(
+            "/train", json={"samples": [dict(sample(i + k), label=float(k % 2)) for k in range(16)], "epochs": 1}))
+
+
+async def run_service(service: str, n: int, concurrency: int, ready_timeout: float) -> dict:
+    sys.path.insert(0, SERVICES[service])
+    if service == "backend":
+        from app.main import app
+    else:
+        from app import app
+    rec = Recorder()
+    t0 = time.perf_counter()
+    await _lifespan(app, "startup")
+    startup_s = time.perf_counter() - t0
+    try:
+        if service == "backend":
+            await backend_flows(app, rec, n, concurrency)
+        else:
+            await ml_flows(app, rec, n, concurrency, ready_timeout)
+    finally:
+        await _lifespan(app, "shutdown")
+    return {
+        "startup_s": startup_s,
+        "peak_rss_mb": _peak_rss_mb(resource.RUSAGE_SELF),
+        "peak_rss_children_mb": _peak_rss_mb(resource.RUSAGE_CHILDREN),
+        "flows": rec.flows,
+    }
+
+
+# -- orchestration -----------------------------------------------------------
+
+def _service_env(service: str, workdir: str) -> dict:
+    # Always the throwaway paths: an exported DATABASE_URL (e.g. from .env) must
+    # never receive the benchmark's users and assessments
+    env = dict(os.environ)
+    if service == "backend":
+        env["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        env["MODEL_DIR"] = os.path.join(workdir, "models")
+    else:
+        env["MODEL_REGISTRY_DIR"] = os.path.join(workdir, "models", "registry")
+        env["TRAIN_STORE_DIR"] = os.path.join(workdir, "models", "train_store")
+        env["PREDICTION_LOG_PATH"] = os.path.join(workdir, "models", "predictions.jsonl")
+    return env
+
+
+def _prepare_workdir(service: str, workdir: str):
+    if service == "ml":
+        # the ML service resolves models/ relative to its working directory
+        src = os.path.join(SERVICES["ml"], "models")
+        if os.path.isdir(src):
+            shutil.copytree(src, os.path.join(workdir, "models"))
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def run(args) -> dict:
+    services = list(SERVICES) if args.service == "all" else [args.service]
+    result = {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(),
+            "git": _git_rev(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "services": {},
+    }
+    for service in services:
+        print(f"[INFO] {service}: {args.requests} requests/flow at concurrency {args.concurrency}", flush=True)
+        workdir = tempfile.mkdtemp(prefix=f"bench-{service}-")
+        out = os.path.join(workdir, "result.json")
+        try:
+            _prepare_workdir(service, workdir)
+            cmd = [sys.executable, os.path.abspath(__file__), "_service", service, out,
+                   "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+                   "--ready-timeout", str(args.ready_timeout)]
+            proc = subprocess.run(cmd, cwd=workdir, env=_service_env(service, workdir))
+            if proc.returncode != 0:
+                raise SystemExit(f"[ERROR] {service} benchmark exited with {proc.returncode}")
+            with open(out) as f:
+                result["services"][service] = json.load(f)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        s = result["services"][service]
+        print(f"  startup={s['startup_s']:.2f}s peak_rss={s['peak_rss_mb']:.1f}MB "
+              f"(children {s['peak_rss_children_mb']:.1f}MB)", flush=True)
+    for path in filter(None, [args.out, args.save_baseline]):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"[OK] Wrote {path}")
+    return result
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> list:
+    """Return human-readable regressions of ``current`` against ``baseline``"""
+    problems = []
+    for service, base in baseline["services"].items():
+        cur = current["services"].get(service)
+        if cur is None:
+            continue
+        for flow, b in base["flows"].items():
+            c = cur["flows"].get(flow)
+            if c is None:
+                problems.append(f"{service}/{flow}: missing from current run")
+                continue
+            if b["p95_ms"] and c["p95_ms"] and c["p95_ms"] > b["p95_ms"] * (1 + tolerance):
+                problems.append(f"{service}/{flow}: p95 {b['p95_ms']:.2f} -> {c['p95_ms']:.2f} ms")
+            if b["rps"] and c["rps"] and c["rps"] < b["rps"] * (1 - tolerance):
+                problems.append(f"{service}/{flow}: rps {b['rps']:.1f} -> {c['rps']:.1f}")
+            if c["errors"] > b["errors"]:
+                problems.append(f"{service}/{flow}: errors {b['errors']} -> {c['errors']}")
+        if cur["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance):
+            problems.append(f"{service}: peak RSS {base['peak_rss_mb']:.1f} -> {cur['peak_rss_mb']:.1f} MB")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the backend and the ML service")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    r = sub.add_parser("run")
+    r.add_argument("--service", choices=["all", *SERVICES], default="all")
+    r.add_argument("--requests", type=int, default=400, help="requests per flow")
+    r.add_argument("--concurrency", type=int, default=16)
+    r.add_argument("--ready-timeout", type=float, default=120.0, help="seconds to wait for the ML model")
+    r.add_argument("--out")
+    r.add_argument("--save-baseline")
+
+    c = sub.add_parser("compare")
+    c.add_argument("baseline")
+    c.add_argument("current")
+    c.add_argument("--tolerance", type=float, default=0.15)
+
+    s = sub.add_parser("_service")  # internal: runs inside the service's process
+    s.add_argument("service", choices=list(SERVICES))
+    s.add_argument("out")
+    s.add_argument("--requests", type=int, default=400)
+    s.add_argument("--concurrency", type=int, default=16)
+    s.add_argument("--ready-timeout", type=float, default=120.0)
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    elif args.command == "compare":
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        problems = compare(baseline, current, args.tolerance)
+        for p in problems:
+            print(f"[REGRESSION] {p}")
+        if problems:
+            sys.exit(1)
+        print(f"[OK] No regressions beyond {args.tolerance:.0%}")
+    else:
+        result = asyncio.run(run_service(args.service, args.requests, args.concurrency, args.ready_timeout))
+        with open(args.out, "w") as f:
+            json.dump(result, f)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+"""Modules shared by the BinaKata backend and ML service.
+
+Installed into both services from ``common/`` (see their requirements.txt).
+"""
@@ -0,0 +1,12 @@
+"""Environment parsing shared by the services' settings."""
+import os
+
+_TRUE = ("1", "true", "yes", "on")
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    """Boolean environment variable; 1/true/yes/on in any case is true"""
+    value = os.environ.get(name)
+    if value is None or not value.strip():
+        return default
+    return value.strip().lower() in _TRUE
@@ -0,0 +1,290 @@
+"""Prometheus text-format metrics without a client library.
+
+Every metric keeps one shard per thread. A thread only ever writes its
+own shard, so ``inc``/``observe`` take no lock; ``render`` sums the
+shards when ``/metrics`` is scraped. Locks are only taken the first
+time a thread or label combination is seen, and when a thread exits:
+its shard is then folded into a per-child total of retired threads, so
+threadpool churn doesn't grow the shard lists.
+"""
+import bisect
+import threading
+import time
+import weakref
+from typing import Dict, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DURATION_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Child:
+    """One label combination; per-thread shards of ``size`` floats"""
+
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        self._shards: Dict[int, List[float]] = {}  # id(shard) -> shard of a live thread
+        self._retired = [0.0] * size  # sum of the shards of exited threads
+        # reentrant: _retire can run from a finalizer on a thread inside total()
+        self._lock = threading.RLock()
+
+    def shard(self) -> List[float]:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = [0.0] * self._size
+            with self._lock:
+                self._shards[id(shard)] = shard
+            self._local.shard = shard
+            # thread-local values are released when their thread exits
+            sentinel = self._local.sentinel = _Sentinel()
+            weakref.finalize(sentinel, self._retire, shard)
+        return shard
+
+    def _retire(self, shard: List[float]) -> None:
+        with self._lock:
+            self._shards.pop(id(shard), None)
+            self._retired = [a + b for a, b in zip(self._retired, shard)]
+
+    def total(self) -> List[float]:
+        with self._lock:
+            shards = list(self._shards.values())
+            retired = self._retired
+        return [sum(col) for col in zip(retired, *shards)]
+
+
+class _Sentinel:
+    __slots__ = ("__weakref__",)
+
+
+class _Metric:
+    kind = ""
+    _size = 1
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], _Child] = {}
+        self._bound: Dict[tuple, "_Bound"] = {}  # raw label values -> bound child (fast path)
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._child(())
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _child(self, values: Tuple[str, ...]) -> _Child:
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, _Child(self._size))
+        return child
+
+    def labels(self, *values) -> "_Bound":
+        bound = self._bound.get(values)
+        if bound is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            bound = self._bound[values] = _Bound(self, self._child(tuple(str(v) for v in values)))
+        return bound
+
+    def _header(self, name: str = "") -> List[str]:
+        name = name or self.name
+        return [f"# HELP {name} {self.documentation}", f"# TYPE {name} {self.kind}"]
+
+    def _items(self):
+        with self._lock:
+            return list(self._children.items())
+
+
+class _Bound:
+    __slots__ = ("_metric", "_child")
+
+    def __init__(self, metric, child):
+        self._metric = metric
+        self._child = child
+
+    def inc(self, amount: float = 1.0):
+        self._child.shard()[0] += amount
+
+    def dec(self, amount: float = 1.0):
+        self._child.shard()[0] -= amount
+
+    def observe(self, value: float):
+        self._metric._observe(self._child, value)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0):
+        self._default.shard()[0] += amount
+
+    def render(self) -> List[str]:
+        # metadata and samples both use the _total name, as prometheus_client does
+        name = f"{self.name}_total"
+        lines = self._header(name)
+        for values, child in self._items():
+            lines.append(f"{name}{_labels(self.labelnames, values)} {child.total()[0]}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Up/down gauge (e.g. in-flight requests); each thread's +1/-1 cancel out in the sum"""
+    kind = "gauge"
+
+    def inc(self, amount: float = 1.0):
+        self._default.shard()[0] += amount
+
+    def dec(self, amount: float = 1.0):
+        self._default.shard()[0] -= amount
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for values, child in self._items():
+            lines.append(f"{self.name}{_labels(self.labelnames, values)} {child.total()[0]}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        # shard layout: one slot per bucket, +Inf, then the sum
+        self._size = len(self.buckets) + 2
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _observe(self, child: _Child, value: float):
+        shard = child.shard()
+        shard[bisect.bisect_left(self.buckets, value)] += 1
+        shard[-1] += value
+
+    def observe(self, value: float):
+        self._observe(self._default, value)
+
+    def time(self, *labelvalues):
+        """Context manager observing the elapsed seconds of its block"""
+        return _Timer(self.labels(*labelvalues) if labelvalues else self)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for values, child in self._items():
+            total = child.total()
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, total):
+                cumulative += count
+                le = _labels(self.labelnames, values, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            cumulative += total[len(self.buckets)]
+            le = _labels(self.labelnames, values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, values)} {total[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, values)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, target):
+        self._target = target
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._target.observe(time.perf_counter() - self._start)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# -- HTTP instrumentation ------------------------------------------------------
+
+HTTP_REQUEST_DURATION = Histogram("http_request_duration_seconds", "HTTP request latency by route",
+                                  ("method", "route", "status"))
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being served")
+
+_route_paths: Dict[object, str] = {}
+
+
+def route_label(scope) -> str:
+    """Path template of the route that served ``scope`` (call after the app has run)"""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    path = _route_paths.get(endpoint)
+    if path is None:
+        for r in getattr(scope.get("app"), "routes", ()):
+            if getattr(r, "endpoint", None) is endpoint:
+                path = r.path
+                break
+        _route_paths[endpoint] = path = path or getattr(endpoint, "__name__", "unknown")
+    return path
+
+
+class MetricsMiddleware:
+    """ASGI middleware: per-route latency histogram and an in-flight gauge.
+
+    Routes are labelled by their path template (``/train/{job_id}``), and
+    requests that match no route by ``unmatched``, so label cardinality
+    stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            HTTP_REQUEST_DURATION.labels(scope["method"], route_label(scope), status[0]).observe(
+                time.perf_counter() - start
+            )
@@ -0,0 +1,122 @@
+"""TensorFlow-free inference for the dyslexia risk MLP.
+
+A trained Keras model is exported to a compact ``.npz`` holding one
+(kernel, bias, activation) triple per Dense layer. BatchNormalization is
+folded into the next Dense layer and Dropout is dropped, so the forward
+pass is just a few matmuls.
+
+Usage:
+    python -m binakata_common.numpy_engine models/dyslexia_model_v2.keras models/dyslexia_model_v2.npz
+"""
+import os
+import sys
+import numpy as np
+
+ACTIVATIONS = {
+    "linear": lambda z: z,
+    "relu": lambda z: np.maximum(z, 0.0),
+    "sigmoid": lambda z: 1.0 / (1.0 + np.exp(-z)),
+    "tanh": np.tanh,
+}
+
+
+class NumpyMLP:
+    """Dense-only forward pass with the same ``predict`` signature as a Keras model"""
+
+    engine = "numpy"
+
+    def __init__(self, layers):
+        self.layers = [
+            (np.ascontiguousarray(W, dtype="float32"), np.ascontiguousarray(b, dtype="float32"), act)
+            for W, b, act in layers
+        ]
+        for _, _, act in self.layers:
+            if act not in ACTIVATIONS:
+                raise ValueError(f"Unsupported activation: {act}")
+
+    @property
+    def input_dim(self) -> int:
+        return self.layers[0][0].shape[0]
+
+    @classmethod
+    def load(cls, path: str) -> "NumpyMLP":
+        with np.load(path, allow_pickle=False) as data:
+            acts = [str(a) for a in data["activations"]]
+            layers = [(data[f"W{i}"], data[f"b{i}"], act) for i, act in enumerate(acts)]
+        return cls(layers)
+
+    def save(self, path: str) -> None:
+        arrays = {"activations": np.array([act for _, _, act in self.layers])}
+        for i, (W, b, _) in enumerate(self.layers):
+            arrays[f"W{i}"] = W
+            arrays[f"b{i}"] = b
+        # Write a temp file and rename so readers never see a partial archive.
+        # Writing through a handle also stops numpy from appending ".npz".
+        tmp = f"{path}.tmp{os.getpid()}"
+        with open(tmp, "wb") as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp, path)
+
+    def predict(self, x, batch_size=None, verbose=0) -> np.ndarray:
+        h = np.asarray(x, dtype="float32")
+        for W, b, act in self.layers:
+            h = ACTIVATIONS[act](h @ W + b)
+        return h
+
+
+def _activation_name(layer) -> str:
+    act = getattr(layer, "activation", None)
+    return getattr(act, "__name__", "linear") if act is not None else "linear"
+
+
+def from_keras(model) -> NumpyMLP:
+    """Convert a Sequential/functional Keras MLP, folding BatchNorm into the next Dense"""
+    layers = []
+    pending_scale = None  # (scale, shift) of a BatchNorm waiting for the next Dense
+    for layer in model.layers:
+        kind = layer.__class__.__name__
+        if kind in ("InputLayer", "Dropout"):
+            continue
+        if kind == "BatchNormalization":
+            gamma, beta, mean, var = [np.asarray(w, dtype="float64") for w in layer.get_weights()]
+            scale = gamma / np.sqrt(var + layer.epsilon)
+            shift = beta - mean * scale
+            if pending_scale is not None:
+                scale, shift = pending_scale[0] * scale, pending_scale[1] * scale + shift
+            pending_scale = (scale, shift)
+            continue
+        if kind != "Dense":
+            raise ValueError(f"Cannot export layer type {kind}")
+        W, b = [np.asarray(w, dtype="float64") for w in layer.get_weights()]
+        if pending_scale is not None:
+            # Dense(s * h + t) == Dense'(h) with W' = diag(s) W, b' = t W + b
+            scale, shift = pending_scale
+            b = shift @ W + b
+            W = scale[:, None] * W
+            pending_scale = None
+        layers.append((W, b, _activation_name(layer)))
+    if pending_scale is not None:
+        raise ValueError("Trailing BatchNormalization without a following Dense layer")
+    return NumpyMLP(layers)
+
+
+def export_keras(model, path: str, atol: float = 1e-5) -> NumpyMLP:
+    """Export ``model`` to ``path`` and check the NumPy scores match Keras within ``atol``"""
+    mlp = from_keras(model)
+    probe = np.random.default_rng(0).uniform(0.0, 1.0, size=(256, mlp.input_dim)).astype("float32")
+    expected = model.predict(probe, batch_size=256, verbose=0)
+    diff = float(np.max(np.abs(mlp.predict(probe) - expected)))
+    if diff > atol:
+        raise ValueError(f"NumPy export diverges from Keras (max abs diff {diff:.2e})")
+    mlp.save(path)
+    return mlp
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(1)
+    from tensorflow import keras
+    src, dst = sys.argv[1], sys.argv[2]
+    export_keras(keras.models.load_model(src), dst)
+    print(f"[OK] Exported {src} -> {dst}")
@@ -0,0 +1,272 @@
+"""Opt-in statistical profiler with per-route collapsed-stack output.
+
+A fraction of requests (``sample_rate``), plus any request carrying the
+admin header, is marked as profiled through a context variable. While at
+least one profiled request is in flight, a sampler thread snapshots
+every thread's stack each ``interval_ms`` with ``sys._current_frames``.
+Each stack is attributed to a request through the middleware frame on
+the request's own coroutine stack, or through that context variable,
+which Starlette's threadpool and asyncio tasks carry along. When only
+one profiled request is in flight, busy threads without it (e.g. a
+micro-batch worker) are attributed to that request as well. Threads
+parked in a wait/select/get are skipped, so the output shows where time
+is spent working rather than idling.
+
+When a request finishes, its stacks are added to its route, keyed by the
+matched path template (``metrics.route_label``), so ids, slugs or emails
+in the path never create new keys. Counts are aggregated per route as
+collapsed stacks (``a;b;c 42``), the input format of flamegraph.pl and
+speedscope. Every ``flush_interval`` seconds, and on close, they are
+written to ``<directory>/<route>.collapsed``. Memory is bounded by
+``max_routes`` x ``max_stacks``; stacks beyond the limit are counted
+under ``[other]``. When profiling is off the middleware isn't installed
+at all.
+"""
+import contextvars
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional, Set
+
+from .metrics import route_label
+
+_PROFILED: contextvars.ContextVar = contextvars.ContextVar("profiled_request", default=None)
+
+# innermost frames of threads that are waiting, not working
+_IDLE_FUNCTIONS = {"wait", "select", "poll", "epoll", "get", "_worker", "accept", "sleep", "run_forever"}
+
+
+class _Profiled:
+    """Stacks sampled for one in-flight request, added to its route when it ends"""
+    __slots__ = ("stacks",)
+
+    def __init__(self):
+        self.stacks: Counter = Counter()
+
+
+def _context_request(frame) -> Optional[_Profiled]:
+    """The profiled request whose context this stack runs in, if any"""
+    while frame is not None:
+        code = frame.f_code
+        if code is _MIDDLEWARE_CODE:
+            # coroutine stack of the request itself, on any event loop
+            return frame.f_locals.get("profiled")
+        name = code.co_name
+        ctx = None
+        # anyio worker threads hold the copied context in a local; asyncio
+        # handles (Handle._run) keep it on self._context
+        if name == "run":
+            ctx = frame.f_locals.get("context")
+        elif name == "_run":
+            ctx = getattr(frame.f_locals.get("self"), "_context", None)
+        if isinstance(ctx, contextvars.Context):
+            profiled = ctx.get(_PROFILED)
+            if profiled is not None:
+                return profiled
+        frame = frame.f_back
+    return None
+
+
+def _collapse(frame, max_depth: int) -> str:
+    names = []
+    while frame is not None and len(names) < max_depth:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    names.reverse()
+    return ";".join(names)
+
+
+class SamplingProfiler:
+    def __init__(
+        self,
+        directory: str = "profiles",
+        interval_ms: float = 5.0,
+        max_routes: int = 100,
+        max_stacks: int = 2000,
+        max_depth: int = 64,
+        flush_interval: float = 60.0,
+    ):
+        self.directory = directory
+        self.interval = interval_ms / 1000.0
+        self.max_routes = max_routes
+        self.max_stacks = max_stacks
+        self.max_depth = max_depth
+        self.flush_interval = flush_interval
+        self._stacks: Dict[str, Counter] = {}
+        self._active: Set[_Profiled] = set()  # profiled requests in flight
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_flush = time.monotonic()
+        self.samples = 0
+        self.profiled_requests = 0
+
+    # -- request bookkeeping ---------------------------------------------
+
+    def begin(self):
+        """Start sampling for a request; returns (profiled, token) for ``end``"""
+        profiled = _Profiled()
+        with self._lock:
+            self._active.add(profiled)
+            self.profiled_requests += 1
+        if self._thread is None or not self._thread.is_alive():
+            self._start()
+        self._wakeup.set()
+        return profiled, _PROFILED.set(profiled)
+
+    def end(self, profiled: _Profiled, token, route: str) -> None:
+        _PROFILED.reset(token)
+        with self._lock:
+            self._active.discard(profiled)
+            if not profiled.stacks:
+                return
+            counts = self._stacks.get(route)
+            if counts is None:
+                if len(self._stacks) >= self.max_routes:
+                    return
+                counts = self._stacks[route] = Counter()
+            for stack, n in profiled.stacks.items():
+                if stack not in counts and len(counts) >= self.max_stacks:
+                    stack = "[other]"
+                counts[stack] += n
+
+    # -- sampler thread --------------------------------------------------
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stopping.is_set():
+            if not self._active:
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+            else:
+                self._sample(me)
+                time.sleep(self.interval)
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self.flush()
+
+    def _sample(self, me: int):
+        with self._lock:
+            active = list(self._active)
+        only = active[0] if len(active) == 1 else None
+        for ident, frame in sys._current_frames().items():
+            if ident == me or frame.f_code.co_name in _IDLE_FUNCTIONS:
+                continue
+            profiled = _context_request(frame) or only
+            if profiled is None:
+                continue
+            self._add(profiled, _collapse(frame, self.max_depth))
+        self.samples += 1
+
+    def _add(self, profiled: _Profiled, stack: str):
+        with self._lock:
+            if profiled not in self._active:
+                return  # finished since the snapshot
+            counts = profiled.stacks
+            if stack not in counts and len(counts) >= self.max_stacks:
+                stack = "[other]"
+            counts[stack] += 1
+
+    # -- output ----------------------------------------------------------
+
+    def flush(self) -> int:
+        """Write each route's cumulative collapsed stacks; returns files written"""
+        self._last_flush = time.monotonic()
+        with self._lock:
+            snapshot = {route: dict(counts) for route, counts in self._stacks.items()}
+        if not snapshot:
+            return 0
+        os.makedirs(self.directory, exist_ok=True)
+        for route, counts in snapshot.items():
+            name = re.sub(r"[^A-Za-z0-9_.-]+", "_", route).strip("_") or "root"
+            path = os.path.join(self.directory, f"{name}.collapsed")
+            tmp = path + ".tmp"
+            with open(tmp, "w") as f:
+                for stack, n in sorted(counts.items(), key=lambda kv: -kv[1]):
+                    f.write(f"{stack} {n}\n")
+            os.replace(tmp, path)
+        return len(snapshot)
+
+    def close(self):
+        thread = self._thread
+        if thread is not None:
+            self._stopping.set()
+            self._wakeup.set()
+            thread.join(5.0)
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "directory": self.directory,
+                "profiled_requests": self.profiled_requests,
+                "samples": self.samples,
+                "routes": len(self._stacks),
+                "stacks": sum(len(c) for c in self._stacks.values()),
+            }
+
+
+class ProfilerMiddleware:
+    """ASGI middleware profiling ``sample_rate`` of requests, or those with the admin header.
+
+    The header (``X-Profile: <admin_token>``) is ignored unless a token is configured.
+    """
+
+    def __init__(self, app, profiler: SamplingProfiler, sample_rate: float = 0.0,
+                 admin_token: str = "", header: str = "x-profile"):
+        self.app = app
+        self.profiler = profiler
+        self.sample_rate = sample_rate
+        self.admin_token = admin_token.encode() if admin_token else None
+        self.header = header.lower().encode()
+
+    def _selected(self, scope) -> bool:
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return True
+        if self.admin_token is not None:
+            for key, value in scope.get("headers", ()):
+                if key == self.header:
+                    return value == self.admin_token
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._selected(scope):
+            await self.app(scope, receive, send)
+            return
+        profiled, token = self.profiler.begin()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # the route template is only known once the app has routed the request
+            self.profiler.end(profiled, token, f"{scope['method']} {route_label(scope)}")
+
+
+_MIDDLEWARE_CODE = ProfilerMiddleware.__call__.__code__
+
+
+def install(app, enabled: bool, sample_rate: float, admin_token: str, **profiler_options) -> Optional[SamplingProfiler]:
+    """Add the middleware to ``app`` only when profiling can happen; returns the profiler"""
+    if not (enabled and sample_rate > 0) and not admin_token:
+        return None
+    profiler = SamplingProfiler(**profiler_options)
+    app.add_middleware(
+        ProfilerMiddleware,
+        profiler=profiler,
+        sample_rate=sample_rate if enabled else 0.0,
+        admin_token=admin_token,
+    )
+    return profiler
@@ -0,0 +1,161 @@
+"""Vectorized, seeded synthetic dataset generator with sharded output.
+
+Samples are produced lazily in chunks; chunk ``k`` is drawn from its own
+``default_rng([seed, k])`` so any chunk can be regenerated on its own
+and output does not depend on how far a consumer has read.
+
+Profiles:
+    screening  6 features used by the ML service
+               (letters, words, arrange, speech, image, reaction time)
+    accuracy3  3 accuracy features used by the backend model
+
+Usage:
+    python -m binakata_common.synthetic write models/synthetic --n 1000000 --shard-size 100000 --seed 42
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+
+def _screening_chunk(rng, m: int):
+    letters = np.clip(rng.normal(0.7, 0.2, m), 0, 1)
+    words = np.clip(rng.normal(0.65, 0.25, m), 0, 1)
+    arrange = np.clip(rng.normal(0.6, 0.3, m), 0, 1)
+    speech = np.clip(rng.normal(0.75, 0.2, m), 0, 1)
+    image = np.clip(rng.normal(0.6, 0.25, m), 0, 1)
+    reaction_time = np.clip(rng.exponential(2.0, m), 0.5, 10)
+    # Normalize reaction time to 0-1 scale (0s = 1.0, 5s = 0.0)
+    rt_norm = np.clip(1.0 - reaction_time / 5.0, 0.0, 1.0)
+
+    X = np.stack([letters, words, arrange, speech, image, rt_norm], axis=1).astype("float32")
+    # Weighted risk plus noise; label 1 for high risk (> 0.6)
+    risk = (
+        (1 - letters) * 0.25 +
+        (1 - words) * 0.25 +
+        (1 - arrange) * 0.20 +
+        (1 - speech) * 0.15 +
+        (1 - image) * 0.10 +
+        (1 - rt_norm) * 0.05
+    ) + rng.normal(0, 0.05, m)
+    y = (np.clip(risk, 0, 1) > 0.6).astype("float32")
+    return X, y
+
+
+def _accuracy3_chunk(rng, m: int):
+    # features: [letters_acc, words_acc, arrange_acc] in [0,1]
+    X = rng.uniform(0.0, 1.0, size=(m, 3)).astype("float32")
+    # Heuristic label: risk if low accuracy
+    y = ((X.mean(axis=1) < 0.6) | ((X[:, 0] < 0.55) & (X[:, 1] < 0.55))).astype("float32")
+    return X, y
+
+
+PROFILES = {
+    "screening": (_screening_chunk, 6),
+    "accuracy3": (_accuracy3_chunk, 3),
+}
+
+
+def generate_chunks(n_samples: int, chunk_size: int = 65536, seed: int = 42, profile: str = "screening"):
+    """Yield (X, y) chunks of at most ``chunk_size`` rows until ``n_samples`` are produced"""
+    make_chunk, _ = PROFILES[profile]
+    produced, k = 0, 0
+    while produced < n_samples:
+        m = min(chunk_size, n_samples - produced)
+        yield make_chunk(np.random.default_rng([seed, k]), m)
+        produced += m
+        k += 1
+
+
+def generate(n_samples: int, seed: int = 42, profile: str = "screening"):
+    """Materialize a small dataset in memory (cold starts, tests)"""
+    chunks = list(generate_chunks(n_samples, seed=seed, profile=profile))
+    if not chunks:
+        dim = PROFILES[profile][1]
+        return np.empty((0, dim), dtype="float32"), np.empty((0,), dtype="float32")
+    return np.concatenate([c[0] for c in chunks]), np.concatenate([c[1] for c in chunks])
+
+
+# -- shards -------------------------------------------------------------
+
+def write_shards(out_dir: str, n_samples: int, shard_size: int = 100_000, seed: int = 42,
+                 profile: str = "screening") -> dict:
+    """Write ``n_samples`` as ``shard-NNNNN.{X,y}.npy`` files plus a manifest"""
+    os.makedirs(out_dir, exist_ok=True)
+    shards = []
+    for i, (X, y) in enumerate(generate_chunks(n_samples, shard_size, seed, profile)):
+        name = f"shard-{i:05d}"
+        np.save(os.path.join(out_dir, f"{name}.X.npy"), X)
+        np.save(os.path.join(out_dir, f"{name}.y.npy"), y)
+        shards.append({"name": name, "rows": int(len(y))})
+    manifest = {
+        "profile": profile,
+        "dim": PROFILES[profile][1],
+        "seed": seed,
+        "n_samples": n_samples,
+        "shard_size": shard_size,
+        "shards": shards,
+    }
+    tmp = os.path.join(out_dir, "manifest.json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, os.path.join(out_dir, "manifest.json"))
+    return manifest
+
+
+def read_manifest(shard_dir: str) -> dict:
+    with open(os.path.join(shard_dir, "manifest.json")) as f:
+        return json.load(f)
+
+
+def iter_shard_batches(shard_dir: str, batch_size: int = 1024, shuffle: bool = True, seed: int = 0):
+    """Stream (X, y) batches from memory-mapped shards, one shard resident at a time"""
+    manifest = read_manifest(shard_dir)
+    rng = np.random.default_rng(seed)
+    order = np.arange(len(manifest["shards"]))
+    if shuffle:
+        rng.shuffle(order)
+    for i in order:
+        name = manifest["shards"][i]["name"]
+        X = np.load(os.path.join(shard_dir, f"{name}.X.npy"), mmap_mode="r")
+        y = np.load(os.path.join(shard_dir, f"{name}.y.npy"), mmap_mode="r")
+        idx = rng.permutation(len(y)) if shuffle else np.arange(len(y))
+        for start in range(0, len(y), batch_size):
+            sel = np.sort(idx[start:start + batch_size])
+            yield np.asarray(X[sel]), np.asarray(y[sel])
+
+
+def shard_dataset(shard_dir: str, batch_size: int = 1024, seed: int = 0):
+    """tf.data pipeline over the shards with prefetching (imports TensorFlow)"""
+    import tensorflow as tf
+    dim = read_manifest(shard_dir)["dim"]
+    epoch = [0]
+
+    def batches():
+        # Reshuffle differently on every pass over the data
+        epoch[0] += 1
+        return iter_shard_batches(shard_dir, batch_size, shuffle=True, seed=seed + epoch[0])
+
+    ds = tf.data.Dataset.from_generator(
+        batches,
+        output_signature=(
+            tf.TensorSpec(shape=(None, dim), dtype=tf.float32),
+            tf.TensorSpec(shape=(None,), dtype=tf.float32),
+        ),
+    )
+    return ds.prefetch(tf.data.AUTOTUNE)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write sharded synthetic training data")
+    sub = parser.add_subparsers(dest="command", required=True)
+    w = sub.add_parser("write")
+    w.add_argument("out_dir")
+    w.add_argument("--n", type=int, default=1_000_000)
+    w.add_argument("--shard-size", type=int, default=100_000)
+    w.add_argument("--seed", type=int, default=42)
+    w.add_argument("--profile", choices=sorted(PROFILES), default="screening")
+    args = parser.parse_args()
+    m = write_shards(args.out_dir, args.n, args.shard_size, args.seed, args.profile)
+    print(f"[OK] Wrote {m['n_samples']} samples in {len(m['shards'])} shards to {args.out_dir}")
@@ -0,0 +1,73 @@
+import threading
+
+from binakata_common import metrics
+
+
+def _churn(n, work):
+    """Run ``work`` once in each of ``n`` short-lived threads, at most 8 alive at a time"""
+    for start in range(0, n, 8):
+        threads = [threading.Thread(target=work) for _ in range(min(8, n - start))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+
+def test_exited_threads_do_not_grow_the_shards():
+    registry = metrics.Registry()
+    counter = metrics.Counter("jobs", "jobs", registry=registry)
+    histogram = metrics.Histogram("latency", "latency", ("route",), buckets=(0.1, 1.0), registry=registry)
+
+    def work():
+        counter.inc()
+        histogram.labels("/a").observe(0.5)
+
+    _churn(150, work)
+
+    assert len(counter._default._shards) <= 8
+    assert len(histogram.labels("/a")._child._shards) <= 8
+    assert counter._default.total() == [150.0]
+    assert histogram.labels("/a")._child.total() == [0.0, 150.0, 0.0, 75.0]
+    text = registry.render()
+    assert "jobs_total 150.0" in text
+    assert 'latency_count{route="/a"} 150.0' in text
+
+
+def test_gauge_balances_across_exited_threads():
+    gauge = metrics.Gauge("in_flight", "in flight", registry=metrics.Registry())
+    _churn(120, gauge.inc)
+    gauge.inc(3)
+    _churn(120, gauge.dec)
+    assert gauge._default.total() == [3.0]
+    assert len(gauge._default._shards) <= 9  # this thread's shard stays live
+
+
+def test_live_threads_keep_their_shards():
+    counter = metrics.Counter("live", "live", registry=metrics.Registry())
+    release = threading.Event()
+
+    def work():
+        counter.inc()
+        release.wait()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    while counter._default.total()[0] < 4:
+        pass
+    assert len(counter._default._shards) == 4
+    release.set()
+    for t in threads:
+        t.join()
+    assert counter._default.total() == [4.0]
+
+
+def test_counter_metadata_names_its_samples():
+    registry = metrics.Registry()
+    counter = metrics.Counter("requests", "requests by outcome", ("outcome",), registry=registry)
+    counter.labels("ok").inc()
+    assert registry.render().splitlines() == [
+        "# HELP requests_total requests by outcome",
+        "# TYPE requests_total counter",
+        'requests_total{outcome="ok"} 1.0',
+    ]
@@ -0,0 +1,69 @@
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from binakata_common import profiling
+from binakata_common.env import env_flag
+
+
+def _busy(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(1000))
+
+
+def _app(tmp_path, **options):
+    app = FastAPI()
+
+    @app.get("/users/{key}")
+    def user(key: str):
+        _busy(0.03)
+        return {"key": key}
+
+    profiler = profiling.install(
+        app, enabled=True, sample_rate=1.0, admin_token="", directory=str(tmp_path), interval_ms=1, **options,
+    )
+    return app, profiler
+
+
+def test_stacks_are_keyed_by_the_route_template(tmp_path):
+    app, profiler = _app(tmp_path)
+    with TestClient(app) as client:
+        for key in ("42", "a1b2c3d4-uuid", "someone@example.com", "some-slug"):
+            assert client.get(f"/users/{key}").status_code == 200
+        assert client.get("/missing/7").status_code == 404
+    profiler.close()
+
+    assert set(profiler._stacks) <= {"GET /users/{key}", "GET unmatched"}
+    assert "GET /users/{key}" in profiler._stacks
+    assert any("_busy" in stack for stack in profiler._stacks["GET /users/{key}"])
+    assert (tmp_path / "GET_users_key.collapsed").exists()
+
+
+def test_max_stacks_folds_the_rest_into_other(tmp_path):
+    app, profiler = _app(tmp_path, max_stacks=1)
+    with TestClient(app) as client:
+        for _ in range(3):
+            client.get("/users/1")
+    profiler.close()
+    counts = profiler._stacks["GET /users/{key}"]
+    assert len(set(counts) - {"[other]"}) == 1
+
+
+def test_install_is_a_no_op_when_profiling_is_off():
+    app = FastAPI()
+    assert profiling.install(app, enabled=False, sample_rate=1.0, admin_token="") is None
+    assert profiling.install(app, enabled=True, sample_rate=0.0, admin_token="") is None
+    assert not app.user_middleware
+
+
+def test_env_flag(monkeypatch):
+    for value, expected in (("1", True), ("true", True), ("YES", True), (" on ", True),
+                            ("0", False), ("false", False), ("no", False)):
+        monkeypatch.setenv("SOME_FLAG", value)
+        assert env_flag("SOME_FLAG") is expected
+    monkeypatch.setenv("SOME_FLAG", "")
+    assert env_flag("SOME_FLAG", True) is True
+    monkeypatch.delenv("SOME_FLAG")
+    assert env_flag("SOME_FLAG") is False
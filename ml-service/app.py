@@ -1,26 +1,61 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, ValidationError
 import numpy as np
 import os
+import sys
 import json
+import time
+import threading
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
+
+# Measured from here so startup timings include the TensorFlow import
+PROCESS_STARTED = time.perf_counter()
+
+from binakata_common.numpy_engine import NumpyMLP, export_keras
+from batching import MicroBatcher
+from prediction_log import PredictionLogWriter
+from training_store import TrainingStore
+from training_jobs import TrainingJobManager
+from binakata_common import metrics, profiling, synthetic
+from binakata_common.env import env_flag
+from model_registry import ModelLoader, ModelRegistry, ShadowScorer
+from modeling import SYNTHETIC_SEED, build_model, synthetic_dataset
+
+# Inference engine: "keras", "numpy" (TensorFlow is never imported) or
+# "auto" (serve the exported NumPy weights when present, keep TF for training)
+INFERENCE_ENGINE = os.environ.get("INFERENCE_ENGINE", "auto").lower()
 
 # Try to import TensorFlow, fallback to simple scoring if not available
-try:
-    import tensorflow as tf
-    from tensorflow import keras
-    from tensorflow.keras import layers, callbacks
-    TENSORFLOW_AVAILABLE = True
-    print("[OK] TensorFlow loaded successfully")
-except ImportError as e:
+if INFERENCE_ENGINE == "numpy":
     TENSORFLOW_AVAILABLE = False
-    print(f"[WARN] TensorFlow not available: {e}")
-    print("Using fallback scoring")
+    print("[INFO] INFERENCE_ENGINE=numpy, TensorFlow not loaded")
+else:
+    try:
+        import tensorflow as tf
+        from tensorflow import keras
+        from tensorflow.keras import callbacks
+        TENSORFLOW_AVAILABLE = True
+        print("[OK] TensorFlow loaded successfully")
+    except ImportError as e:
+        TENSORFLOW_AVAILABLE = False
+        print(f"[WARN] TensorFlow not available: {e}")
+        print("Using fallback scoring")
 
 app = FastAPI(title="BinaKata ML Service")
 
+INFERENCE_DURATION = metrics.Histogram(
+    "inference_duration_seconds", "Time to score a request (queue wait included when micro-batching)",
+    ("engine", "kind"),
+)
+MODEL_LOAD_DURATION = metrics.Histogram(
+    "model_load_duration_seconds", "Time to load, cold-train or publish a model",
+    ("source",), buckets=metrics.DURATION_BUCKETS,
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -28,11 +63,59 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
+# Opt-in sampling profiler: PROFILE_ENABLED profiles PROFILE_SAMPLE_RATE of requests,
+# and with PROFILE_ADMIN_TOKEN set any request sending "X-Profile: <token>" is profiled.
+# Per-route collapsed stacks land in PROFILE_DIR (flamegraph.pl / speedscope input).
+PROFILER = profiling.install(
+    app,
+    enabled=env_flag("PROFILE_ENABLED"),
+    sample_rate=float(os.environ.get("PROFILE_SAMPLE_RATE", 0.01)),
+    admin_token=os.environ.get("PROFILE_ADMIN_TOKEN", ""),
+    directory=os.environ.get("PROFILE_DIR", "profiles"),
+    interval_ms=float(os.environ.get("PROFILE_INTERVAL_MS", 5.0)),
+    max_stacks=int(os.environ.get("PROFILE_MAX_STACKS", 2000)),
+    flush_interval=float(os.environ.get("PROFILE_FLUSH_SECONDS", 60.0)),
+)
 
 MODEL = None
+MODEL_VERSION = None  # registry version of MODEL
+# Model lifecycle: starting -> loading | training -> ready, or fallback / failed.
+# The service answers with fallback_scoring until MODEL_STATE is "ready".
+MODEL_STATE = "starting"
+TIMINGS = {"time_to_first_response_s": None, "model_ready_s": None}
+# Published models live in a versioned registry (see model_registry.py); the
+# single-file artifacts below are only imported into it once, as its first version
+MODEL_REGISTRY_DIR = os.environ.get("MODEL_REGISTRY_DIR", "models/registry")
+MODEL_REGISTRY_KEEP = int(os.environ.get("MODEL_REGISTRY_KEEP", 5))  # versions kept for rollback
+MODEL_POLL_SECONDS = float(os.environ.get("MODEL_POLL_SECONDS", 2.0))
+# activate: trained models go live at once; shadow: they become the shadow candidate
+MODEL_PUBLISH = os.environ.get("MODEL_PUBLISH", "activate").lower()
+SHADOW_SAMPLE_RATE = float(os.environ.get("SHADOW_SAMPLE_RATE", 0.05))
 MODEL_PATH = "models/dyslexia_model_v2.keras"
+NPZ_PATH = "models/dyslexia_model_v2.npz"
 META_PATH = "models/meta.json"
-DATASET_PATH = "models/dataset.jsonl"
+DATASET_PATH = "models/dataset.jsonl"  # legacy JSONL training data, migrated into the store
+TRAIN_STORE_DIR = os.environ.get("TRAIN_STORE_DIR", "models/train_store")
+# Optional pre-generated shards (python -m binakata_common.synthetic write ...) streamed for cold-start training
+SYNTHETIC_SHARDS_DIR = os.environ.get("SYNTHETIC_SHARDS_DIR")
+# Train on synthetic data when the registry has no model; serve.py turns this off
+# in its workers and cold-trains once, in a process of its own
+COLD_START_TRAINING = env_flag("MODEL_COLD_START", True)
+# Unlabeled prediction records go to their own rotated log so /train
+# doesn't have to skip over them in the training dataset
+PREDICTION_LOG_PATH = os.environ.get("PREDICTION_LOG_PATH", "models/predictions.jsonl")
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", 1024))
+# Coalesce concurrent /predict calls into one inference of up to
+# MICROBATCH_SIZE rows, waiting at most MICROBATCH_WAIT_MS for stragglers
+MICROBATCH_ENABLED = env_flag("MICROBATCH_ENABLED", True)
+MICROBATCH_SIZE = int(os.environ.get("MICROBATCH_SIZE", 32))
+MICROBATCH_WAIT_MS = float(os.environ.get("MICROBATCH_WAIT_MS", 2.0))
+# Incremental /train: older samples replayed alongside the new ones, and the
+# fine-tuning learning rate (a full retrain uses build_model's)
+TRAIN_REPLAY_SIZE = int(os.environ.get("TRAIN_REPLAY_SIZE", 2048))
+TRAIN_FINETUNE_LR = float(os.environ.get("TRAIN_FINETUNE_LR", 1e-4))
+TRAIN_BATCH_SIZE = int(os.environ.get("TRAIN_BATCH_SIZE", 64))
 
 class PredictRequest(BaseModel):
     letters_accuracy: float
@@ -46,6 +129,10 @@ class PredictResponse(BaseModel):
     risk_score: float
     recommendation: str
 
+class BatchPredictResponse(BaseModel):
+    results: List[PredictResponse]
+    model_used: str
+
 class TrainSample(BaseModel):
     letters_accuracy: float
     words_accuracy: float
@@ -58,11 +145,36 @@ class TrainSample(BaseModel):
 class TrainRequest(BaseModel):
     samples: List[TrainSample]
     epochs: int = 30
+    # incremental: fine-tune the current model on samples added since it was trained;
+    # full: retrain from scratch on the whole store
+    mode: Literal["incremental", "full"] = "incremental"
+    replay_size: Optional[int] = None  # older samples mixed in (default TRAIN_REPLAY_SIZE)
 
 class TrainResponse(BaseModel):
     samples_added: int
-    trained_at: str
-    model_path: str
+    status: str  # queued | insufficient_data | up_to_date | fallback_model
+    job_id: Optional[str] = None
+    mode: Optional[str] = None
+
+class TrainJobStatus(BaseModel):
+    job_id: str
+    status: str  # queued | running | succeeded | failed | cancelled | insufficient_data | up_to_date
+    mode: str = "full"  # incremental falls back to full without a loadable base model
+    epochs: int
+    epochs_completed: int
+    loss: List[float]
+    val_loss: List[float]
+    base_version: Optional[str] = None  # registry version an incremental run started from
+    n_samples: Optional[int] = None  # rows trained on (new + replay, validation included)
+    new_samples: Optional[int] = None  # rows added since the previous training run
+    replay_samples: Optional[int] = None
+    samples_processed: int = 0  # training rows seen, summed over epochs
+    wall_time_s: Optional[float] = None
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    model_path: Optional[str] = None
+    error: Optional[str] = None
 
 def _feature_vector(sample):
     """Extract feature vector from sample"""
@@ -81,22 +193,30 @@ def _feature_vector(sample):
     ], dtype="float32")
     return vec
 
-def build_model(input_dim: int = 6):
-    """Build neural network model"""
-    if not TENSORFLOW_AVAILABLE:
-        return None
-    
-    inputs = layers.Input(shape=(input_dim,))
-    x = layers.Dense(32, activation='relu')(inputs)
-    x = layers.BatchNormalization()(x)
-    x = layers.Dropout(0.2)(x)
-    x = layers.Dense(16, activation='relu')(x)
-    x = layers.Dense(8, activation='relu')(x)
-    outputs = layers.Dense(1, activation='sigmoid')(x)
-    model = keras.Model(inputs, outputs)
-    model.compile(optimizer=keras.optimizers.Adam(learning_rate=1e-3),
-                  loss='binary_crossentropy', metrics=['accuracy'])
-    return model
+def _feature_matrix(samples) -> np.ndarray:
+    """Stack feature vectors of many samples into one (n, 6) matrix"""
+    X = np.empty((len(samples), 6), dtype="float32")
+    for i, sample in enumerate(samples):
+        X[i] = _feature_vector(sample)
+    return X
+
+def _recommendation(risk_score: float) -> str:
+    if risk_score >= 0.7:
+        return (
+            "Risiko tinggi: rujuk evaluasi profesional; fokus modul huruf dasar, ejaan pelan dengan audio, "
+            "dan latihan pengenalan gambar tingkat dasar."
+        )
+    elif risk_score >= 0.4:
+        return (
+            "Risiko sedang: latihan ejaan interaktif, permainan susun kata, dan latihan gambar berpasangan."
+        )
+    return "Risiko rendah: lanjutkan latihan bertahap dan pemantauan konsistensi."
+
+def _train_record_features(obj: dict) -> np.ndarray:
+    """Feature vector of one legacy JSONL training record"""
+    return _feature_vector(TrainSample(**obj))
+
+TRAINING_STORE = TrainingStore(TRAIN_STORE_DIR, dim=6)
 
 def advanced_scoring(sample: PredictRequest, model_config: dict) -> float:
     """Advanced statistical scoring with adaptive thresholds"""
@@ -155,247 +275,456 @@ def fallback_scoring(sample: PredictRequest) -> float:
     
     return risk_score
 
-def synthetic_dataset(n_samples: int = 1000):
-    """Generate synthetic training dataset"""
-    if not TENSORFLOW_AVAILABLE:
-        return None, None
-        
-    X, y = [], []
-    
-    for _ in range(n_samples):
-        # Generate realistic assessment scores
-        letters_accuracy = np.random.normal(0.7, 0.2)
-        words_accuracy = np.random.normal(0.65, 0.25)
-        arrange_accuracy = np.random.normal(0.6, 0.3)
-        speech_accuracy = np.random.normal(0.75, 0.2)
-        image_accuracy = np.random.normal(0.6, 0.25)
-        reaction_time = np.random.exponential(2.0)
-        
-        # Clip values to realistic ranges
-        letters_accuracy = np.clip(letters_accuracy, 0, 1)
-        words_accuracy = np.clip(words_accuracy, 0, 1)
-        arrange_accuracy = np.clip(arrange_accuracy, 0, 1)
-        speech_accuracy = np.clip(speech_accuracy, 0, 1)
-        image_accuracy = np.clip(image_accuracy, 0, 1)
-        reaction_time = np.clip(reaction_time, 0.5, 10)
-        
-        # Normalize reaction time to 0-1 scale (0s = 1.0, 5s = 0.0)
-        rt_norm = max(0.0, min(1.0, 1.0 - (reaction_time / 5.0)))
-        
-        features = [
-            letters_accuracy,
-            words_accuracy,
-            arrange_accuracy,
-            speech_accuracy,
-            image_accuracy,
-            rt_norm
-        ]
-        
-        # Calculate risk score based on weighted combination
-        risk_score = (
-            (1 - letters_accuracy) * 0.25 +
-            (1 - words_accuracy) * 0.25 +
-            (1 - arrange_accuracy) * 0.20 +
-            (1 - speech_accuracy) * 0.15 +
-            (1 - image_accuracy) * 0.10 +
-            (1 - rt_norm) * 0.05
-        )
-        
-        # Add some noise and clip
-        risk_score += np.random.normal(0, 0.05)
-        risk_score = np.clip(risk_score, 0, 1)
-        
-        # Binary label: 1 for high risk (>0.6), 0 for low risk
-        label = 1 if risk_score > 0.6 else 0
-        
-        X.append(features)
-        y.append(label)
-    
-    return np.array(X, dtype='float32'), np.array(y, dtype='float32')
+def _serving_model(keras_model, npz_path: str):
+    """Export a Keras model to NPZ and return the model that should serve predictions"""
+    try:
+        mlp = export_keras(keras_model, npz_path)
+        print(f"[OK] Exported NumPy weights to {npz_path}")
+    except Exception as e:
+        print(f"[WARN] NumPy export failed, serving Keras model: {e}")
+        return keras_model
+    return keras_model if INFERENCE_ENGINE == "keras" else mlp
+
+def _load_version(version: str):
+    """Serving model of a registry version (NumPy weights unless INFERENCE_ENGINE=keras)"""
+    npz = MODEL_REGISTRY.path(version, "model.npz")
+    with MODEL_LOAD_DURATION.time("registry"):
+        if INFERENCE_ENGINE != "keras" and os.path.exists(npz):
+            return NumpyMLP.load(npz)
+        if not TENSORFLOW_AVAILABLE:
+            raise RuntimeError(f"{version} has no NumPy export and TensorFlow is not available")
+        model = keras.models.load_model(MODEL_REGISTRY.path(version, "model.keras"))
+        # versions imported without an export get one, so later loads skip TensorFlow
+        return model if os.path.exists(npz) else _serving_model(model, npz)
+
+def _swap_model(version: str, model):
+    global MODEL, MODEL_VERSION
+    MODEL, MODEL_VERSION = model, version  # in-flight requests keep the model they started with
+    if MODEL_STATE in ("fallback", "failed"):
+        _set_state("ready")  # a version published by another worker
+    print(f"[OK] Serving model {version}")
+
+MODEL_REGISTRY = ModelRegistry(MODEL_REGISTRY_DIR, keep=MODEL_REGISTRY_KEEP)
+SHADOW = ShadowScorer(thresholds=(0.4, 0.7))
+# NumPy exports are a few KB, so every retained version stays loaded for instant
+# rollback; Keras models are loaded on activation instead
+MODEL_LOADER = ModelLoader(MODEL_REGISTRY, _load_version, _swap_model, shadow=SHADOW,
+                           poll_interval=MODEL_POLL_SECONDS,
+                           resident=MODEL_REGISTRY_KEEP if INFERENCE_ENGINE != "keras" else 0)
+
+def _publish_model(keras_model, keras_path: str, meta: dict) -> str:
+    """Add a trained model to the registry, preload it and make it current (or the candidate)"""
+    npz_path = keras_path + ".npz"
+    try:
+        serving = _serving_model(keras_model, npz_path)
+        files = {"model.keras": keras_path}
+        if os.path.exists(npz_path):
+            files["model.npz"] = npz_path
+        version = MODEL_REGISTRY.publish(files, meta)
+    finally:
+        if os.path.exists(npz_path):
+            os.remove(npz_path)
+    MODEL_LOADER.add(version, serving)
+    if MODEL_PUBLISH == "shadow" and MODEL_VERSION is not None:
+        MODEL_REGISTRY.set_candidate(version, SHADOW_SAMPLE_RATE)
+        MODEL_LOADER.sync()
+        print(f"[OK] Published model {version} as the shadow candidate")
+    else:
+        MODEL_LOADER.activate(version)
+    return version
+
+def _import_legacy_model():
+    """Publish the pre-registry single-file artifacts as the first version"""
+    if MODEL_REGISTRY.versions():
+        return
+    files = {name: path for name, path in (("model.keras", MODEL_PATH), ("model.npz", NPZ_PATH))
+             if os.path.exists(path)}
+    if not files:
+        return
+    meta = {}
+    if os.path.exists(META_PATH):
+        try:
+            with open(META_PATH) as f:
+                meta = json.load(f)
+        except ValueError:
+            pass
+    version = MODEL_REGISTRY.publish(files, dict(meta, imported_from="legacy"))
+    MODEL_REGISTRY.set_current(version)
+    print(f"[OK] Imported {', '.join(sorted(files.values()))} into the model registry as {version}")
+
+def _engine_name(model) -> str:
+    if model is None:
+        return "fallback"
+    return getattr(model, "engine", "keras")
+
+def _set_state(state: str):
+    global MODEL_STATE
+    MODEL_STATE = state
+    if state == "ready" and TIMINGS["model_ready_s"] is None:
+        TIMINGS["model_ready_s"] = round(time.perf_counter() - PROCESS_STARTED, 3)
+
+def _mark_response():
+    if TIMINGS["time_to_first_response_s"] is None:
+        TIMINGS["time_to_first_response_s"] = round(time.perf_counter() - PROCESS_STARTED, 3)
 
 def ensure_model():
     """Load or create ML model"""
-    global MODEL
     os.makedirs("models", exist_ok=True)
     
     if MODEL is not None:
         return MODEL
-    
+
+    _set_state("loading")
+    try:
+        _import_legacy_model()
+        # Serve the registry's current version (sets MODEL through _swap_model)
+        MODEL_LOADER.sync(force=True)
+        if MODEL is not None:
+            return MODEL
+    except Exception as e:
+        print(f"Error loading model {MODEL_REGISTRY.current()}: {e}")
+
     if not TENSORFLOW_AVAILABLE:
         print("Using fallback scoring instead of ML model")
+        _set_state("fallback")
         return None
-        
-    if os.path.exists(MODEL_PATH):
-        try:
-            MODEL = keras.models.load_model(MODEL_PATH)
-            print("[OK] Loaded existing model")
-            return MODEL
-        except Exception as e:
-            print(f"Error loading model: {e}")
-    
+
+    if not COLD_START_TRAINING:
+        print("[INFO] No model yet; serving fallback scoring until one is published")
+        _set_state("fallback")
+        return None
+
     # Train on synthetic data if no model exists
     print("[INFO] Training new model on synthetic data...")
-    X, y = synthetic_dataset()
-    if X is None:
-        return None
-        
-    MODEL = build_model(input_dim=X.shape[1])
-    es = callbacks.EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
-    MODEL.fit(X, y, epochs=30, batch_size=64, validation_split=0.2, verbose=1, callbacks=[es])
-    MODEL.save(MODEL_PATH)
-    
-    with open(META_PATH, 'w') as f:
-        json.dump({
+    _set_state("training")
+    if SYNTHETIC_SHARDS_DIR and os.path.exists(os.path.join(SYNTHETIC_SHARDS_DIR, "manifest.json")):
+        # Stream the shards; the full set is never materialized
+        model = build_model(input_dim=6)
+        es = callbacks.EarlyStopping(monitor='loss', patience=3, restore_best_weights=True)
+        ds = synthetic.shard_dataset(SYNTHETIC_SHARDS_DIR, batch_size=1024, seed=SYNTHETIC_SEED)
+        model.fit(ds, epochs=30, verbose=1, callbacks=[es])
+    else:
+        X, y = synthetic_dataset()
+        model = build_model(input_dim=X.shape[1])
+        es = callbacks.EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
+        model.fit(X, y, epochs=30, batch_size=64, validation_split=0.2, verbose=1, callbacks=[es])
+    path = os.path.join("models", f".cold-start-{os.getpid()}.keras")
+    model.save(path)
+    try:
+        _publish_model(model, path, {
             "trained_at": datetime.utcnow().isoformat(),
             "model_type": "neural_network",
             "synthetic_data": True
-        }, f)
-    
+        })
+    finally:
+        os.remove(path)
+
     print("[OK] Model trained and saved")
     return MODEL
 
+def _initialize_model():
+    """Background worker: load or cold-train the model, then swap it in"""
+    try:
+        with MODEL_LOAD_DURATION.time("startup"):
+            model = ensure_model()
+        if model is not None:
+            _set_state("ready")
+            print("[READY] Neural network model active")
+    except Exception as e:
+        _set_state("failed")
+        print(f"[WARN] Model initialization failed, staying on fallback scoring: {e}")
+
+def _score_matrix(X: np.ndarray):
+    """Run one forward pass over a feature matrix with the current model"""
+    # Callers only get here once MODEL is set, and it is never reset to None
+    return MODEL.predict(X, batch_size=max(len(X), 1), verbose=0)[:, 0]
+
+BATCHER = MicroBatcher(_score_matrix, max_batch_size=MICROBATCH_SIZE, max_wait_ms=MICROBATCH_WAIT_MS)
+
+PREDICTION_LOG = PredictionLogWriter(
+    PREDICTION_LOG_PATH,
+    flush_records=int(os.environ.get("PREDICTION_LOG_FLUSH_RECORDS", 256)),
+    flush_interval=float(os.environ.get("PREDICTION_LOG_FLUSH_SECONDS", 1.0)),
+    fsync=os.environ.get("PREDICTION_LOG_FSYNC", "interval"),
+    rotate_bytes=int(os.environ.get("PREDICTION_LOG_ROTATE_BYTES", 64 * 1024 * 1024)),
+    rotate_daily=env_flag("PREDICTION_LOG_ROTATE_DAILY", True),
+)
+
 @app.on_event("startup")
 def startup():
     """Initialize model on startup"""
-    ensure_model()
-    print("[READY] ML Service ready!")
+    try:
+        migrated = TRAINING_STORE.migrate_jsonl(DATASET_PATH, _train_record_features)
+        if migrated:
+            print(f"[OK] Migrated {migrated} training samples from {DATASET_PATH}")
+    except Exception as e:
+        print(f"[WARN] Could not migrate {DATASET_PATH}: {e}")
+    # Load/train off the startup path so the service accepts traffic immediately
+    threading.Thread(target=_initialize_model, name="model-init", daemon=True).start()
+    print("[READY] ML Service ready! (serving fallback scoring until the model is loaded)")
+
+@app.on_event("startup")
+async def start_batcher():
+    if MICROBATCH_ENABLED:
+        BATCHER.start()
+
+@app.on_event("startup")
+def start_model_loader():
+    # Loads the current, candidate and resident versions and follows the registry pointers
+    MODEL_LOADER.start()
+
+@app.on_event("shutdown")
+def stop_model_loader():
+    MODEL_LOADER.stop()
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    await BATCHER.stop()
+
+@app.on_event("shutdown")
+def close_prediction_log():
+    # Final flush of buffered prediction records
+    PREDICTION_LOG.close()
+
+@app.on_event("shutdown")
+def close_profiler():
+    if PROFILER is not None:
+        PROFILER.close()
 
 @app.get("/")
 def root():
     trained_at = None
     model_type = "fallback"
-    
-    if os.path.exists(META_PATH):
-        try:
-            meta = json.load(open(META_PATH))
-            trained_at = meta.get("trained_at")
-            model_type = meta.get("model_type", "neural_network")
-        except Exception:
-            trained_at = None
-            
+
+    if MODEL_VERSION is not None:
+        meta = MODEL_REGISTRY.meta(MODEL_VERSION)
+        trained_at = meta.get("trained_at")
+        model_type = meta.get("model_type", "neural_network")
+
     return {
         "service": "BinaKata ML Service", 
         "status": "ready",
+        "model_state": MODEL_STATE,
         "tensorflow_available": TENSORFLOW_AVAILABLE,
         "model_type": model_type,
+        "inference_engine": _engine_name(MODEL),
+        "model_version": MODEL_VERSION,
         "trained_at": trained_at,
         "version": "2.0.0"
     }
 
 @app.post("/predict", response_model=PredictResponse)
-def predict(req: PredictRequest):
+async def predict(req: PredictRequest):
     """Predict dyslexia risk"""
-    model = ensure_model()
-    
-    if TENSORFLOW_AVAILABLE and model is not None:
-        # Use neural network model
-        x = _feature_vector(req)[None, :]
-        risk_score = float(model.predict(x, verbose=0)[0][0])
+    started = time.perf_counter()
+    x = _feature_vector(req)
+    if MODEL is not None:
+        # Use neural network model (Keras or exported NumPy weights)
+        if MICROBATCH_ENABLED:
+            risk_score = await BATCHER.submit(x)
+        else:
+            risk_score = float((await run_in_threadpool(_score_matrix, x[None, :]))[0])
         model_used = "neural_network"
+        SHADOW.offer(x[None, :], [risk_score])
     else:
-        # Use fallback scoring
+        # Use fallback scoring (no model, or still loading/training in the background)
         risk_score = fallback_scoring(req)
         model_used = "fallback"
+    INFERENCE_DURATION.labels(model_used, "single").observe(time.perf_counter() - started)
     
-    if risk_score >= 0.7:
-        recommendation = (
-            "Risiko tinggi: rujuk evaluasi profesional; fokus modul huruf dasar, ejaan pelan dengan audio, "
-            "dan latihan pengenalan gambar tingkat dasar."
-        )
-    elif risk_score >= 0.4:
-        recommendation = (
-            "Risiko sedang: latihan ejaan interaktif, permainan susun kata, dan latihan gambar berpasangan."
-        )
-    else:
-        recommendation = "Risiko rendah: lanjutkan latihan bertahap dan pemantauan konsistensi."
+    recommendation = _recommendation(risk_score)
+    _mark_response()
 
     # Save prediction for future training (anonymized)
     prediction_data = {
-        "features": _feature_vector(req).tolist(),
+        "features": x.tolist(),
         "risk_score": risk_score,
         "model_used": model_used,
         "timestamp": datetime.utcnow().isoformat()
     }
-    
-    # Append to dataset for future retraining
-    try:
-        with open(DATASET_PATH, 'a') as f:
-            f.write(json.dumps(prediction_data) + "\n")
-    except Exception:
-        pass  # Don't fail if we can't save
+    # Non-blocking enqueue; the log writer thread batches it to disk
+    PREDICTION_LOG.log(prediction_data)
 
     return PredictResponse(risk_score=risk_score, recommendation=recommendation)
 
+def _parse_batch(body: bytes, content_type: str) -> List[PredictRequest]:
+    """Parse a JSON array, {"samples": [...]} object or NDJSON body into requests"""
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        raw = [json.loads(line) for line in body.splitlines() if line.strip()]
+    else:
+        raw = json.loads(body) if body.strip() else []
+        if isinstance(raw, dict):
+            raw = raw.get("samples", [])
+    if not isinstance(raw, list):
+        raise ValueError("expected a list of samples")
+    return [PredictRequest(**obj) for obj in raw]
+
+def _score_batch(samples: List[PredictRequest]):
+    """Score all samples with a single forward pass"""
+    if MODEL is not None:
+        X = _feature_matrix(samples)
+        scores = _score_matrix(X)
+        SHADOW.offer(X, scores)
+        return scores.tolist(), "neural_network"
+    return [fallback_scoring(s) for s in samples], "fallback"
+
+@app.post("/predict/batch", response_model=BatchPredictResponse)
+async def predict_batch(request: Request):
+    """Predict dyslexia risk for many samples at once (JSON array or NDJSON body)"""
+    body = await request.body()
+    try:
+        samples = _parse_batch(body, request.headers.get("content-type", ""))
+    except (ValueError, TypeError, ValidationError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid batch: {e}")
+    if len(samples) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(samples)} exceeds MAX_BATCH_SIZE={MAX_BATCH_SIZE}"
+        )
+    if not samples:
+        return BatchPredictResponse(results=[], model_used="none")
+
+    started = time.perf_counter()
+    scores, model_used = await run_in_threadpool(_score_batch, samples)
+    INFERENCE_DURATION.labels(model_used, "batch").observe(time.perf_counter() - started)
+    results = [
+        PredictResponse(risk_score=float(score), recommendation=_recommendation(score))
+        for score in scores
+    ]
+    _mark_response()
+    return BatchPredictResponse(results=results, model_used=model_used)
+
+def _publish_trained_model(job: dict, path: str) -> str:
+    """Publish a model trained by a background job as a new registry version"""
+    # Fully load (and export) the new model before it becomes visible
+    with MODEL_LOAD_DURATION.time("publish"):
+        model = keras.models.load_model(path)
+        version = _publish_model(model, path, {
+            "trained_at": datetime.utcnow().isoformat(),
+            "n_samples": len(TRAINING_STORE),
+            "model_type": "neural_network",
+            "synthetic_data": False,
+            "job_id": job["job_id"],
+            "training_mode": job["mode"],
+            # watermark for the next incremental run
+            "trained_rows": job["rows_end"],
+        })
+    print(f"[OK] Training job {job['job_id']} published as {version}")
+    return MODEL_REGISTRY.path(version)
+
+TRAINING_JOBS = TrainingJobManager(TRAIN_STORE_DIR, "models", on_success=_publish_trained_model)
+
+@app.on_event("shutdown")
+def stop_training_jobs():
+    TRAINING_JOBS.shutdown()
+
 @app.post("/train", response_model=TrainResponse)
 def train(req: TrainRequest):
-    """Retrain model with new data"""
+    """Store new samples and queue a background training job (incremental unless mode=full)"""
     if not TENSORFLOW_AVAILABLE:
-        return TrainResponse(
-            samples_added=0,
-            trained_at=datetime.utcnow().isoformat(),
-            model_path="fallback_model"
-        )
+        return TrainResponse(samples_added=0, status="fallback_model")
     
     os.makedirs("models", exist_ok=True)
     
-    # Append samples to dataset file
-    added = 0
-    with open(DATASET_PATH, 'a') as f:
-        for s in req.samples:
-            record = s.model_dump()
-            f.write(json.dumps(record) + "\n")
-            added += 1
-
-    # Load all training data
-    X_list, y_list = [], []
+    # Append samples to the training store (cost is proportional to the new data only)
+    added = len(req.samples)
+    if added:
+        X_new = _feature_matrix(req.samples)
+        y_new = np.array([s.label for s in req.samples], dtype='float32')
+        TRAINING_STORE.append(X_new, y_new)
+
+    rows = len(TRAINING_STORE)
+    if rows < 10:
+        return TrainResponse(samples_added=added, status="insufficient_data", mode=req.mode)
+    if req.mode == "incremental" and _training_watermark() >= rows:
+        return TrainResponse(samples_added=added, status="up_to_date", mode=req.mode)
+
+    # Fit runs in a separate process; poll GET /train/{job_id} for progress, wall time
+    # and samples processed. The watermark is read when the job starts, after any
+    # earlier job has been published.
+    job = TRAINING_JOBS.submit(
+        epochs=req.epochs,
+        mode=req.mode,
+        registry_dir=MODEL_REGISTRY_DIR,
+        replay_size=TRAIN_REPLAY_SIZE if req.replay_size is None else max(req.replay_size, 0),
+        learning_rate=TRAIN_FINETUNE_LR,
+        batch_size=TRAIN_BATCH_SIZE,
+    )
+    return TrainResponse(samples_added=added, status=job["status"], job_id=job["job_id"], mode=job["mode"])
+
+def _training_watermark() -> int:
+    """Training store rows the current model was trained on (0 for the cold-start model)"""
+    version = MODEL_REGISTRY.current()
     try:
-        with open(DATASET_PATH, 'r') as f:
-            for line in f:
-                if line.strip():
-                    obj = json.loads(line)
-                    if 'label' in obj:  # Training sample
-                        sample = TrainSample(**obj)
-                        X_list.append(_feature_vector(sample))
-                        y_list.append(float(sample.label))
-    except Exception as e:
-        print(f"Error loading training data: {e}")
-        # Fall back to synthetic data
-        X, y = synthetic_dataset()
-        if X is not None:
-            X_list = X.tolist()
-            y_list = y.tolist()
-
-    if len(X_list) < 10:
-        return TrainResponse(
-            samples_added=added,
-            trained_at=datetime.utcnow().isoformat(),
-            model_path="insufficient_data"
-        )
+        return int(MODEL_REGISTRY.meta(version).get("trained_rows") or 0) if version else 0
+    except (ValueError, TypeError):
+        return 0
 
-    X = np.array(X_list, dtype='float32')
-    y = np.array(y_list, dtype='float32')
+@app.get("/train/{job_id}", response_model=TrainJobStatus)
+def train_status(job_id: str):
+    """Status and loss curves of a training job"""
+    job = TRAINING_JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    return TrainJobStatus(**job)
 
-    # Train model
-    global MODEL
-    MODEL = build_model(input_dim=X.shape[1])
-    es = callbacks.EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
-    MODEL.fit(X, y, epochs=req.epochs, batch_size=64, validation_split=0.2, verbose=1, callbacks=[es])
-    MODEL.save(MODEL_PATH)
-    
-    meta = {
-        "trained_at": datetime.utcnow().isoformat(), 
-        "n_samples": len(y),
-        "model_type": "neural_network",
-        "synthetic_data": False
+@app.delete("/train/{job_id}", response_model=TrainJobStatus)
+def cancel_training(job_id: str):
+    """Cancel a queued or running training job"""
+    job = TRAINING_JOBS.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    return TrainJobStatus(**job)
+
+@app.get("/models")
+def list_models():
+    """Registry versions, the served and shadow versions, and shadow comparison stats"""
+    candidate = MODEL_REGISTRY.candidate()
+    return {
+        "current": MODEL_REGISTRY.current(),
+        "serving": MODEL_VERSION,
+        "candidate": candidate,
+        "versions": [dict(MODEL_REGISTRY.meta(v), version=v) for v in reversed(MODEL_REGISTRY.versions())],
+        "loader": MODEL_LOADER.stats(),
     }
-    with open(META_PATH, 'w') as f:
-        json.dump(meta, f)
 
-    return TrainResponse(
-        samples_added=added,
-        trained_at=meta["trained_at"],
-        model_path=MODEL_PATH
-    )
+def _require_version(version: str):
+    if not MODEL_REGISTRY.exists(version):
+        raise HTTPException(status_code=404, detail="Model version not found")
+
+@app.post("/models/{version}/activate")
+def activate_model(version: str):
+    """Serve a version (rollback or roll forward); instant when it's resident, else loaded first"""
+    _require_version(version)
+    try:
+        MODEL_LOADER.activate(version)
+    except Exception as e:
+        raise HTTPException(status_code=409, detail=f"Could not load {version}: {e}")
+    return {"current": version}
+
+@app.post("/models/{version}/shadow")
+def shadow_model(version: str, sample_rate: Optional[float] = None):
+    """Score a sampled fraction of traffic with ``version`` next to the served model"""
+    _require_version(version)
+    rate = SHADOW_SAMPLE_RATE if sample_rate is None else min(max(sample_rate, 0.0), 1.0)
+    MODEL_REGISTRY.set_candidate(version, rate)
+    try:
+        MODEL_LOADER.sync()
+    except Exception as e:
+        MODEL_REGISTRY.set_candidate(None)
+        raise HTTPException(status_code=409, detail=f"Could not load {version}: {e}")
+    return {"candidate": version, "sample_rate": rate}
+
+@app.delete("/models/shadow")
+def stop_shadow():
+    MODEL_REGISTRY.set_candidate(None)
+    MODEL_LOADER.sync()
+    return {"candidate": None}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Prometheus text exposition of latency, inference, model load and training metrics"""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
 
 @app.get("/health")
 def health_check():
@@ -403,13 +732,20 @@ def health_check():
         "status": "healthy",
         "service": "BinaKata ML Service",
         "tensorflow_available": TENSORFLOW_AVAILABLE,
+        "ready": True,
+        "model_ready": MODEL_STATE == "ready",
+        "model_state": MODEL_STATE,
         "model_loaded": MODEL is not None,
+        "model_version": MODEL_VERSION,
+        "inference_engine": _engine_name(MODEL),
+        **TIMINGS,
+        "batching": BATCHER.stats() if MICROBATCH_ENABLED else None,
+        "prediction_log": PREDICTION_LOG.stats(),
         "timestamp": datetime.utcnow().isoformat()
     }
 
 if __name__ == "__main__":
-    import uvicorn
-    port = int(os.environ.get("PORT", 5000))
-    print(f"[START] Starting BinaKata ML Service on port {port}")
-    print(f"[INFO] TensorFlow Available: {TENSORFLOW_AVAILABLE}")
-    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
+    # serve.py has to cap the BLAS/TF thread pools before numpy and TensorFlow load,
+    # which they already have in this process, so start it fresh
+    serve = os.path.join(os.path.dirname(os.path.abspath(__file__)), "serve.py")
+    os.execv(sys.executable, [sys.executable, serve])
\ No newline at end of file
@@ -0,0 +1,116 @@
+"""Dynamic micro-batching for concurrent /predict calls.
+
+Requests are queued on the event loop and flushed as one batched
+inference once ``max_batch_size`` requests are waiting or the oldest has
+waited ``max_wait_ms``. Only one inference runs at a time, so concurrent
+requests coalesce instead of contending for the model on the threadpool.
+"""
+import asyncio
+import time
+from collections import Counter
+
+import numpy as np
+
+
+class MicroBatcher:
+    def __init__(self, score_fn, max_batch_size: int = 32, max_wait_ms: float = 2.0):
+        # score_fn(X: np.ndarray of shape (n, d)) -> sequence of n floats; runs in a worker thread
+        self.score_fn = score_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = None
+        self._task = None
+        # stats
+        self.batches = 0
+        self.requests = 0
+        self.errors = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.batch_sizes = Counter()
+
+    def start(self):
+        """Start the flush loop on the running event loop (idempotent)"""
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Cancel the flush loop and fail anything still queued"""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        while self._queue is not None and not self._queue.empty():
+            _, fut, _ = self._queue.get_nowait()
+            if not fut.done():
+                fut.set_exception(RuntimeError("batcher stopped"))
+
+    async def submit(self, features: np.ndarray) -> float:
+        """Queue one feature vector and wait for its score"""
+        if self._task is None or self._task.done():
+            self.start()
+        fut = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((features, fut, time.perf_counter()))
+        return await fut
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._flush(loop, batch)
+
+    async def _flush(self, loop, batch):
+        # Callers that gave up (client disconnect) don't need a score
+        batch = [entry for entry in batch if not entry[1].done()]
+        if not batch:
+            return
+        now = time.perf_counter()
+        for _, _, enqueued in batch:
+            wait = now - enqueued
+            self.queue_wait_total += wait
+            if wait > self.queue_wait_max:
+                self.queue_wait_max = wait
+        self.batches += 1
+        self.requests += len(batch)
+        self.batch_sizes[len(batch)] += 1
+
+        X = np.stack([features for features, _, _ in batch])
+        try:
+            scores = await loop.run_in_executor(None, self.score_fn, X)
+        except Exception as e:
+            self.errors += 1
+            for _, fut, _ in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, fut, _), score in zip(batch, scores):
+            if not fut.done():
+                fut.set_result(float(score))
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self.batches,
+            "requests": self.requests,
+            "errors": self.errors,
+            "avg_batch_size": (self.requests / self.batches) if self.batches else 0.0,
+            "avg_queue_wait_ms": (self.queue_wait_total / self.requests * 1000.0) if self.requests else 0.0,
+            "max_queue_wait_ms": self.queue_wait_max * 1000.0,
+            "batch_size_histogram": {str(k): v for k, v in sorted(self.batch_sizes.items())},
+        }
@@ -0,0 +1,435 @@
+"""Versioned model registry with background loading and shadow scoring.
+
+Layout of the registry directory:
+
+    v000001/       one directory per published version
+        model.keras    trained Keras model
+        model.npz      NumPy export, served without TensorFlow
+        meta.json      trained_at, n_samples, trained_rows, job_id, ...
+    CURRENT        name of the version being served, then the pointer generation
+    CANDIDATE      {"version", "sample_rate"} of the version scored in shadow mode
+
+A version is assembled and fsync'ed in a ``.tmp-*`` directory and then
+renamed into place, and the pointer files are replaced with
+temp-file-and-rename, so a crash never leaves a half-written version or
+pointer. The ``keep`` newest versions are retained, plus the current
+and candidate ones. Every ``set_current`` bumps the generation stored in
+CURRENT, so a loader can tell a newer pointer from the one it already
+serves, even when both name the same version.
+
+``ModelLoader`` keeps the current and candidate versions loaded in
+memory, plus the ``resident`` newest versions, and polls the pointers
+from a background thread: a version is fully loaded before the served
+reference is swapped, so requests never wait on a load, and rolling back
+to a resident version is just a pointer swap. Other versions are loaded
+from disk when activated. Every worker runs its own loader, so a publish
+or rollback made through any worker reaches all of them within
+``poll_interval`` seconds.
+
+``ShadowScorer`` re-scores a sampled fraction of requests with the
+candidate on its own thread and records how far it deviates from the
+served model; requests only pay for a non-blocking queue put.
+"""
+import json
+import os
+import queue
+import random
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from binakata_common import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process dev only
+    fcntl = None
+
+_VERSION_RE = re.compile(r"^v\d{6}$")
+
+SHADOW_DIFF = metrics.Histogram(
+    "shadow_score_abs_diff", "Absolute risk score difference between the candidate and the served model",
+    buckets=(0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0),
+)
+
+
+def _fsync_dir(path: str):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _write_atomic(path: str, data: str):
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "w") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class ModelRegistry:
+    def __init__(self, directory: str, keep: int = 5):
+        self.directory = directory
+        self.keep = keep
+        self.current_path = os.path.join(directory, "CURRENT")
+        self.candidate_path = os.path.join(directory, "CANDIDATE")
+        self._thread_lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            fd = os.open(os.path.join(self.directory, ".lock"), os.O_WRONLY | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                os.close(fd)
+
+    # -- versions -----------------------------------------------------
+
+    def versions(self) -> List[str]:
+        """Published versions, oldest first"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(n for n in names if _VERSION_RE.match(n))
+
+    def path(self, version: str, name: str = "") -> str:
+        return os.path.join(self.directory, version, name)
+
+    def exists(self, version: str) -> bool:
+        return bool(_VERSION_RE.match(version)) and os.path.isdir(self.path(version))
+
+    def meta(self, version: str) -> dict:
+        try:
+            with open(self.path(version, "meta.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def publish(self, files: Dict[str, str], meta: dict) -> str:
+        """Copy ``{name: source path}`` and ``meta`` into a new version; returns its name.
+
+        The version is complete once it's visible. Pointers are left alone, so
+        callers can preload it before making it current or a candidate.
+        """
+        with self._locked():
+            existing = self.versions()
+            version = "v%06d" % (int(existing[-1][1:]) + 1 if existing else 1)
+            tmp = os.path.join(self.directory, f".tmp-{uuid.uuid4().hex[:8]}")
+            os.makedirs(tmp)
+            try:
+                for name, src in files.items():
+                    dst = os.path.join(tmp, name)
+                    shutil.copyfile(src, dst)
+                    with open(dst, "rb+") as f:
+                        os.fsync(f.fileno())
+                _write_atomic(os.path.join(tmp, "meta.json"), json.dumps(dict(meta, version=version)))
+                _fsync_dir(tmp)
+                os.rename(tmp, self.path(version))
+                _fsync_dir(self.directory)
+            except BaseException:
+                shutil.rmtree(tmp, ignore_errors=True)
+                raise
+            self._prune_locked()
+        return version
+
+    def _prune_locked(self):
+        pinned = {self.current(), (self.candidate() or {}).get("version")}
+        versions = self.versions()
+        for version in versions[:-self.keep] if self.keep > 0 else ():
+            if version not in pinned:
+                shutil.rmtree(self.path(version), ignore_errors=True)
+        # leftovers of publishes that crashed mid-copy
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith(".tmp-") and time.time() - os.path.getmtime(path) > 3600:
+                shutil.rmtree(path, ignore_errors=True)
+
+    # -- pointers -----------------------------------------------------
+
+    def current(self) -> Optional[str]:
+        return self.current_pointer()[0]
+
+    def current_pointer(self) -> Tuple[Optional[str], int]:
+        """(current version, generation); the generation grows with every ``set_current``"""
+        try:
+            with open(self.current_path) as f:
+                fields = f.read().split()
+        except OSError:
+            return None, 0
+        version = fields[0] if fields else ""
+        generation = int(fields[1]) if len(fields) > 1 and fields[1].isdigit() else 0
+        return (version if self.exists(version) else None), generation
+
+    def set_current(self, version: str) -> int:
+        """Point CURRENT at ``version``; returns the new generation"""
+        if not self.exists(version):
+            raise KeyError(version)
+        with self._locked():
+            generation = self.current_pointer()[1] + 1
+            _write_atomic(self.current_path, f"{version}\n{generation}\n")
+        return generation
+
+    def candidate(self) -> Optional[dict]:
+        try:
+            with open(self.candidate_path) as f:
+                candidate = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return candidate if self.exists(candidate.get("version", "")) else None
+
+    def set_candidate(self, version: Optional[str], sample_rate: float = 0.0):
+        with self._locked():
+            if version is None:
+                try:
+                    os.remove(self.candidate_path)
+                except FileNotFoundError:
+                    pass
+                return
+            if not self.exists(version):
+                raise KeyError(version)
+            _write_atomic(self.candidate_path, json.dumps({"version": version, "sample_rate": sample_rate}))
+
+
+class ModelLoader:
+    """In-memory cache of loaded versions; swaps the served model off the request path.
+
+    ``load(version) -> model`` builds a serving model from the registry and
+    ``on_swap(version, model)`` publishes it (a single reference assignment).
+    """
+
+    def __init__(self, registry: ModelRegistry, load, on_swap, shadow: "ShadowScorer" = None,
+                 poll_interval: float = 2.0, resident: int = 0):
+        self.registry = registry
+        self.resident = resident  # newest versions kept loaded for instant rollback
+        self._load = load
+        self._on_swap = on_swap
+        self.shadow = shadow
+        self.poll_interval = poll_interval
+        self.current: Optional[str] = None
+        self.generation = -1  # CURRENT pointer generation being served (-1: none yet)
+        self._models: "OrderedDict[str, object]" = OrderedDict()
+        self._lock = threading.Lock()  # guards _models
+        self._load_lock = threading.Lock()  # one load at a time
+        self._swap_lock = threading.Lock()  # orders pointer moves and swaps (activate vs sync)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.swaps = 0
+        self.load_errors = 0
+
+    def add(self, version: str, model):
+        """Seed the cache with a model that is already loaded (e.g. just trained)"""
+        with self._lock:
+            self._models[version] = model
+
+    def install(self, version: str, model, generation: int):
+        """Serve a model that is already loaded without touching the pointers (e.g. preloaded by serve.py)"""
+        self.add(version, model)
+        with self._swap_lock:
+            self._swap(version, model, generation)
+        self._evict()
+
+    def get(self, version: str):
+        """Loaded model of ``version``, loading it on this thread if needed"""
+        with self._lock:
+            model = self._models.get(version)
+        if model is not None:
+            return model
+        with self._load_lock:
+            with self._lock:
+                model = self._models.get(version)
+            if model is None:
+                model = self._load(version)
+                with self._lock:
+                    self._models[version] = model
+        return model
+
+    def activate(self, version: str):
+        """Serve ``version``: load it, move the CURRENT pointer, swap the reference"""
+        model = self.get(version)
+        with self._swap_lock:
+            self._swap(version, model, self.registry.set_current(version))
+        return model
+
+    def _swap(self, version: str, model, generation: int):
+        self.current = version
+        self.generation = generation
+        self._on_swap(version, model)
+        self.swaps += 1
+
+    def sync(self, force: bool = False):
+        """Follow the pointers on disk; with ``force`` re-announce the current model"""
+        version, generation = self.registry.current_pointer()
+        if version is not None and (force or generation > self.generation):
+            model = self.get(version)  # loaded outside the lock
+            with self._swap_lock:
+                # skip the swap if the pointer moved while loading (the next poll
+                # follows it) or an activate already served a newer generation
+                if self.registry.current_pointer()[1] == generation and \
+                        (force or generation > self.generation):
+                    self._swap(version, model, generation)
+        if self.shadow is not None:
+            candidate = self.registry.candidate()
+            if candidate is None:
+                self.shadow.set_model(None, None)
+            elif candidate["version"] != self.shadow.version or candidate["sample_rate"] != self.shadow.sample_rate:
+                self.shadow.set_model(candidate["version"], self.get(candidate["version"]),
+                                      candidate["sample_rate"])
+        self._evict()
+
+    def _newest(self) -> List[str]:
+        return self.registry.versions()[-self.resident:] if self.resident > 0 else []
+
+    def _evict(self):
+        retained = set(self._newest()) | {self.current, self.shadow.version if self.shadow else None}
+        with self._lock:
+            for version in [v for v in self._models if v not in retained]:
+                del self._models[version]
+
+    def preload(self):
+        """Load the ``resident`` newest versions so that rolling back to them never waits on a load"""
+        for version in self._newest():
+            if self._stop.is_set():
+                return
+            try:
+                self.get(version)
+            except Exception as e:
+                self.load_errors += 1
+                print(f"[WARN] Could not preload model {version}: {e}")
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="model-loader", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(5.0)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            try:
+                self.sync()
+                self.preload()  # cached versions are just a lookup
+            except Exception as e:
+                self.load_errors += 1
+                print(f"[WARN] Model registry sync failed: {e}")
+            if self._stop.wait(self.poll_interval):
+                return
+
+    def stats(self) -> dict:
+        with self._lock:
+            loaded = list(self._models)
+        return {
+            "current": self.current,
+            "loaded": loaded,
+            "swaps": self.swaps,
+            "load_errors": self.load_errors,
+            "shadow": self.shadow.stats() if self.shadow is not None else None,
+        }
+
+
+class ShadowScorer:
+    """Scores sampled requests with a candidate model on a background thread.
+
+    Scores are compared with the served model's: mean/max absolute difference
+    and how often both land in the same risk band (``thresholds``).
+    """
+
+    def __init__(self, thresholds=(0.4, 0.7), queue_size: int = 1024):
+        self.thresholds = np.asarray(thresholds, dtype="float32")
+        self.version: Optional[str] = None
+        self.sample_rate = 0.0
+        self._model = None
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._reset()
+
+    def _reset(self):
+        self.scored = 0
+        self.dropped = 0
+        self.errors = 0
+        self._abs_diff_sum = 0.0
+        self._max_abs_diff = 0.0
+        self._same_band = 0
+
+    def set_model(self, version: Optional[str], model, sample_rate: float = 0.0):
+        with self._lock:
+            if version != self.version:
+                self._reset()
+            self.version, self._model = version, model
+            self.sample_rate = sample_rate if model is not None else 0.0
+        if model is not None and (self._thread is None or not self._thread.is_alive()):
+            self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+            self._thread.start()
+
+    def offer(self, X: np.ndarray, served: np.ndarray):
+        """Maybe queue one request's features and served scores; never blocks"""
+        if self.sample_rate <= 0.0 or random.random() >= self.sample_rate:
+            return
+        try:
+            self._queue.put_nowait((self.version, X, np.asarray(served, dtype="float32")))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            version, X, served = self._queue.get()
+            model = self._model
+            if model is None or version != self.version:
+                continue  # candidate changed while queued
+            try:
+                scores = model.predict(X, batch_size=max(len(X), 1), verbose=0)[:, 0]
+            except Exception:
+                self.errors += 1
+                continue
+            diff = np.abs(scores - served)
+            same = np.searchsorted(self.thresholds, scores, side="right") == \
+                np.searchsorted(self.thresholds, served, side="right")
+            with self._lock:
+                if version != self.version:
+                    continue
+                self.scored += len(diff)
+                self._abs_diff_sum += float(diff.sum())
+                self._max_abs_diff = max(self._max_abs_diff, float(diff.max(initial=0.0)))
+                self._same_band += int(same.sum())
+            for d in diff:
+                SHADOW_DIFF.observe(float(d))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "version": self.version,
+                "sample_rate": self.sample_rate,
+                "scored": self.scored,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "mean_abs_diff": self._abs_diff_sum / self.scored if self.scored else None,
+                "max_abs_diff": self._max_abs_diff if self.scored else None,
+                "same_risk_band": self._same_band / self.scored if self.scored else None,
+            }
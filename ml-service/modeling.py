@@ -0,0 +1,34 @@
+"""The risk model's architecture and cold-start data.
+
+Shared by the service and the spawned training worker; TensorFlow is
+imported inside ``build_model`` so the worker doesn't pay for the
+service module, and importing this one stays cheap.
+"""
+import os
+
+from binakata_common import synthetic
+
+SYNTHETIC_SEED = int(os.environ.get("SYNTHETIC_SEED", 42))
+
+
+def build_model(input_dim: int = 6):
+    """Build neural network model"""
+    from tensorflow import keras
+    from tensorflow.keras import layers
+
+    inputs = layers.Input(shape=(input_dim,))
+    x = layers.Dense(32, activation='relu')(inputs)
+    x = layers.BatchNormalization()(x)
+    x = layers.Dropout(0.2)(x)
+    x = layers.Dense(16, activation='relu')(x)
+    x = layers.Dense(8, activation='relu')(x)
+    outputs = layers.Dense(1, activation='sigmoid')(x)
+    model = keras.Model(inputs, outputs)
+    model.compile(optimizer=keras.optimizers.Adam(learning_rate=1e-3),
+                  loss='binary_crossentropy', metrics=['accuracy'])
+    return model
+
+
+def synthetic_dataset(n_samples: int = 1000):
+    """Generate synthetic training dataset"""
+    return synthetic.generate(n_samples, seed=SYNTHETIC_SEED, profile="screening")
@@ -0,0 +1,215 @@
+"""Buffered, single-writer JSONL log for anonymized predictions.
+
+The request path only appends a record to an in-memory queue. A
+background thread drains the queue and writes whole batches with a
+single ``os.write`` on an ``O_APPEND`` descriptor, flushing when
+``flush_records`` records are pending or every ``flush_interval``
+seconds. Writes and rotation take an exclusive ``flock`` on a sidecar
+``<path>.lock`` file (where available), so several uvicorn workers can
+share one log file and rotate it safely.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process dev only
+    fcntl = None
+
+FSYNC_POLICIES = ("always", "interval", "never")
+
+
+class PredictionLogWriter:
+    def __init__(
+        self,
+        path: str,
+        flush_records: int = 256,
+        flush_interval: float = 1.0,
+        max_pending: int = 100_000,
+        fsync: str = "interval",
+        fsync_interval: float = 5.0,
+        rotate_bytes: int = 64 * 1024 * 1024,
+        rotate_daily: bool = True,
+    ):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}")
+        self.path = path
+        self.flush_records = max(1, flush_records)
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.rotate_bytes = rotate_bytes
+        self.rotate_daily = rotate_daily
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._fd = None
+        self._lock_fd = None
+        self._opened_day = None
+        self._last_fsync = time.monotonic()
+        # stats
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.rotations = 0
+
+    # -- request path -------------------------------------------------
+
+    def log(self, record: dict) -> bool:
+        """Enqueue a record without blocking; returns False if the buffer is full"""
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        if self._queue.qsize() >= self.flush_records:
+            self._wakeup.set()
+        return True
+
+    # -- lifecycle ----------------------------------------------------
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="prediction-log", daemon=True)
+        self._thread.start()
+
+    def close(self, timeout: float = 10.0):
+        """Stop the writer thread after a final flush"""
+        thread = self._thread
+        if thread is None:
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        thread.join(timeout)
+        self._thread = None
+
+    # -- writer thread ------------------------------------------------
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._flush()
+        self._flush()
+        if self._fd is not None:
+            self._sync(force=self.fsync != "never")
+            os.close(self._fd)
+            self._fd = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def _drain(self):
+        records = []
+        while True:
+            try:
+                records.append(self._queue.get_nowait())
+            except queue.Empty:
+                return records
+
+    def _flush(self):
+        records = self._drain()
+        if not records:
+            return
+        data = "".join(json.dumps(r) + "\n" for r in records).encode("utf-8")
+        try:
+            self._write(data)
+        except OSError as e:
+            print(f"[WARN] Could not write prediction log: {e}")
+            self.dropped += len(records)
+            return
+        self.written += len(records)
+        self.flushes += 1
+
+    def _write(self, data: bytes):
+        self._ensure_open()
+        self._lock()
+        try:
+            # Another worker may have rotated the file since we opened it
+            self._reopen_if_replaced()
+            if self._should_rotate():
+                self._rotate()
+            os.write(self._fd, data)
+        finally:
+            self._unlock()
+        self._sync()
+
+    def _ensure_open(self):
+        if self._fd is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            self._opened_day = datetime.utcnow().date()
+        if self._lock_fd is None and fcntl is not None:
+            self._lock_fd = os.open(self.path + ".lock", os.O_WRONLY | os.O_CREAT, 0o644)
+
+    def _reopen_if_replaced(self):
+        try:
+            same = os.path.samestat(os.fstat(self._fd), os.stat(self.path))
+        except FileNotFoundError:
+            same = False
+        if not same:
+            os.close(self._fd)
+            self._fd = None
+            self._ensure_open()
+
+    def _should_rotate(self) -> bool:
+        size = os.fstat(self._fd).st_size
+        if size == 0:
+            return False
+        if self.rotate_bytes and size >= self.rotate_bytes:
+            return True
+        return self.rotate_daily and datetime.utcnow().date() != self._opened_day
+
+    def _rotate(self):
+        root, ext = os.path.splitext(self.path)
+        stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+        target = f"{root}-{stamp}{ext}"
+        n = 1
+        while os.path.exists(target):
+            target = f"{root}-{stamp}-{n}{ext}"
+            n += 1
+        self._sync(force=self.fsync != "never")
+        os.rename(self.path, target)
+        os.close(self._fd)
+        self._fd = None
+        self._ensure_open()
+        self.rotations += 1
+
+    def _sync(self, force: bool = False):
+        now = time.monotonic()
+        due = self.fsync == "always" or (
+            self.fsync == "interval" and now - self._last_fsync >= self.fsync_interval
+        )
+        if force or due:
+            os.fsync(self._fd)
+            self._last_fsync = now
+
+    def _lock(self):
+        if self._lock_fd is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+
+    def _unlock(self):
+        if self._lock_fd is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "pending": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "rotations": self.rotations,
+            "fsync": self.fsync,
+        }
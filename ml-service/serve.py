@@ -0,0 +1,305 @@
+"""Pre-fork multi-worker server for the ML service.
+
+    python serve.py            # ML_WORKERS workers on HOST:PORT (default 0.0.0.0:8001)
+    kill -HUP <master pid>     # graceful reload: reload the model, replace the workers
+
+The master caps the BLAS / OpenMP / TensorFlow thread pools (each worker
+gets ``ML_WORKER_THREADS``, by default an equal share of the cores) before
+numpy or TensorFlow is imported, so N workers don't oversubscribe the CPU.
+It then imports ``app``, loads the NumPy weights of the registry's current
+version, binds the listening socket and forks the workers, which share those
+weight pages copy-on-write and accept on the same socket. Workers load the
+shadow candidate and, for instant rollback, the few-KB NumPy exports of the
+newest retained versions on their own.
+
+The master does no model work beyond reading an ``.npz``: TensorFlow's runtime
+must not be started before a fork, and with ``INFERENCE_ENGINE=keras`` every
+worker loads its own model after the fork. When the registry has nothing the
+workers can serve, the master starts one spawned process that cold-trains (or
+exports) and publishes a version, after the workers are already accepting
+connections. Workers never cold-train under the master: they serve fallback
+scoring until the published version reaches them through the registry pointers.
+
+Each worker holds its own copy of anything it loads after the fork, so
+``ML_WORKERS`` defaults to 2 rather than one per core; raise it when the
+host has memory to spare.
+
+Newly published or rolled-back models reach the running workers through
+the model registry's pointers, without a restart (see model_registry.py).
+On SIGHUP the master reloads the current weights, forks a new set of workers and waits until they
+accept connections before stopping the old ones gracefully; if the new
+workers don't come up within ``ML_RELOAD_TIMEOUT`` seconds the old ones
+keep serving. SIGTERM/SIGINT stop all workers gracefully. Workers that die
+are replaced.
+"""
+import os
+import sys
+import time
+
+WORKERS = int(os.environ.get("ML_WORKERS", 2))
+WORKER_THREADS = int(os.environ.get("ML_WORKER_THREADS", max(1, (os.cpu_count() or 1) // max(WORKERS, 1))))
+INTEROP_THREADS = int(os.environ.get("ML_INTEROP_THREADS", 1))
+HOST = os.environ.get("HOST", "0.0.0.0")
+PORT = int(os.environ.get("PORT", 8001))
+RELOAD_TIMEOUT = float(os.environ.get("ML_RELOAD_TIMEOUT", 60.0))
+GRACEFUL_TIMEOUT = int(os.environ.get("ML_GRACEFUL_TIMEOUT", 30))
+
+# Read by the BLAS / OpenMP / TensorFlow runtimes when they load, hence before
+# any import of numpy or TensorFlow; explicit settings win
+for _var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "TF_NUM_INTRAOP_THREADS"):
+    os.environ.setdefault(_var, str(WORKER_THREADS))
+os.environ.setdefault("TF_NUM_INTEROP_THREADS", str(INTEROP_THREADS))
+
+import asyncio
+import multiprocessing as mp
+import select
+import signal
+import socket
+
+import uvicorn
+
+
+def _prepare_model():
+    """Spawned child: load the model, cold-training (and exporting) it if needed"""
+    import app as service
+    service.ensure_model()
+
+
+def needs_prepare(service) -> bool:
+    """Whether the registry lacks a version the workers can serve (or, for NumPy, its export)"""
+    if not service.TENSORFLOW_AVAILABLE:
+        return False
+    version = service.MODEL_REGISTRY.current()
+    if version is None:
+        return True
+    return service.INFERENCE_ENGINE != "keras" and not os.path.exists(
+        service.MODEL_REGISTRY.path(version, "model.npz"))
+
+
+def preload(service) -> bool:
+    """Load the current version's NumPy weights in the master; False when workers load their own"""
+    if service.INFERENCE_ENGINE == "keras":
+        print("[INFO] INFERENCE_ENGINE=keras: each worker loads its own model after the fork")
+        return False
+    version, generation = service.MODEL_REGISTRY.current_pointer()
+    npz = service.MODEL_REGISTRY.path(version, "model.npz") if version else None
+    if npz is None or not os.path.exists(npz):
+        print("[INFO] No NumPy model to preload yet")
+        return False
+    started = time.perf_counter()
+    try:
+        model = service.NumpyMLP.load(npz)
+    except Exception as e:
+        print(f"[WARN] Model preload failed: {e}")
+        return False
+    service.MODEL_LOADER.install(version, model, generation)
+    print(f"[OK] Model {version} preloaded in the master in {time.perf_counter() - started:.2f}s")
+    return True
+
+
+def _limit_tensorflow_threads(service):
+    if not service.TENSORFLOW_AVAILABLE:
+        return
+    try:
+        service.tf.config.threading.set_intra_op_parallelism_threads(WORKER_THREADS)
+        service.tf.config.threading.set_inter_op_parallelism_threads(INTEROP_THREADS)
+    except RuntimeError:
+        pass  # runtime already initialized; the TF_NUM_*_THREADS variables applied instead
+
+
+def _run_worker(service, sock: socket.socket, ready_fd: int):
+    """Forked child: serve on the inherited socket and report readiness on ``ready_fd``"""
+    for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, signal.SIG_DFL)
+    # the master's prepare process is the only one that cold-trains
+    service.COLD_START_TRAINING = False
+    _limit_tensorflow_threads(service)
+    config = uvicorn.Config(
+        service.app,
+        lifespan="on",
+        log_level=os.environ.get("LOG_LEVEL", "info"),
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT,
+    )
+    server = uvicorn.Server(config)
+
+    async def serve():
+        task = asyncio.ensure_future(server.serve(sockets=[sock]))
+        while not server.started and not task.done():
+            await asyncio.sleep(0.05)
+        if server.started:
+            os.write(ready_fd, b"1")
+        os.close(ready_fd)
+        await task
+
+    config.setup_event_loop()
+    asyncio.run(serve())
+
+
+class Master:
+    def __init__(self, service, sock: socket.socket, workers: int):
+        self.service = service
+        self.sock = sock
+        self.workers = workers
+        self.pids = set()  # current generation
+        self.retiring = set()  # previous generation, draining
+        self.preparing = None  # spawned process producing a servable model
+        self._reload = False
+        self._stopping = False
+
+    def spawn(self):
+        """Fork one worker; returns (pid, read end of its readiness pipe)"""
+        ready_r, ready_w = os.pipe()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_r)
+            code = 0
+            try:
+                _run_worker(self.service, self.sock, ready_w)
+            except BaseException as e:
+                print(f"[WARN] Worker {os.getpid()} crashed: {e}")
+                code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        os.close(ready_w)
+        return pid, ready_r
+
+    def spawn_generation(self, timeout: float):
+        """Fork a full set of workers; returns their pids once all are accepting, else None"""
+        started = [self.spawn() for _ in range(self.workers)]
+        waiting = {fd: pid for pid, fd in started}
+        deadline = time.monotonic() + timeout
+        failed = False
+        while waiting and not failed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                failed = True
+                break
+            readable, _, _ = select.select(list(waiting), [], [], remaining)
+            for fd in readable:
+                if os.read(fd, 1) != b"1":  # EOF without the byte: the worker died during startup
+                    failed = True
+                os.close(fd)
+                del waiting[fd]
+        for fd in waiting:
+            os.close(fd)
+        pids = {pid for pid, _ in started}
+        if failed:
+            self._signal(pids, signal.SIGKILL)
+            for pid in pids:
+                os.waitpid(pid, 0)
+            return None
+        return pids
+
+    def _signal(self, pids, sig):
+        for pid in pids:
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def prepare(self):
+        """Cold-train or export in the background when the registry has nothing servable"""
+        if self.preparing is not None or not needs_prepare(self.service):
+            return
+        self.preparing = mp.get_context("spawn").Process(target=_prepare_model, name="model-prepare")
+        self.preparing.start()
+        print(f"[INFO] Preparing the model in process {self.preparing.pid}; "
+              "workers serve fallback scoring until it is published")
+
+    def prepared(self, status: int):
+        self.preparing = None
+        if status != 0:
+            print(f"[WARN] Model prepare process exited with status {status}; SIGHUP retries")
+        # workers pick the new version up from the registry; forks from now on share it
+        preload(self.service)
+
+    def reload(self):
+        print("[INFO] Reloading: preloading the model and starting new workers")
+        preload(self.service)
+        self.prepare()
+        pids = self.spawn_generation(RELOAD_TIMEOUT)
+        if pids is None:
+            print("[WARN] New workers did not start; keeping the current ones")
+            return
+        old, self.pids = self.pids, pids
+        self.retiring |= old
+        self._signal(old, signal.SIGTERM)
+        print(f"[OK] Reloaded: workers {sorted(pids)} serving, {len(old)} old workers draining")
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if self.preparing is not None and pid == self.preparing.pid:
+                self.prepared(status)
+            elif pid in self.retiring:
+                self.retiring.discard(pid)
+            elif pid in self.pids:
+                self.pids.discard(pid)
+                if not self._stopping:
+                    print(f"[WARN] Worker {pid} exited with status {status}; starting a replacement")
+                    time.sleep(1.0)  # don't spin if workers crash on startup
+                    new_pid, ready_fd = self.spawn()
+                    os.close(ready_fd)
+                    self.pids.add(new_pid)
+
+    def run(self):
+        signal.signal(signal.SIGHUP, lambda *_: setattr(self, "_reload", True))
+        signal.signal(signal.SIGTERM, lambda *_: setattr(self, "_stopping", True))
+        signal.signal(signal.SIGINT, lambda *_: setattr(self, "_stopping", True))
+
+        pids = self.spawn_generation(RELOAD_TIMEOUT)
+        if pids is None:
+            print("[WARN] Workers failed to start")
+            return 1
+        self.pids = pids
+        print(f"[READY] {len(pids)} workers serving on {HOST}:{PORT} (master pid {os.getpid()})")
+        self.prepare()
+        while not self._stopping:
+            if self._reload:
+                self._reload = False
+                self.reload()
+            self.reap()
+            time.sleep(0.5)
+
+        print("[INFO] Shutting down workers")
+        if self.preparing is not None:
+            self.preparing.terminate()
+        self._signal(self.pids | self.retiring, signal.SIGTERM)
+        deadline = time.monotonic() + GRACEFUL_TIMEOUT + 5
+        while (self.pids or self.retiring) and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        self._signal(self.pids | self.retiring, signal.SIGKILL)
+        return 0
+
+
+def main():
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app as service
+
+    print(f"[START] BinaKata ML Service: {WORKERS} workers x {WORKER_THREADS} threads on port {PORT}")
+    print(f"[INFO] TensorFlow Available: {service.TENSORFLOW_AVAILABLE}")
+    sock = socket.socket(socket.AF_INET6 if ":" in HOST else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((HOST, PORT))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    # Only reads files; a missing model is prepared once the workers are serving
+    service._import_legacy_model()
+    preload(service)
+
+    return Master(service, sock, WORKERS).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
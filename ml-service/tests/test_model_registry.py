@@ -0,0 +1,76 @@
+import threading
+
+from model_registry import ModelLoader, ModelRegistry
+
+
+def _registry(tmp_path, n):
+    (tmp_path / "model.npz").write_bytes(b"")
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    versions = [registry.publish({"model.npz": str(tmp_path / "model.npz")}, {}) for _ in range(n)]
+    return registry, versions
+
+
+def test_set_current_bumps_the_generation(tmp_path):
+    registry, (v1, v2) = _registry(tmp_path, 2)
+    assert registry.current_pointer() == (None, 0)
+    assert registry.set_current(v1) == 1
+    assert registry.set_current(v2) == 2
+    assert registry.set_current(v2) == 3
+    assert registry.current_pointer() == (v2, 3)
+
+
+def test_pointer_without_generation_is_generation_zero(tmp_path):
+    registry, (v1,) = _registry(tmp_path, 1)
+    with open(registry.current_path, "w") as f:
+        f.write(v1 + "\n")
+    assert registry.current_pointer() == (v1, 0)
+    assert registry.set_current(v1) == 1
+
+
+def test_stale_poll_does_not_undo_an_activate(tmp_path):
+    registry, (v1, v2) = _registry(tmp_path, 2)
+    registry.set_current(v1)
+    loading, release = threading.Event(), threading.Event()
+
+    def load(version):
+        loading.set()
+        release.wait(5)
+        return version
+
+    served = []
+    loader = ModelLoader(registry, load, lambda version, model: served.append(version))
+    loader.add(v2, v2)
+
+    # the poll reads CURRENT (v1) and starts loading it...
+    poll = threading.Thread(target=loader.sync)
+    poll.start()
+    assert loading.wait(5)
+    # ...while a rollback to v2 lands
+    loader.activate(v2)
+    release.set()
+    poll.join(5)
+
+    assert served == [v2]
+    assert (loader.current, loader.generation) == (v2, 2)
+    loader.sync()
+    assert served == [v2]
+
+
+def test_newest_versions_stay_resident(tmp_path):
+    registry, versions = _registry(tmp_path, 4)
+    registry.set_current(versions[0])
+    loads = []
+
+    def load(version):
+        loads.append(version)
+        return version
+
+    loader = ModelLoader(registry, load, lambda version, model: None, resident=2)
+    loader.sync()
+    loader.preload()
+    assert sorted(loader.stats()["loaded"]) == [versions[0], versions[2], versions[3]]
+
+    loader.activate(versions[3])  # rollback target already loaded
+    loader.sync()
+    assert loads.count(versions[3]) == 1
+    assert sorted(loader.stats()["loaded"]) == versions[2:]  # the old current is evicted
@@ -0,0 +1,382 @@
+"""Background training jobs for POST /train.
+
+Jobs are queued and run one at a time, each in a fresh ``spawn``-ed
+process so ``model.fit`` never competes with request threads for the
+GIL or TensorFlow's thread pools. The child streams per-epoch losses
+back over a queue and saves the trained model to a temporary file. The
+parent then loads it completely and hands it to ``on_success``, which
+publishes it with a single reference swap, so in-flight predictions
+never see a half-built model.
+
+An ``incremental`` job fine-tunes the registry's current model on the
+samples added since its watermark (``trained_rows`` in its meta.json)
+plus a small random replay of older ones, so its cost follows the new
+data, not the dataset; ``full`` retrains from scratch on everything.
+
+Each job's status is mirrored to ``<work_dir>/jobs/<job_id>.json``, so
+with several server workers any of them can report it; cancelling a job
+owned by another worker drops a ``<job_id>.cancel`` marker that the
+owner picks up.
+"""
+import json
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from binakata_common.metrics import DURATION_BUCKETS, Histogram
+
+TRAINING_DURATION = Histogram(
+    "training_duration_seconds", "Wall time of background training jobs by final status",
+    ("status",), buckets=DURATION_BUCKETS,
+)
+
+FINAL_STATES = ("succeeded", "failed", "cancelled", "insufficient_data", "up_to_date")
+
+
+def _train_worker(store_dir, epochs, out_path, events, cancel, options):
+    """Child process entry point: fine-tune or fully retrain a model on the training store.
+
+    ``incremental`` loads the current version of ``options["registry_dir"]`` and fits it on the rows
+    added since the watermark plus up to ``replay_size`` random older rows;
+    ``full`` (or an incremental run without a usable base model) fits a fresh
+    model on every row. Batches are streamed from the store's memory maps.
+    """
+    try:
+        import numpy as np
+        from tensorflow import keras
+        from modeling import build_model, synthetic_dataset
+        from training_store import TrainingStore
+
+        mode = options.get("mode", "full")
+        batch_size = options.get("batch_size", 64)
+        seed = int.from_bytes(os.urandom(4), "little")
+        rng = np.random.default_rng(seed)
+
+        class Progress(keras.callbacks.Callback):
+            def __init__(self, samples_per_epoch):
+                super().__init__()
+                self.samples_per_epoch = samples_per_epoch
+
+            def on_train_batch_end(self, batch, logs=None):
+                if cancel.is_set():
+                    self.model.stop_training = True
+
+            def on_epoch_end(self, epoch, logs=None):
+                logs = logs or {}
+                events.put(("epoch", {
+                    "epoch": epoch + 1,
+                    "loss": float(logs.get("loss", float("nan"))),
+                    "val_loss": float(logs.get("val_loss", float("nan"))),
+                    "samples": self.samples_per_epoch,
+                }))
+
+        try:
+            store = TrainingStore(store_dir)
+            rows_end = len(store)
+        except Exception as e:
+            if mode == "incremental":
+                raise
+            print(f"Error loading training data: {e}")
+            # Fall back to synthetic data
+            X, y = synthetic_dataset()
+            n_samples = int(len(y))
+            if n_samples < 10:
+                events.put(("insufficient_data", {"n_samples": n_samples}))
+                return
+            model = build_model(input_dim=X.shape[1])
+            es = keras.callbacks.EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
+            model.fit(X, y, epochs=epochs, batch_size=batch_size, validation_split=0.2, verbose=0,
+                      callbacks=[es, Progress(n_samples - int(n_samples * 0.2))])
+            if cancel.is_set():
+                events.put(("cancelled", None))
+                return
+            model.save(out_path)
+            events.put(("done", {"n_samples": n_samples}))
+            return
+
+        # Resolved now rather than at submit, so a queued job builds on the one before it
+        model, base_version, watermark = None, None, 0
+        if options.get("registry_dir"):
+            from model_registry import ModelRegistry
+            registry = ModelRegistry(options["registry_dir"])
+            base_version = registry.current()
+            if base_version is not None:
+                watermark = min(int(registry.meta(base_version).get("trained_rows") or 0), rows_end)
+        if mode == "incremental":
+            if watermark >= rows_end:
+                events.put(("up_to_date", {"n_samples": 0}))
+                return
+            try:
+                if base_version is None:
+                    raise FileNotFoundError("the model registry has no current version")
+                model = keras.models.load_model(registry.path(base_version, "model.keras"))
+            except Exception as e:
+                print(f"[WARN] No usable base model for incremental training, retraining fully: {e}")
+                mode = "full"
+
+        if mode == "incremental":
+            new_rows = np.arange(watermark, rows_end)
+            replay = rng.choice(watermark, size=min(options.get("replay_size", 0), watermark), replace=False)
+            rows = np.concatenate([new_rows, replay])
+            model.compile(optimizer=keras.optimizers.Adam(learning_rate=options.get("learning_rate", 1e-4)),
+                          loss='binary_crossentropy', metrics=['accuracy'])
+        else:
+            new_rows, replay = np.arange(watermark, rows_end), np.empty(0, dtype=np.int64)
+            rows = np.arange(rows_end)
+            model = build_model(input_dim=store.dim)
+        if len(rows) < 10:
+            events.put(("insufficient_data", {"n_samples": int(len(rows))}))
+            return
+
+        # Hold out a random 20% (capped) for validation; the rest is streamed
+        rows = rng.permutation(rows)
+        n_val = min(int(len(rows) * 0.2), options.get("val_max", 10000))
+        train_rows = rows[n_val:]
+        X_all, y_all = store.load()
+        val_rows = np.sort(rows[:n_val])
+        validation = (np.asarray(X_all[val_rows]), np.asarray(y_all[val_rows])) if n_val else None
+        events.put(("plan", {
+            "mode": mode,
+            "base_version": base_version if mode == "incremental" else None,
+            "rows_end": rows_end,
+            "new_samples": int(len(new_rows)),
+            "replay_samples": int(len(replay)),
+        }))
+
+        es = keras.callbacks.EarlyStopping(monitor='val_loss' if n_val else 'loss', patience=5,
+                                           restore_best_weights=True)
+        model.fit(store.dataset(train_rows, batch_size, seed=seed), epochs=epochs, validation_data=validation,
+                  verbose=0, callbacks=[es, Progress(int(len(train_rows)))])
+        if cancel.is_set():
+            events.put(("cancelled", None))
+            return
+        model.save(out_path)
+        events.put(("done", {"n_samples": int(len(rows))}))
+    except Exception as e:
+        events.put(("failed", {"error": f"{type(e).__name__}: {e}"}))
+
+
+class TrainingJobManager:
+    def __init__(self, store_dir: str, work_dir: str, on_success, max_history: int = 50):
+        # on_success(job: dict, model_path: str) -> published model path; runs in the manager thread
+        self.store_dir = store_dir
+        self.work_dir = work_dir
+        self.on_success = on_success
+        self.max_history = max_history
+        self._jobs = OrderedDict()
+        self._cancel_events = {}
+        self._options = {}  # job_id -> options passed to the training process
+        self._started = {}  # job_id -> perf_counter at start, for wall_time_s
+        self._pending = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._ctx = mp.get_context("spawn")
+        self.jobs_dir = os.path.join(work_dir, "jobs")
+
+    def _job_path(self, job_id: str, suffix: str = ".json") -> str:
+        return os.path.join(self.jobs_dir, job_id + suffix)
+
+    def _persist(self, job: dict):
+        # called with self._lock held
+        try:
+            os.makedirs(self.jobs_dir, exist_ok=True)
+            tmp = self._job_path(job["job_id"], ".json.tmp")
+            with open(tmp, "w") as f:
+                json.dump(job, f)
+            os.replace(tmp, self._job_path(job["job_id"]))
+        except OSError as e:
+            print(f"[WARN] Could not persist training job {job['job_id']}: {e}")
+
+    def _forget(self, job_id: str):
+        for suffix in (".json", ".cancel"):
+            try:
+                os.remove(self._job_path(job_id, suffix))
+            except OSError:
+                pass
+
+    def _cancel_requested(self, job_id: str) -> bool:
+        return os.path.exists(self._job_path(job_id, ".cancel"))
+
+    def _now(self) -> str:
+        return datetime.utcnow().isoformat()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name="training-jobs", daemon=True)
+            self._thread.start()
+
+    def shutdown(self):
+        with self._lock:
+            for job in self._jobs.values():
+                if job["status"] in ("queued", "running"):
+                    self._cancel_locked(job)
+        self._pending.put(None)
+
+    def submit(self, epochs: int, **options) -> dict:
+        """Queue a job; ``options`` go to ``_train_worker`` (mode, registry_dir, replay_size, ...)"""
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "mode": options.get("mode", "full"),
+            "epochs": epochs,
+            "epochs_completed": 0,
+            "loss": [],
+            "val_loss": [],
+            "n_samples": None,
+            "new_samples": None,
+            "replay_samples": None,
+            "samples_processed": 0,
+            "rows_end": None,
+            "base_version": None,
+            "wall_time_s": None,
+            "created_at": self._now(),
+            "started_at": None,
+            "finished_at": None,
+            "model_path": None,
+            "error": None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._options[job_id] = options
+            self._persist(job)
+            # Forget the oldest finished jobs beyond max_history
+            while len(self._jobs) > self.max_history:
+                oldest = next((k for k, j in self._jobs.items() if j["status"] in FINAL_STATES), None)
+                if oldest is None:
+                    break
+                del self._jobs[oldest]
+                self._forget(oldest)
+        self.start()
+        self._pending.put(job_id)
+        return self.get(job_id)
+
+    def get(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job, loss=list(job["loss"]), val_loss=list(job["val_loss"]))
+        return self._load(job_id)
+
+    def _load(self, job_id: str):
+        """Snapshot of a job owned by another worker process"""
+        if not job_id.isalnum():
+            return None
+        try:
+            with open(self._job_path(job_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def cancel(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                self._cancel_locked(job)
+        if job is None:
+            job = self._load(job_id)
+            if job is None:
+                return None
+            if job["status"] in ("queued", "running"):
+                # the owning worker checks for the marker while the job is pending or running
+                open(self._job_path(job_id, ".cancel"), "a").close()
+        return self.get(job_id)
+
+    def _cancel_locked(self, job: dict):
+        if job["status"] == "queued":
+            job["status"] = "cancelled"
+            job["finished_at"] = self._now()
+            self._options.pop(job["job_id"], None)
+            self._persist(job)
+        elif job["status"] == "running":
+            event = self._cancel_events.get(job["job_id"])
+            if event is not None:
+                event.set()
+
+    def _finish(self, job: dict, status: str, **fields):
+        with self._lock:
+            job.update(fields, status=status, finished_at=self._now())
+            self._cancel_events.pop(job["job_id"], None)
+            self._options.pop(job["job_id"], None)
+            started = self._started.pop(job["job_id"], None)
+            if started is not None:
+                job["wall_time_s"] = round(time.perf_counter() - started, 3)
+            self._persist(job)
+
+    def _loop(self):
+        while True:
+            job_id = self._pending.get()
+            if job_id is None:
+                return
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job["status"] != "queued":
+                    continue
+                if self._cancel_requested(job_id):
+                    self._cancel_locked(job)
+                    continue
+                cancel = self._ctx.Event()
+                self._cancel_events[job_id] = cancel
+                self._started[job_id] = time.perf_counter()
+                job.update(status="running", started_at=self._now())
+                self._persist(job)
+            started = time.perf_counter()
+            try:
+                self._run(job, cancel)
+            except Exception as e:
+                self._finish(job, "failed", error=f"{type(e).__name__}: {e}")
+            TRAINING_DURATION.labels(job["status"]).observe(time.perf_counter() - started)
+
+    def _run(self, job: dict, cancel):
+        os.makedirs(self.work_dir, exist_ok=True)
+        out_path = os.path.join(self.work_dir, f".train-{job['job_id']}.keras")
+        events = self._ctx.Queue()
+        proc = self._ctx.Process(
+            target=_train_worker,
+            args=(self.store_dir, job["epochs"], out_path, events, cancel, self._options.get(job["job_id"], {})),
+            daemon=True,
+        )
+        proc.start()
+        kind, payload = None, None
+        while kind is None:
+            try:
+                event, data = events.get(timeout=0.5)
+            except queue.Empty:
+                if not proc.is_alive():
+                    kind, payload = "failed", {"error": f"training process exited with code {proc.exitcode}"}
+                elif not cancel.is_set() and self._cancel_requested(job["job_id"]):
+                    cancel.set()
+                continue
+            if event == "epoch":
+                with self._lock:
+                    job["epochs_completed"] = data["epoch"]
+                    job["loss"].append(data["loss"])
+                    job["val_loss"].append(data["val_loss"])
+                    job["samples_processed"] += data["samples"]
+                    self._persist(job)
+            elif event == "plan":
+                with self._lock:
+                    job.update(data)
+                    self._persist(job)
+            else:
+                kind, payload = event, data or {}
+        proc.join()
+
+        try:
+            if kind == "done":
+                model_path = self.on_success(job, out_path)
+                self._finish(job, "succeeded", n_samples=payload["n_samples"], model_path=model_path)
+            elif kind in ("insufficient_data", "up_to_date"):
+                self._finish(job, kind, n_samples=payload["n_samples"])
+            elif kind == "cancelled":
+                self._finish(job, "cancelled")
+            else:
+                self._finish(job, "failed", error=payload.get("error"))
+        finally:
+            if os.path.exists(out_path):
+                os.remove(out_path)
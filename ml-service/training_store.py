@@ -0,0 +1,186 @@
+"""Append-only columnar store for labeled training samples.
+
+Layout of the store directory:
+
+    features.f32   raw little-endian float32, ``rows x dim``
+    labels.f32     raw float32, one label per row
+    index.json     {"version", "dim", "rows", "migrated"}
+
+``index.json`` is the commit point: column files are appended and
+fsync'ed first, then the index is atomically replaced with the new row
+count. A crash in between leaves a tail that the next append truncates.
+Loading the training matrix is a read-only ``np.memmap`` of the first
+``rows`` rows, so it costs no parsing and no copy, and appending costs
+only the size of the new samples. ``dataset`` streams any subset of rows
+(e.g. the samples added since the last training run) into ``model.fit``.
+
+Usage (one-time import of the legacy JSONL dataset):
+    python training_store.py migrate models/dataset.jsonl
+"""
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process dev only
+    fcntl = None
+
+STORE_VERSION = 1
+
+
+class TrainingStore:
+    def __init__(self, directory: str, dim: int = 6):
+        self.directory = directory
+        self.dim = dim
+        self.features_path = os.path.join(directory, "features.f32")
+        self.labels_path = os.path.join(directory, "labels.f32")
+        self.index_path = os.path.join(directory, "index.json")
+        self._thread_lock = threading.Lock()
+
+    # -- index --------------------------------------------------------
+
+    def _read_index(self) -> dict:
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return {"version": STORE_VERSION, "dim": self.dim, "rows": 0, "migrated": []}
+        if index.get("dim") != self.dim:
+            raise ValueError(f"Store has dim={index.get('dim')}, expected {self.dim}")
+        return index
+
+    def _write_index(self, index: dict):
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(index, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.index_path)
+
+    @contextmanager
+    def _locked(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            fd = os.open(os.path.join(self.directory, ".lock"), os.O_WRONLY | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                os.close(fd)
+
+    def __len__(self) -> int:
+        return int(self._read_index()["rows"])
+
+    # -- write --------------------------------------------------------
+
+    def _append_column(self, path: str, data: np.ndarray, committed_bytes: int):
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o644)
+        try:
+            # Drop any uncommitted tail left by a crash between data and index writes
+            os.ftruncate(fd, committed_bytes)
+            os.lseek(fd, committed_bytes, os.SEEK_SET)
+            os.write(fd, data.tobytes())
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def append(self, X: np.ndarray, y: np.ndarray, source: str = None) -> int:
+        """Append samples; returns the new total row count"""
+        X = np.ascontiguousarray(X, dtype="<f4").reshape(-1, self.dim)
+        y = np.ascontiguousarray(y, dtype="<f4").reshape(-1)
+        if len(X) != len(y):
+            raise ValueError("X and y must have the same number of rows")
+        with self._locked():
+            index = self._read_index()
+            if source is not None and source in index["migrated"]:
+                return index["rows"]
+            rows = index["rows"]
+            if len(X):
+                self._append_column(self.features_path, X, rows * self.dim * 4)
+                self._append_column(self.labels_path, y, rows * 4)
+            index["rows"] = rows + len(X)
+            if source is not None:
+                index["migrated"].append(source)
+            self._write_index(index)
+            return index["rows"]
+
+    # -- read ---------------------------------------------------------
+
+    def load(self):
+        """Return (X, y) as read-only memory maps over the committed rows"""
+        rows = len(self)
+        if rows == 0:
+            return np.empty((0, self.dim), dtype="float32"), np.empty((0,), dtype="float32")
+        X = np.memmap(self.features_path, dtype="<f4", mode="r", shape=(rows, self.dim))
+        y = np.memmap(self.labels_path, dtype="<f4", mode="r", shape=(rows,))
+        return X, y
+
+    def iter_batches(self, rows: np.ndarray, batch_size: int = 64, seed: int = 0):
+        """Stream (X, y) batches of the given row numbers, shuffled, from the memory maps"""
+        X, y = self.load()
+        order = np.random.default_rng(seed).permutation(rows)
+        for start in range(0, len(order), batch_size):
+            sel = np.sort(order[start:start + batch_size])
+            yield np.asarray(X[sel]), np.asarray(y[sel])
+
+    def dataset(self, rows: np.ndarray, batch_size: int = 64, seed: int = 0):
+        """tf.data pipeline over ``rows`` with prefetching (imports TensorFlow)"""
+        import tensorflow as tf
+        epoch = [0]
+
+        def batches():
+            # Reshuffle differently on every pass over the data
+            epoch[0] += 1
+            return self.iter_batches(rows, batch_size, seed=seed + epoch[0])
+
+        ds = tf.data.Dataset.from_generator(
+            batches,
+            output_signature=(
+                tf.TensorSpec(shape=(None, self.dim), dtype=tf.float32),
+                tf.TensorSpec(shape=(None,), dtype=tf.float32),
+            ),
+        )
+        return ds.prefetch(tf.data.AUTOTUNE)
+
+    # -- migration ----------------------------------------------------
+
+    def migrate_jsonl(self, jsonl_path: str, featurize) -> int:
+        """Import labeled rows of a legacy JSONL dataset once; returns rows imported.
+
+        ``featurize(record: dict) -> np.ndarray`` maps one JSON row to its features.
+        """
+        source = os.path.basename(jsonl_path)
+        if not os.path.exists(jsonl_path) or source in self._read_index()["migrated"]:
+            return 0
+        X_list, y_list = [], []
+        with open(jsonl_path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                obj = json.loads(line)
+                if "label" not in obj:  # prediction record, not a training sample
+                    continue
+                X_list.append(featurize(obj))
+                y_list.append(float(obj["label"]))
+        X = np.array(X_list, dtype="float32").reshape(-1, self.dim)
+        y = np.array(y_list, dtype="float32")
+        before = len(self)
+        after = self.append(X, y, source=source)
+        return after - before
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "migrate":
+        print(__doc__)
+        sys.exit(1)
+    from app import TRAINING_STORE, _train_record_features
+    n = TRAINING_STORE.migrate_jsonl(sys.argv[2], _train_record_features)
+    print(f"[OK] Migrated {n} labeled samples into {TRAINING_STORE.directory}")